@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+TopCut Benchmark
+Cycle latency, RPC calls per cycle and transactions per second of the bots against mock_node
+"""
+
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+BOT_MODULES = {
+    'keeper': "keeper_bot_iter",
+    'claimer': "reward_claimer_iter",
+}
+DEFAULT_MARKETS = [5, 50, 500]
+
+def _quantile(values, q):
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)] if ordered else None
+
+def _prepare_cycle(bot, chain, keeper_address):
+    """Make every market due (keeper) or give the keeper rewards to claim (claimer)"""
+    now = chain.block_timestamp(chain.block_number())
+    for market in chain.markets.values():
+        if bot == 'keeper':
+            market.next_settlement = now
+        else:
+            market.keeper_rewards[keeper_address] = market.keeper_rewards.get(keeper_address, 0) + 10**16
+            market.balance += 10**16
+
+def _run_cycle(bot, module):
+    if bot == 'keeper':
+        return module.run_once(wait=True)
+    return module.check_and_claim(0, wait=True)
+
+def run_worker(bot, market_count, cycles, latency, error_rate, block_time, cohort_size):
+    """Benchmark one bot against a fresh mock chain in this process, returns a result dict"""
+    import mock_node
+    from eth_account import Account
+
+    chain = mock_node.MockChain(block_time, latency=latency, error_rate=error_rate)
+    addresses = mock_node.synthetic_market_addresses(market_count)
+    for address in addresses:
+        chain.add_market(address, next_settlement=chain.genesis_timestamp, cohort_size=cohort_size)
+    _, url = mock_node.serve_http(chain)
+
+    # The bots read their settings at import time
+    account = Account.create()
+    os.environ['infura_api_key'] = url
+    os.environ['PRIVATEKEY'] = account.key.hex()
+    scratch = tempfile.mkdtemp(prefix="topcut-bench-")
+    os.environ['GAS_MODEL_PATH'] = os.path.join(scratch, "gas_model.json")
+    os.environ['MARKETS_FILE'] = os.path.join(scratch, "markets.json")
+    os.environ['METADATA_CACHE_PATH'] = os.path.join(scratch, "metadata_cache.db")
+    os.environ['TX_JOURNAL'] = os.path.join(scratch, "tx_journal.jsonl")
+    for name in ("RPC_URLS", "STATE_MIRROR_DB", "METRICS_PORT", "MARKET_FILTER", "MARKET_SHARD"):
+        os.environ[name] = ""  # Empty rather than unset, so a local .env cannot switch them on
+
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        module = importlib.import_module(BOT_MODULES[bot])
+        module.CONTRACTS.clear()
+        module.CONTRACTS.update({f"Market {i}": address for i, address in enumerate(addresses)})
+        module.setup_contracts()
+
+        samples = []
+        for _ in range(cycles):
+            _prepare_cycle(bot, chain, account.address)
+            requests_before = sum(chain.request_counts.values())
+            started = time.perf_counter()
+            results = _run_cycle(bot, module) or {}
+            elapsed = time.perf_counter() - started
+            samples.append({
+                'seconds': elapsed,
+                'rpc_calls': sum(chain.request_counts.values()) - requests_before,
+                'transactions': sum(1 for result in results.values() if result),
+            })
+
+    seconds = [sample['seconds'] for sample in samples]
+    transactions = sum(sample['transactions'] for sample in samples)
+    return {
+        'bot': bot,
+        'markets': market_count,
+        'cycles': samples,
+        'cycle_seconds_p50': _quantile(seconds, 0.5),
+        'cycle_seconds_max': max(seconds),
+        'rpc_calls_per_cycle': sum(sample['rpc_calls'] for sample in samples) / len(samples),
+        'transactions_per_second': transactions / sum(seconds) if sum(seconds) else 0.0,
+        'success_rate': transactions / (market_count * cycles),
+    }
+
+def import_seconds(module):
+    """Cumulative import time of a module in a fresh interpreter (python -X importtime)"""
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                               capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    for line in reversed(completed.stderr.splitlines()):
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1]) / 1e6
+    return None
+
+def run_status_case(market_count, args):
+    """Wall-clock of `reward_claimer_iter.py status` on the fast and the full path"""
+    import mock_node
+    from eth_account import Account
+
+    chain = mock_node.MockChain(args.block_time, latency=args.latency)
+    addresses = mock_node.synthetic_market_addresses(market_count)
+    account = Account.create()
+    for address in addresses:
+        chain.add_market(address, cohort_size=args.cohort_size)
+        chain.markets[address].keeper_rewards[account.address] = 10**16
+    server, url = mock_node.serve_http(chain)
+
+    scratch = tempfile.mkdtemp(prefix="topcut-bench-")
+    markets_file = os.path.join(scratch, "markets.json")
+    with open(markets_file, 'w') as f:
+        json.dump({'markets': [{'name': f"Market {i}", 'address': address} for i, address in enumerate(addresses)]}, f)
+    env = dict(os.environ, infura_api_key=url, PRIVATEKEY=account.key.hex(), ACCOUNT="", MARKETS_FILE=markets_file,
+               GAS_MODEL_PATH=os.path.join(scratch, "gas_model.json"),
+               METADATA_CACHE_PATH=os.path.join(scratch, "metadata_cache.db"),
+               RPC_URLS="", STATE_MIRROR_DB="", METRICS_PORT="", MARKET_FILTER="", MARKET_SHARD="")
+
+    case = {'markets': market_count}
+    for path, extra in (('fast', {'FULL_STATUS': ""}), ('full', {'FULL_STATUS': "1"})):
+        seconds = []
+        for _ in range(args.cycles):
+            started = time.perf_counter()
+            completed = subprocess.run([sys.executable, "reward_claimer_iter.py", "status"], env={**env, **extra},
+                                       capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+            seconds.append(time.perf_counter() - started)
+            if completed.returncode != 0 or "SUMMARY" not in completed.stdout:
+                raise RuntimeError(f"status ({path}) with {market_count} markets failed:\n{completed.stderr}")
+        case[f'{path}_seconds_p50'] = _quantile(seconds, 0.5)
+    server.shutdown()
+    return case
+
+def run_case(bot, market_count, args):
+    """Run one worker in a subprocess so every case starts with fresh module state"""
+    command = [
+        sys.executable, os.path.abspath(__file__), "--worker", bot,
+        "--markets", str(market_count),
+        "--cycles", str(args.cycles),
+        "--latency", str(args.latency),
+        "--error-rate", str(args.error_rate),
+        "--block-time", str(args.block_time),
+        "--cohort-size", str(args.cohort_size),
+    ]
+    completed = subprocess.run(command, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if completed.returncode != 0:
+        raise RuntimeError(f"{bot} with {market_count} markets failed:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def compare(results, baseline_path):
+    """Print the change of every case against a previous results file"""
+    with open(baseline_path, 'r') as f:
+        baseline = {(case['bot'], case['markets']): case for case in json.load(f)['results']}
+    print(f"\nChange against {baseline_path}:")
+    for case in results:
+        previous = baseline.get((case['bot'], case['markets']))
+        if not previous:
+            continue
+        changes = []
+        for key in ('cycle_seconds_p50', 'rpc_calls_per_cycle', 'transactions_per_second'):
+            if previous[key]:
+                changes.append(f"{key} {100 * (case[key] / previous[key] - 1):+.1f}%")
+        print(f"  {case['bot']:8} {case['markets']:5} markets: {', '.join(changes)}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the TopCut bots against a local mock node")
+    parser.add_argument("--markets", type=int, nargs="+", default=DEFAULT_MARKETS, help="market counts to run")
+    parser.add_argument("--bots", nargs="+", choices=sorted(BOT_MODULES), default=sorted(BOT_MODULES, reverse=True))
+    parser.add_argument("--cycles", type=int, default=3, help="measured cycles per case")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every RPC request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of RPC requests answered with an error")
+    parser.add_argument("--block-time", type=float, default=0.25)
+    parser.add_argument("--cohort-size", type=int, default=25, help="trades in every market's active cohort")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="previous results file to compare against")
+    parser.add_argument("--status", action="store_true",
+                        help="also time `reward_claimer_iter.py status` (fast and full path) and module imports")
+    parser.add_argument("--worker", choices=sorted(BOT_MODULES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        result = run_worker(args.worker, args.markets[0], args.cycles, args.latency, args.error_rate,
+                            args.block_time, args.cohort_size)
+        print(json.dumps(result))
+        return
+
+    results = []
+    for bot in args.bots:
+        for market_count in args.markets:
+            print(f"Running {bot} with {market_count} markets...")
+            case = run_case(bot, market_count, args)
+            results.append(case)
+            print(f"  cycle p50 {case['cycle_seconds_p50']:.3f}s, max {case['cycle_seconds_max']:.3f}s, "
+                  f"{case['rpc_calls_per_cycle']:.0f} RPC calls/cycle, "
+                  f"{case['transactions_per_second']:.1f} tx/s, success {case['success_rate']:.0%}")
+
+    status = None
+    if args.status:
+        status = {'import_seconds': {module: import_seconds(module)
+                                     for module in ("fast_status", "reward_claimer_iter")}, 'runs': []}
+        print(f"Import time: fast_status {status['import_seconds']['fast_status'] * 1000:.0f} ms, "
+              f"reward_claimer_iter {status['import_seconds']['reward_claimer_iter'] * 1000:.0f} ms")
+        for market_count in args.markets:
+            case = run_status_case(market_count, args)
+            status['runs'].append(case)
+            print(f"  status with {market_count} markets: fast {case['fast_seconds_p50'] * 1000:.0f} ms, "
+                  f"full {case['full_seconds_p50'] * 1000:.0f} ms")
+
+    report = {
+        'created': time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'settings': {
+            'cycles': args.cycles,
+            'latency': args.latency,
+            'error_rate': args.error_rate,
+            'block_time': args.block_time,
+            'cohort_size': args.cohort_size,
+        },
+        'results': results,
+        'status': status,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        compare(results, args.baseline)
+
+if __name__ == "__main__":
+    main()
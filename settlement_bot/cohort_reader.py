@@ -0,0 +1,152 @@
+"""
+TopCut Cohort Reader
+Bulk snapshot of tradesCohort_1 / tradesCohort_2 through paged Multicall3 calls
+"""
+
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from eth_utils import to_checksum_address
+
+from metadata_cache import ORACLE_CONSTANTS, get_metadata_cache
+from multicall import MULTICALL3_ADDRESS, aggregate3, decode_uint, encode_call
+from settlement_replica import normalize_price, simulate_settlement
+
+PAGE_SIZE = 500  # Trades per aggregate3 call
+MAX_WORKERS = 4  # Pages fetched at the same time
+MAX_RETRIES = 3  # Attempts per page before giving up
+
+def _read_header(w3, address, block_identifier):
+    """Block number, active cohort ID and both cohort sizes from one snapshot"""
+    calls = [
+        (MULTICALL3_ADDRESS, encode_call("getBlockNumber()")),
+        (address, encode_call("activeCohortID()")),
+        (address, encode_call("cohortSize_1()")),
+        (address, encode_call("cohortSize_2()")),
+    ]
+    values = [decode_uint(*result) for result in aggregate3(w3, calls, block_identifier)]
+    if None in values:
+        raise ValueError(f"Failed to read cohort sizes of {address}")
+    block_number, active_cohort_id, size_1, size_2 = values
+    return block_number, active_cohort_id, {1: size_1, 2: size_2}
+
+def _with_retries(read, retries, description):
+    """Call read() until it succeeds, backing off between attempts"""
+    for attempt in range(retries):
+        try:
+            return read()
+        except Exception as e:
+            if attempt == retries - 1:
+                raise
+            print(f"{description} failed ({e}), retrying...")
+            time.sleep(0.2 * 2 ** attempt)
+
+def _read_page(w3, address, cohort_id, start, end, block_number):
+    """Read trades [start, end) of a cohort at a block"""
+    signature = f"tradesCohort_{cohort_id}(uint256)"
+    selector = encode_call(signature)
+    calls = [(address, selector + trade_id.to_bytes(32, 'big')) for trade_id in range(start, end)]
+    results = aggregate3(w3, calls, block_number)
+    if not all(success and len(data) >= 64 for success, data in results):
+        raise ValueError(f"{signature} reverted inside page {start}-{end}")
+    owners = [data[12:32] for _, data in results]
+    predictions = [int.from_bytes(data[32:64], 'big') for _, data in results]
+    return start, owners, predictions
+
+def read_cohort(w3, address, cohort_id=None, block_identifier='latest', page_size=PAGE_SIZE,
+                max_workers=MAX_WORKERS, retries=MAX_RETRIES):
+    """Snapshot all (predictionOwner, prediction) entries of a cohort at one block
+
+    cohort_id defaults to the active cohort, the one waiting for settlement. Returns a dict with
+    owners as an (n, 20) uint8 array of address bytes and predictions as an (n,) object array of
+    exact uint256 values.
+    """
+    block_number, active_cohort_id, sizes = _with_retries(
+        lambda: _read_header(w3, address, block_identifier), retries, f"Cohort header of {address}")
+    cohort_id = cohort_id or active_cohort_id
+    size = sizes[cohort_id]
+
+    owners = np.empty((size, 20), dtype=np.uint8)
+    predictions = np.empty(size, dtype=object)
+
+    # Every page reads the same block, so the snapshot is consistent across pages
+    pages = [(start, min(start + page_size, size)) for start in range(0, size, page_size)]
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pages)))) as executor:
+        futures = [
+            executor.submit(_with_retries,
+                            lambda start=start, end=end: _read_page(w3, address, cohort_id, start, end, block_number),
+                            retries, f"Page {start}-{end} of {address}")
+            for start, end in pages
+        ]
+        for future in futures:
+            start, page_owners, page_predictions = future.result()
+            owners[start:start + len(page_owners)] = np.frombuffer(b"".join(page_owners), dtype=np.uint8).reshape(-1, 20)
+            predictions[start:start + len(page_predictions)] = page_predictions
+
+    return {
+        'address': address,
+        'cohort_id': cohort_id,
+        'active': cohort_id == active_cohort_id,
+        'size': size,
+        'block_number': block_number,
+        'owners': owners,
+        'predictions': predictions,
+    }
+
+def owner_addresses(owners):
+    """(n, 20) address bytes -> list of checksum addresses"""
+    return [to_checksum_address(owner.tobytes()) for owner in owners]
+
+def read_oracle_price(w3, address, block_identifier='latest'):
+    """Current oracle price of a market normalized to prediction decimals, None if unavailable
+
+    The oracle address and its decimals come from the metadata cache, only the round is read.
+    """
+    cache = get_metadata_cache()
+    oracle = cache.load(w3, [address])[to_checksum_address(address)].get('ORACLE')
+    if oracle is None:
+        return None
+    decimals = cache.load(w3, [oracle], ORACLE_CONSTANTS)[oracle].get('decimals')
+    round_ok, round_data = aggregate3(w3, [(oracle, encode_call("latestRoundData()"))], block_identifier)[0]
+    if not round_ok or len(round_data) < 64 or decimals is None:
+        return None
+    price = int.from_bytes(round_data[32:64], 'big', signed=True)
+    return normalize_price(price, decimals) if price > 0 else None
+
+def main():
+    """Dump a market's cohort and predict its payouts at the current oracle price"""
+    from keeper_bot_iter import CONTRACTS, session
+
+    if len(sys.argv) < 2 or sys.argv[1] not in CONTRACTS:
+        print("Usage: python cohort_reader.py <contract_name> [cohort_id]")
+        print("Available contracts:")
+        for name in CONTRACTS:
+            print(f"  - {name}")
+        return
+
+    name = sys.argv[1]
+    cohort_id = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    contracts, _ = session.connect()
+    contract_info = contracts[name]
+
+    started = time.time()
+    cohort = read_cohort(session.w3, contract_info['address'], cohort_id)
+    elapsed = time.time() - started
+    print(f"[{name}] Cohort {cohort['cohort_id']}: {cohort['size']} trades at block "
+          f"{cohort['block_number']} read in {elapsed * 1000:.0f} ms")
+
+    price = read_oracle_price(session.w3, contract_info['address'], cohort['block_number'])
+    if price is None or cohort['size'] == 0 or not cohort['active']:
+        return
+    address = to_checksum_address(contract_info['address'])
+    trade_size = get_metadata_cache().load(session.w3, [address])[address]['TRADE_SIZE']
+    owners = owner_addresses(cohort['owners'])
+    outcome = simulate_settlement(cohort['predictions'], owners, price, trade_size)
+    print(f"[{name}] At settlement price {price / 10**18:.2f}: {outcome['winners']} winners")
+    for owner, amount in sorted(outcome['claim_deltas'].items(), key=lambda item: -item[1]):
+        print(f"  {owner}: +{amount / 1e18} ETH")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+TopCut Keeper Daemon
+Settlement and reward claiming in one process: one session, one nonce stream, claims between deadlines
+"""
+
+import os
+import sys
+import time
+
+import keeper_bot_iter as keeper
+import reward_claimer_iter as claimer
+from metrics import cycle, start_metrics_server
+
+claim_interval = int(os.getenv("CLAIM_INTERVAL", "300"))  # Seconds between reward claim checks
+claim_min_gap = int(os.getenv("CLAIM_MIN_GAP", "30"))  # Seconds that must remain before the next settlement window
+min_claim_amount_eth = float(os.getenv("MIN_CLAIM_AMOUNT", "0.001"))  # Smallest claim worth sending
+
+class IdleClaimer:
+    """Idle task of run_scheduled() that checks and sends reward claims every claim_interval
+
+    A check only starts if the next settlement window is at least min_gap seconds away, so
+    claims never delay a settlement. Claims use the keeper's session, so their nonces come
+    from the same allocator and their receipts ride in the same per-block batch.
+    """
+
+    def __init__(self, interval=300, min_gap=30, min_claim_amount_eth=0.001):
+        self.interval = interval
+        self.min_gap = min_gap
+        self.min_claim_amount_eth = min_claim_amount_eth
+        self.next_run = 0
+
+    def __call__(self, seconds_until_window):
+        now = time.time()
+        if now < self.next_run:
+            return self.next_run - now
+        if seconds_until_window is not None and seconds_until_window < self.min_gap:
+            return None  # Checked again once the window is over
+        print("\nChecking for claimable rewards...")
+        with cycle("claimer"):
+            claimer.check_and_claim(self.min_claim_amount_eth, wait=False)
+        self.next_run = time.time() + self.interval
+        return self.interval
+
+def run_daemon(prearm=False, window=10, poll_interval=0.25):
+    """Run settlements on their deadlines and reward claims in the gaps between them"""
+    if claimer.session is not keeper.session:
+        raise RuntimeError("Keeper and claimer must share one session")
+    print("Starting TopCut Keeper Daemon (settlement + reward claiming)...")
+    print(f"Reward claims every {claim_interval} seconds when no settlement is due within {claim_min_gap} seconds")
+    idle_claimer = IdleClaimer(claim_interval, claim_min_gap, min_claim_amount_eth)
+    try:
+        keeper.run_scheduled(window, poll_interval, prearm=prearm, idle_task=idle_claimer)
+    finally:
+        keeper.session.close()
+
+if __name__ == "__main__":
+    if keeper.metrics_port:
+        start_metrics_server(int(keeper.metrics_port))
+
+    mode = sys.argv[1] if len(sys.argv) > 1 else "schedule"
+    if mode in ("schedule", "prearm"):
+        run_daemon(prearm=mode == "prearm")
+    else:
+        print("Usage:")
+        print("  python daemon.py            # Settle on deadlines, claim rewards in between")
+        print("  python daemon.py prearm     # Same, with settlements pre-signed before the deadline")
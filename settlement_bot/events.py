@@ -0,0 +1,81 @@
+"""
+TopCut Market Events
+Decode CohortSettled / PredictionPosted logs and apply them to in-memory market state
+"""
+
+from eth_abi import decode
+from eth_utils import event_signature_to_log_topic, to_checksum_address
+
+COHORT_SETTLED_TOPIC = "0x" + event_signature_to_log_topic(
+    "CohortSettled(uint256,uint256,uint256,uint256)").hex()
+PREDICTION_POSTED_TOPIC = "0x" + event_signature_to_log_topic(
+    "PredictionPosted(address,uint256,uint256)").hex()
+
+MARKET_EVENT_TOPICS = [COHORT_SETTLED_TOPIC, PREDICTION_POSTED_TOPIC]
+
+def _to_bytes(value):
+    if isinstance(value, str):
+        return bytes.fromhex(value[2:] if value.startswith("0x") else value)
+    return bytes(value)
+
+def _to_int(value):
+    return int(value, 16) if isinstance(value, str) else int(value)
+
+def decode_market_log(log):
+    """Decode a raw JSON-RPC log of a TopCut market, None for unrelated logs"""
+    topics = ["0x" + _to_bytes(topic).hex() for topic in log['topics']]
+    if not topics:
+        return None
+
+    event = {
+        'address': to_checksum_address(log['address']),
+        'block_number': _to_int(log['blockNumber']),
+        'log_index': _to_int(log['logIndex']),
+        'transaction_hash': "0x" + _to_bytes(log['transactionHash']).hex(),
+        'removed': bool(log.get('removed', False)),
+    }
+
+    if topics[0] == COHORT_SETTLED_TOPIC:
+        cohort_size, winners, settlement_price, settlement_time = decode(
+            ['uint256', 'uint256', 'uint256', 'uint256'], _to_bytes(log['data']))
+        event.update({
+            'event': 'CohortSettled',
+            'cohort_size': cohort_size,
+            'winners': winners,
+            'settlement_price': settlement_price,
+            'settlement_time': settlement_time,
+        })
+        return event
+
+    if topics[0] == PREDICTION_POSTED_TOPIC:
+        event.update({
+            'event': 'PredictionPosted',
+            'user': to_checksum_address(_to_bytes(topics[1])[-20:]),
+            'settlement_time': int.from_bytes(_to_bytes(topics[2]), 'big'),
+            'price': decode(['uint256'], _to_bytes(log['data']))[0],
+        })
+        return event
+
+    return None
+
+def apply_market_event(state, event, trade_duration):
+    """Update a market state dict (see multicall.get_markets_state) with a decoded event"""
+    # Logs up to the block of the last direct read are already part of the state
+    if 'log_index' in event and event['block_number'] <= state.get('snapshot_block', -1):
+        return state
+
+    if event['event'] == 'CohortSettled':
+        # Already rolled over (e.g. applied locally right after our own settlement)
+        if event['settlement_time'] < state['next_settlement']:
+            return state
+        # settleCohort rolls nextSettlement over and swaps the active cohort
+        settled_id = state['active_cohort_id']
+        state['next_settlement'] = event['settlement_time'] + trade_duration
+        state['active_cohort_id'] = 1 if settled_id == 2 else 2
+        state[f'cohort_size_{settled_id}'] = 0
+    elif event['event'] == 'PredictionPosted':
+        # Predictions always go into the cohort that is not waiting for settlement
+        open_id = 1 if state['active_cohort_id'] == 2 else 2
+        state[f'cohort_size_{open_id}'] += 1
+    state['block_number'] = max(state.get('block_number') or 0, event['block_number'])
+    return state
@@ -0,0 +1,144 @@
+"""
+TopCut Fast Status
+Reward status of all markets from one JSON-RPC batch, without importing web3 or eth_account
+"""
+
+import json
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+
+from fee_engine import FeeEngine
+from registry import MarketRegistry, default_registry_path
+from rpc_codec import (DEFAULT_CLAIM_GAS, GAS_MARGIN, MULTICALL3_ADDRESS, decode_aggregate3, decode_uint,
+                       encode_aggregate3, rpc_batch)
+
+# Precomputed 4-byte selectors, so no keccak implementation has to be imported
+KEEPER_REWARDS_SELECTOR = "e08f3049"  # keeperRewards(address)
+GET_ETH_BALANCE_SELECTOR = "4d2301cc"  # getEthBalance(address)
+TOTAL_PENDING_CLAIMS_SELECTOR = "70bf2381"  # totalPendingClaims()
+
+def _call(selector, address=None):
+    return bytes.fromhex(selector + (address[2:].lower().rjust(64, "0") if address else ""))
+
+def _key_address(private_key):
+    from eth_keys import keys  # A fraction of eth_account's import time
+    private_key = private_key[2:] if private_key.startswith("0x") else private_key
+    return keys.PrivateKey(bytes.fromhex(private_key)).public_key.to_checksum_address()
+
+def account_addresses():
+    """Main account (ACCOUNT, or derived from PRIVATEKEY) followed by the keys of PRIVATEKEYS"""
+    private_key = os.getenv("PRIVATEKEY", "").strip()
+    addresses = [os.getenv("ACCOUNT") or _key_address(private_key)]
+    for key in os.getenv("PRIVATEKEYS", "").split(","):
+        key = key.strip()
+        if key and key != private_key and _key_address(key) not in addresses:
+            addresses.append(_key_address(key))
+    return addresses
+
+def claim_gas():
+    """Claim gas limit from the gas model cache, read as plain JSON to avoid importing NumPy"""
+    path = os.getenv("GAS_MODEL_PATH", os.path.join(os.path.dirname(__file__), "gas_model.json"))
+    margin = float(os.getenv("GAS_LIMIT_MARGIN", str(GAS_MARGIN)))
+    try:
+        with open(path, 'r') as f:
+            return int(json.load(f).get('claim_gas', DEFAULT_CLAIM_GAS) * margin)
+    except Exception:
+        return int(DEFAULT_CLAIM_GAS * margin)
+
+def read_status(url, markets, accounts):
+    """Keeper rewards, balance and pending claims of every market plus the account balance and fees
+
+    Keeper rewards and balances are the sums over all accounts. The fees come from an
+    eth_feeHistory read in the same batch, with the fee engine's math of the full path.
+    """
+    calls = []
+    for address in markets.values():
+        for account in accounts:
+            calls.append((address, _call(KEEPER_REWARDS_SELECTOR, account)))
+        calls.append((MULTICALL3_ADDRESS, _call(GET_ETH_BALANCE_SELECTOR, address)))
+        calls.append((address, _call(TOTAL_PENDING_CLAIMS_SELECTOR)))
+    for account in accounts:
+        calls.append((MULTICALL3_ADDRESS, _call(GET_ETH_BALANCE_SELECTOR, account)))
+
+    fee_engine = FeeEngine(None)
+    results = rpc_batch(None, url, [
+        ("eth_call", [{'to': MULTICALL3_ADDRESS, 'data': "0x" + encode_aggregate3(calls).hex()}, 'latest']),
+        fee_engine.history_call(),
+    ])
+    for result in results:
+        if isinstance(result, Exception):
+            raise result
+    raw_result, history = results
+    fee_engine.ingest(history)
+    values = [decode_uint(*result) for result in decode_aggregate3(bytes.fromhex(raw_result[2:]))]
+    status = {}
+    stride = len(accounts) + 2
+    for index, name in enumerate(markets):
+        market_values = values[stride * index:stride * (index + 1)]
+        status[name] = None if None in market_values else {
+            'keeper_rewards': sum(market_values[:-2]),
+            'contract_balance': market_values[-2],
+            'total_pending_claims': market_values[-1],
+        }
+    balances = values[stride * len(markets):]
+    return status, None if None in balances else sum(balances), fee_engine.get_fees(fee_engine.newest_block)
+
+def main(argv=None):
+    """Print the reward status like `reward_claimer_iter.py status`, returns the exit code"""
+    argv = sys.argv[1:] if argv is None else argv
+    started = time.perf_counter()
+    load_dotenv()
+    url = os.getenv("infura_api_key")
+    markets = MarketRegistry(default_registry_path()).select(os.getenv("MARKET_FILTER"), os.getenv("MARKET_SHARD"))
+    if argv and argv[0] in markets:
+        markets = {argv[0]: markets[argv[0]]}
+    accounts = account_addresses()
+
+    try:
+        status, account_balance, fees = read_status(url, markets, accounts)
+    except Exception as e:
+        print(f"Error showing status: {e}")
+        return 1
+
+    print(f"\nChecking rewards for account{'s' if len(accounts) > 1 else ''}: {', '.join(accounts)}")
+    print("\n" + "=" * 60)
+    print("REWARD STATUS FOR ALL CONTRACTS" if len(markets) > 1 else f"REWARD STATUS FOR {next(iter(markets), '').upper()}")
+    print("=" * 60)
+
+    # Same expected price per gas as estimate_gas_cost() of the full path
+    gas_cost = claim_gas() * fees['effective_gas_price']
+    total_claimable = 0
+    profitable_contracts = 0
+    for name, address in markets.items():
+        print(f"\n[{name}] Contract: {address}")
+        info = status[name]
+        if info is None:
+            print(f"[{name}] Failed to get reward info")
+            continue
+        # Same rule as calculate_claimable_amount(): ETH owed to traders cannot be withdrawn
+        claimable_amount = min(info['keeper_rewards'], max(info['contract_balance'] - info['total_pending_claims'], 0))
+        print(f"[{name}] Keeper rewards: {info['keeper_rewards'] / 1e18:.6f} ETH")
+        print(f"[{name}] Contract balance: {info['contract_balance'] / 1e18:.6f} ETH")
+        if info['total_pending_claims']:
+            print(f"[{name}] Pending trader claims: {info['total_pending_claims'] / 1e18:.6f} ETH")
+        print(f"[{name}] Claimable amount: {claimable_amount / 1e18:.6f} ETH")
+        if claimable_amount > 0:
+            print(f"[{name}] Estimated gas cost: {gas_cost / 1e18:.6f} ETH")
+            print(f"[{name}] Net profit: {(claimable_amount - gas_cost) / 1e18:.6f} ETH")
+        total_claimable += claimable_amount / 1e18
+        profitable_contracts += claimable_amount / 1e18 > 0.001
+
+    print(f"\n--- SUMMARY ---")
+    if account_balance is not None:
+        print(f"Account balance: {account_balance / 1e18:.6f} ETH")
+    print(f"Total claimable across all contracts: {total_claimable:.6f} ETH")
+    print(f"Contracts with claimable rewards (>0.001 ETH): {profitable_contracts}/{len(markets)}")
+    print(f"Status read in {(time.perf_counter() - started) * 1000:.0f} ms")
+    print("=" * 60)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""
+TopCut Fee Engine
+EIP-1559 fees from one shared eth_feeHistory sample per block
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+
+REWARD_PERCENTILE = float(os.getenv("FEE_REWARD_PERCENTILE", "50"))  # Priority fee percentile within each block
+BASE_FEE_MULTIPLIER = float(os.getenv("FEE_BASE_MULTIPLIER", "2"))  # Headroom on the next base fee for maxFeePerGas
+HISTORY_BLOCKS = int(os.getenv("FEE_HISTORY_BLOCKS", "20"))  # Blocks kept in the ring buffer
+REFRESH_INTERVAL = float(os.getenv("FEE_REFRESH_INTERVAL", "2"))  # Seconds a sample is reused when the block is unknown
+
+class FeeEngine:
+    """Computes maxFeePerGas / maxPriorityFeePerGas from a ring buffer of recent blocks"""
+
+    def __init__(self, w3, reward_percentile=REWARD_PERCENTILE, base_fee_multiplier=BASE_FEE_MULTIPLIER,
+                 history_blocks=HISTORY_BLOCKS, refresh_interval=REFRESH_INTERVAL):
+        self.w3 = w3
+        self.reward_percentile = reward_percentile
+        self.base_fee_multiplier = base_fee_multiplier
+        self.history_blocks = history_blocks
+        self.refresh_interval = refresh_interval
+        self.rewards = deque(maxlen=history_blocks)  # (block number, priority fee at the percentile)
+        self.newest_block = None
+        self.next_base_fee = None
+        self.sampled_at = 0
+        self.lock = threading.Lock()
+
+    def _is_fresh(self, block_number):
+        if self.newest_block is None:
+            return False
+        if block_number is not None:
+            return block_number <= self.newest_block
+        return time.time() - self.sampled_at < self.refresh_interval
+
+    def _block_count(self, block_number):
+        """Only ask for blocks that are not in the ring buffer yet"""
+        if self.newest_block is None or block_number is None:
+            return self.history_blocks
+        return max(1, min(block_number - self.newest_block, self.history_blocks))
+
+    def _ingest(self, history):
+        oldest = history['oldestBlock']
+        oldest = int(oldest, 16) if isinstance(oldest, str) else oldest
+        base_fees = [int(fee, 16) if isinstance(fee, str) else fee for fee in history['baseFeePerGas']]
+        for offset, rewards in enumerate(history.get('reward') or []):
+            block_number = oldest + offset
+            if self.newest_block is not None and block_number <= self.newest_block:
+                continue
+            reward = rewards[0] if rewards else 0
+            self.rewards.append((block_number, int(reward, 16) if isinstance(reward, str) else reward))
+        # baseFeePerGas has one extra entry: the base fee of the block after the newest one
+        self.newest_block = oldest + len(base_fees) - 2
+        self.next_base_fee = base_fees[-1]
+        self.sampled_at = time.time()
+
+    def _fees(self):
+        rewards = sorted(reward for _, reward in self.rewards)
+        priority_fee = rewards[len(rewards) // 2] if rewards else 0
+        max_fee = int(self.next_base_fee * self.base_fee_multiplier) + priority_fee
+        return {
+            'max_fee_per_gas': max_fee,
+            'max_priority_fee_per_gas': priority_fee,
+            'base_fee': self.next_base_fee,
+            # What a transaction in the next block is expected to pay per gas
+            'effective_gas_price': self.next_base_fee + priority_fee,
+            'block_number': self.newest_block,
+        }
+
+    def get_fees(self, block_number=None):
+        """Current fee estimate; reads eth_feeHistory at most once per block (or refresh interval)"""
+        with self.lock:
+            if not self._is_fresh(block_number):
+                history = self.w3.eth.fee_history(self._block_count(block_number), 'latest',
+                                                  [self.reward_percentile])
+                self._ingest(history)
+            return self._fees()
+
+    def history_call(self, block_number=None):
+        """(method, params) of the eth_feeHistory read get_fees() would make, None while fresh
+
+        Lets a caller put the read into its own JSON-RPC batch and hand the result to ingest().
+        """
+        with self.lock:
+            if self._is_fresh(block_number):
+                return None
+            return ("eth_feeHistory", [hex(self._block_count(block_number)), 'latest', [self.reward_percentile]])
+
+    def ingest(self, history):
+        """Add an eth_feeHistory result that was read by the caller"""
+        with self.lock:
+            self._ingest(history)
+
+class AsyncFeeEngine(FeeEngine):
+    """FeeEngine for an AsyncWeb3 instance, concurrent callers share one eth_feeHistory read"""
+
+    def __init__(self, w3, **kwargs):
+        super().__init__(w3, **kwargs)
+        # Held across the await, self.lock stays a threading.Lock for history_call() and ingest()
+        self.fetch_lock = asyncio.Lock()
+
+    async def get_fees(self, block_number=None):
+        async with self.fetch_lock:
+            with self.lock:
+                fresh = self._is_fresh(block_number)
+                block_count = self._block_count(block_number)
+            if not fresh:
+                history = await self.w3.eth.fee_history(block_count, 'latest', [self.reward_percentile])
+                self.ingest(history)
+            with self.lock:
+                return self._fees()
+
+def fee_fields(fees):
+    """Transaction fields for a fee estimate"""
+    return {
+        'maxFeePerGas': fees['max_fee_per_gas'],
+        'maxPriorityFeePerGas': fees['max_priority_fee_per_gas'],
+    }
+
+_fee_engines = {}
+
+def get_fee_engine(w3):
+    """Process-wide fee engine per provider, shared by settlements and claims"""
+    from web3 import AsyncWeb3  # Kept out of the imports of fast_status.py, which only uses FeeEngine
+
+    if id(w3) not in _fee_engines:
+        _fee_engines[id(w3)] = AsyncFeeEngine(w3) if isinstance(w3, AsyncWeb3) else FeeEngine(w3)
+    return _fee_engines[id(w3)]
@@ -0,0 +1,127 @@
+"""
+TopCut Gas Model
+Gas limits from eth_estimateGas with a safety margin, backed by a fitted gas-vs-cohort-size model
+"""
+
+import json
+import math
+import os
+import threading
+
+import numpy as np
+
+from rpc_codec import DEFAULT_CLAIM_GAS, GAS_MARGIN
+from settlement_replica import cohort_winners
+
+MAX_OBSERVATIONS = 200  # Receipts kept per transaction kind for fitting
+
+# Default settleCohort model: base + per trade (2 cold SLOADs + loop) + per winner (claimAmounts SSTORE)
+# + per _findMaxIndex scan step (expected replacements ~ winners * (1 + ln(size / winners)), each scanning all winners)
+DEFAULT_SETTLE_COEFFICIENTS = [150_000, 7_000, 25_000, 40]
+
+def settle_features(cohort_size):
+    """Features of the settleCohort gas model for a cohort size"""
+    winners = cohort_winners(cohort_size)
+    scan_steps = winners * winners * (1 + math.log(cohort_size / winners)) if winners else 0
+    return [1.0, float(cohort_size), float(winners), scan_steps]
+
+class GasModel:
+    """Predicts gas per transaction kind, refitted from mined receipts and cached as JSON"""
+
+    def __init__(self, path, margin=GAS_MARGIN):
+        self.path = path
+        self.margin = margin
+        self.lock = threading.Lock()
+        self.observations = {'settle': [], 'claim': []}  # kind -> [[cohort_size, gas_used]]
+        self.settle_coefficients = list(DEFAULT_SETTLE_COEFFICIENTS)
+        self.claim_gas = DEFAULT_CLAIM_GAS
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as f:
+                cached = json.load(f)
+            self.observations.update(cached.get('observations', {}))
+            self.settle_coefficients = cached.get('settle_coefficients', self.settle_coefficients)
+            self.claim_gas = cached.get('claim_gas', self.claim_gas)
+        except Exception as e:
+            print(f"Ignoring unreadable gas model cache {self.path}: {e}")
+
+    def _save(self):
+        if not self.path:
+            return
+        with open(self.path, 'w') as f:
+            json.dump({
+                'settle_coefficients': self.settle_coefficients,
+                'claim_gas': self.claim_gas,
+                'observations': self.observations,
+            }, f)
+
+    def _fit(self):
+        settles = self.observations['settle']
+        if settles:
+            features = np.array([settle_features(size) for size, _ in settles])
+            gas_used = np.array([gas for _, gas in settles], dtype=np.float64)
+            coefficients = None
+            # A full fit needs enough distinct cohort sizes, otherwise only rescale the default model
+            if len({size for size, _ in settles}) >= 2 * len(DEFAULT_SETTLE_COEFFICIENTS):
+                coefficients = np.linalg.lstsq(features, gas_used, rcond=None)[0]
+                if (coefficients < 0).any():
+                    coefficients = None
+            if coefficients is None:
+                default = features @ np.array(DEFAULT_SETTLE_COEFFICIENTS, dtype=np.float64)
+                coefficients = np.array(DEFAULT_SETTLE_COEFFICIENTS) * float(np.median(gas_used / default))
+            self.settle_coefficients = [float(c) for c in coefficients]
+
+        claims = self.observations['claim']
+        if claims:
+            self.claim_gas = int(max(gas for _, gas in claims))
+
+    def observe(self, kind, cohort_size, gas_used):
+        """Record the gasUsed of a mined transaction and refit"""
+        with self.lock:
+            observations = self.observations[kind]
+            observations.append([int(cohort_size), int(gas_used)])
+            del observations[:-MAX_OBSERVATIONS]
+            self._fit()
+            try:
+                self._save()
+            except Exception as e:
+                print(f"Failed to save gas model cache {self.path}: {e}")
+
+    def predict(self, kind, cohort_size=0):
+        """Gas limit for a transaction kind including the safety margin"""
+        if kind == 'claim':
+            gas = self.claim_gas
+        else:
+            gas = float(np.dot(settle_features(cohort_size), self.settle_coefficients))
+        return int(gas * self.margin)
+
+    def estimate(self, estimate_gas, kind, cohort_size=0):
+        """eth_estimateGas result with margin, falling back to the model, returns (gas_limit, source)"""
+        try:
+            return int(estimate_gas() * self.margin), 'eth_estimateGas'
+        except Exception as e:
+            print(f"Gas estimation failed ({e}), using the {kind} gas model")
+            return self.predict(kind, cohort_size), 'model'
+
+    async def estimate_async(self, estimate_gas, kind, cohort_size=0):
+        """estimate for an awaitable eth_estimateGas call"""
+        try:
+            return int(await estimate_gas() * self.margin), 'eth_estimateGas'
+        except Exception as e:
+            print(f"Gas estimation failed ({e}), using the {kind} gas model")
+            return self.predict(kind, cohort_size), 'model'
+
+_gas_model = None
+
+def get_gas_model():
+    """Process-wide gas model, cached at GAS_MODEL_PATH (default gas_model.json next to the scripts)"""
+    global _gas_model
+    if _gas_model is None:
+        path = os.getenv("GAS_MODEL_PATH", os.path.join(os.path.dirname(__file__), "gas_model.json"))
+        margin = float(os.getenv("GAS_LIMIT_MARGIN", str(GAS_MARGIN)))
+        _gas_model = GasModel(path, margin)
+    return _gas_model
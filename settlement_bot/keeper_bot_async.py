@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+TopCut Keeper Bot - Concurrent Settlement Engine
+asyncio version of keeper_bot_iter.py: every market is checked and settled in its own task
+"""
+
+import asyncio
+import os
+import sys
+from datetime import datetime, timezone
+from web3 import AsyncWeb3
+from web3.exceptions import TimeExhausted
+
+from keeper_bot_iter import (
+    CONTRACTS,
+    infura_api_key,
+    private_key,
+    private_keys,
+    signer_policy,
+    load_abi,
+    abi_path,
+    can_settle,
+    active_cohort_size,
+    calculate_costs_and_rewards,
+)
+from events import apply_market_event
+from multicall import async_get_markets_state, async_get_markets_uint
+from preflight import abi_errors, async_simulate_settlement
+from ws_transport import WsMarketFeed
+from nonce_manager import AsyncNonceManager
+from signer_pool import SignerPool, parse_keys
+from gas_model import get_gas_model
+from fee_engine import get_fee_engine, fee_fields
+
+# Variables
+max_concurrency = int(os.getenv("KEEPER_CONCURRENCY", "8"))  # Markets simulating, signing and sending at the same time
+settle_timeout = int(os.getenv("KEEPER_SETTLE_TIMEOUT", "300"))  # Seconds to send a settlement, and again to wait for its receipt
+ws_url = os.getenv("WS_URL")  # WebSocket RPC endpoint for the subscription mode, e.g. wss://arbitrum-mainnet.infura.io/ws/v3/<key>
+
+def setup_async_contracts():
+    """Setup AsyncWeb3 provider, contract instances, the signer pool and one nonce allocator per key"""
+    w3 = AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(f"{infura_api_key}"))
+    abi = load_abi()
+    contracts = {}
+
+    for name, address in CONTRACTS.items():
+        try:
+            contracts[name] = {
+                'contract': w3.eth.contract(address=address, abi=abi),
+                'address': address
+            }
+        except Exception as e:
+            print(f"ERROR: Failed to setup contract '{name}' at {address}: {e}")
+
+    signers = SignerPool(parse_keys(private_key, private_keys), signer_policy)
+    nonce_managers = {account.address: AsyncNonceManager(w3, account.address) for account in signers.accounts}
+    return w3, contracts, signers, nonce_managers
+
+def print_signers(signers):
+    print(f"Using account: {signers.accounts[0].address}")
+    if len(signers.accounts) > 1:
+        print(f"Signer pool: {len(signers.accounts)} keys, {signers.policy} assignment")
+
+async def send_settlement_async(w3, contract_info, contract_name, account, nonce_manager, state):
+    """Sign and send the settlement of one market, returns (tx hash, cohort size)"""
+    contract = contract_info['contract']
+
+    fees = await get_fee_engine(w3).get_fees(state.get('block_number'))
+    cohort_size = active_cohort_size(state)
+    gas_limit, _ = await get_gas_model().estimate_async(
+        lambda: contract.functions.settleCohort().estimate_gas({'from': account.address}),
+        'settle', cohort_size)
+    cost_info = calculate_costs_and_rewards(state, fees['effective_gas_price'], gas_limit)
+
+    print(f"[{contract_name}] Settlement ready! Active cohort: {state['active_cohort_id']}")
+    print(f"[{contract_name}] Cohort size: {cost_info['active_cohort_size']}")
+    print(f"[{contract_name}] Estimated reward: {cost_info['estimated_reward']/1e18} ETH")
+    print(f"[{contract_name}] Estimated gas cost: {cost_info['estimated_gas_cost']/1e18} ETH")
+
+    # Nonces come from the local allocator, so market tasks never wait on each other to send
+    nonce = await nonce_manager.allocate()
+    try:
+        transaction = await contract.functions.settleCohort().build_transaction({
+            'from': account.address,
+            'gas': cost_info['gas_limit'],
+            **fee_fields(fees),
+            'nonce': nonce,
+        })
+        signed_txn = account.sign_transaction(transaction)
+        tx_hash = await w3.eth.send_raw_transaction(signed_txn.rawTransaction)
+    except Exception as e:
+        nonce_manager.handle_send_error(nonce, e)
+        raise
+
+    print(f"[{contract_name}] Settlement transaction sent: {tx_hash.hex()} (nonce {nonce})")
+    return tx_hash, cohort_size
+
+async def wait_for_settlement_async(w3, contract_name, tx_hash, cohort_size):
+    """Wait up to settle_timeout for the receipt of a sent settlement"""
+    receipt = await w3.eth.wait_for_transaction_receipt(tx_hash, timeout=settle_timeout)
+    if receipt.status == 1:
+        print(f"[{contract_name}] Settlement successful! Gas used: {receipt.gasUsed}")
+        get_gas_model().observe('settle', cohort_size, receipt.gasUsed)
+        return tx_hash.hex()
+
+    print(f"[{contract_name}] Settlement failed! Transaction: {tx_hash.hex()}")
+    return None
+
+async def check_single_contract_async(w3, contract_info, contract_name, account, nonce_manager,
+                                      state, semaphore):
+    """Check and potentially settle a single contract
+
+    The semaphore only bounds simulating, signing and sending. The receipt is awaited after
+    it is released, so markets waiting for receipts never hold back other due markets.
+    """
+    try:
+        async with semaphore:
+            if not state:
+                print(f"[{contract_name}] Failed to get contract state")
+                return None
+
+            settlement_time = datetime.fromtimestamp(state['next_settlement'], timezone.utc)
+            print(f"[{contract_name}] Active cohort: {state['active_cohort_id']}, settlement time: {settlement_time}")
+
+            if not can_settle(state):
+                time_until = state['next_settlement'] - state['current_timestamp']
+                print(f"[{contract_name}] Settlement not ready. Time remaining: {time_until} seconds ({time_until/3600:.2f} hours)")
+                return None
+
+            # Simulated at the pending block first, a reverting settlement is left for the next check
+            error = await async_simulate_settlement(w3, contract_info['address'], account.address,
+                                                    abi_errors(abi_path))
+            if error:
+                print(f"[{contract_name}] Settlement would revert with {error}, skipping")
+                return None
+
+            tx_hash, cohort_size = await asyncio.wait_for(
+                send_settlement_async(w3, contract_info, contract_name, account, nonce_manager, state),
+                timeout=settle_timeout
+            )
+        return await wait_for_settlement_async(w3, contract_name, tx_hash, cohort_size)
+    except (asyncio.TimeoutError, TimeExhausted):
+        # The settlement may still be pending, resync the nonce before the next send
+        nonce_manager.mark_stale()
+        print(f"[{contract_name}] Settlement timed out after {settle_timeout} seconds")
+    except Exception as e:
+        print(f"[{contract_name}] Error in check_single_contract: {e}")
+    return None
+
+async def check_with_signer_async(w3, contract_info, contract_name, signers, nonce_managers, account,
+                                  state, semaphore):
+    """check_single_contract_async with a key of the signer pool and that key's nonce allocator
+
+    The settlement counts towards the key's load until its receipt arrived, which is what
+    the least_loaded policy balances.
+    """
+    signers.begin(account)
+    try:
+        return await check_single_contract_async(w3, contract_info, contract_name, account,
+                                                 nonce_managers[account.address], state, semaphore)
+    finally:
+        signers.finish(account)
+
+async def run_once_async(w3, contracts, signers, nonce_managers):
+    """Check all contracts concurrently, cycle time is set by the slowest market
+
+    Every market is sent from the key the signer pool assigns to it, so the keys send in
+    parallel from their own nonce sequences and a stuck key only holds up its own markets.
+    """
+    print("=" * 60)
+    print("Checking settlement status for all contracts...")
+    print("=" * 60)
+
+    try:
+        states = await async_get_markets_state(w3, contracts)
+    except Exception as e:
+        print(f"Error getting contract states: {e}")
+        return None
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+    names = list(contracts)
+    assigned = signers.assign([contracts[name]['address'] for name in names])
+    tasks = [
+        asyncio.create_task(check_with_signer_async(
+            w3, contracts[name], name, signers, nonce_managers, assigned[contracts[name]['address']],
+            states.get(name), semaphore
+        ))
+        for name in names
+    ]
+
+    try:
+        results = dict(zip(names, await asyncio.gather(*tasks)))
+    except asyncio.CancelledError:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+    print("\n" + "=" * 60)
+    print("SUMMARY:")
+    for contract_name, result in results.items():
+        if result:
+            print(f"✓ {contract_name}: Settlement successful - {result}")
+        else:
+            print(f"✗ {contract_name}: No settlement")
+    successful_settlements = sum(1 for r in results.values() if r)
+    print(f"Total successful settlements: {successful_settlements}/{len(contracts)}")
+    print("=" * 60)
+
+    return results
+
+async def run_continuously_async(check_interval=30):
+    """Run the concurrent keeper continuously for all contracts"""
+    w3, contracts, signers, nonce_managers = setup_async_contracts()
+    print(f"Connected to Arbitrum. Chain ID: {await w3.eth.chain_id}")
+    print_signers(signers)
+    print(f"Monitoring {len(contracts)} contracts with up to {max_concurrency} concurrent tasks")
+    print(f"Check interval: {check_interval} seconds")
+    print("Press Ctrl+C to stop")
+
+    while True:
+        try:
+            await run_once_async(w3, contracts, signers, nonce_managers)
+            print(f"\nWaiting {check_interval} seconds before next check...")
+            await asyncio.sleep(check_interval)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Unexpected error: {e}")
+            print("Retrying in 60 seconds...")
+            await asyncio.sleep(60)
+
+async def run_single_contract_async(contract_name):
+    """Run settlement check for a single specific contract"""
+    w3, contracts, signers, nonce_managers = setup_async_contracts()
+    if contract_name not in contracts:
+        print(f"Error: Contract '{contract_name}' not found.")
+        print(f"Available contracts: {list(CONTRACTS.keys())}")
+        return None
+
+    selected = {contract_name: contracts[contract_name]}
+    results = await run_once_async(w3, selected, signers, nonce_managers)
+    return results.get(contract_name) if results else None
+
+async def run_ws_async(ws_url, retry_delay=60):
+    """Settle markets from newHeads / log subscriptions instead of polling"""
+    w3, contracts, signers, nonce_managers = setup_async_contracts()
+    print(f"Connected to Arbitrum. Chain ID: {await w3.eth.chain_id}")
+    print_signers(signers)
+
+    names_by_address = {info['address'].lower(): name for name, info in contracts.items()}
+    trade_durations = await async_get_markets_uint(w3, contracts, "TRADE_DURATION()")
+    semaphore = asyncio.Semaphore(max_concurrency)
+    states = {}
+    in_flight = {}
+    retry_after = {}
+    background = set()  # Strong references, the event loop only keeps weak ones to its tasks
+
+    def spawn(coroutine):
+        task = asyncio.create_task(coroutine)
+        background.add(task)
+        task.add_done_callback(background.discard)
+        return task
+
+    async def resync():
+        """Seed the in-memory state from one snapshot, also after reconnects and reorgs"""
+        for name, state in (await async_get_markets_state(w3, contracts)).items():
+            if state:
+                state['snapshot_block'] = state['block_number']
+            states[name] = state
+        print(f"Market state synced at block {max((s['block_number'] for s in states.values() if s), default=None)}")
+
+    async def settle(name, state):
+        try:
+            result = await check_with_signer_async(
+                w3, contracts[name], name, signers, nonce_managers,
+                signers.account_for(contracts[name]['address']), state, semaphore
+            )
+            if result and states.get(name):
+                # Roll over right away, the CohortSettled log may arrive after the next head
+                apply_market_event(states[name], {
+                    'event': 'CohortSettled',
+                    'settlement_time': state['next_settlement'],
+                    'block_number': state['block_number'],
+                }, trade_durations[name])
+            elif not result:
+                retry_after[name] = state['current_timestamp'] + retry_delay
+        finally:
+            in_flight.pop(name, None)
+
+    def on_head(block_number, timestamp):
+        # The exact block that crosses nextSettlement triggers the settlement
+        for name, state in states.items():
+            if not state:
+                continue
+            state['current_timestamp'] = timestamp
+            state['block_number'] = max(state['block_number'], block_number)
+            if (can_settle(state) and name not in in_flight
+                    and timestamp >= retry_after.get(name, 0)):
+                in_flight[name] = spawn(settle(name, dict(state)))
+
+    def on_event(event):
+        name = names_by_address.get(event['address'].lower())
+        if name is None or not states.get(name):
+            return
+        if event['removed']:
+            # Chain reorg - the incremental view can no longer be trusted
+            spawn(resync())
+            return
+        apply_market_event(states[name], event, trade_durations[name])
+        if event['event'] == 'CohortSettled':
+            print(f"[{name}] Cohort settled, next settlement at {states[name]['next_settlement']}")
+
+    feed = WsMarketFeed(ws_url, [info['address'] for info in contracts.values()],
+                        on_head, on_event, on_connect=resync)
+    try:
+        await feed.run()
+    finally:
+        for task in list(background):
+            task.cancel()
+
+async def run_once_main():
+    """Entry point for a single concurrent pass over all contracts"""
+    w3, contracts, signers, nonce_managers = setup_async_contracts()
+    return await run_once_async(w3, contracts, signers, nonce_managers)
+
+if __name__ == "__main__":
+    try:
+        if len(sys.argv) > 1:
+            if sys.argv[1] == "once":
+                results = asyncio.run(run_once_main())
+                if results:
+                    successful = sum(1 for r in results.values() if r)
+                    print(f"\nCompleted: {successful} successful settlements out of {len(results)} contracts")
+            elif sys.argv[1] == "single" and len(sys.argv) > 2:
+                asyncio.run(run_single_contract_async(sys.argv[2]))
+            elif sys.argv[1] == "ws":
+                if not ws_url:
+                    print("Error: set WS_URL in .env to use the subscription mode")
+                else:
+                    asyncio.run(run_ws_async(ws_url))
+            elif sys.argv[1].isdigit():
+                asyncio.run(run_continuously_async(int(sys.argv[1])))
+            else:
+                print("Usage:")
+                print("  python keeper_bot_async.py                    # Run continuously (30s interval)")
+                print("  python keeper_bot_async.py once               # Run once for all contracts")
+                print("  python keeper_bot_async.py single <name>      # Run once for specific contract")
+                print("  python keeper_bot_async.py <seconds>          # Run continuously with custom interval")
+                print("  python keeper_bot_async.py ws                 # React to newHeads / logs over WS_URL")
+                print(f"\nAvailable contracts: {list(CONTRACTS.keys())}")
+        else:
+            asyncio.run(run_continuously_async(30))
+    except KeyboardInterrupt:
+        print("\nStopping keeper bot...")
@@ -4,151 +4,240 @@ TopCut Keeper Bot - Automated Settlement Script
 Modified to use block.timestamp instead of time.time()
 """
 
-import json
 import time
 import os
+import queue
 from dotenv import load_dotenv
-from web3 import Web3
-from eth_account import Account
+from session import get_bot_session
+from registry import MarketRegistry, default_registry_path
+from state_mirror import get_market_mirror
+from multicall import get_markets_state
+from nonce_manager import get_nonce_manager
+from scheduler import SettlementScheduler
+from gas_model import get_gas_model
+from fee_engine import get_fee_engine, fee_fields
+from presigner import SettlementPresigner
+from tx_journal import get_journal, recover
+from settlement_guard import SettlementGuard
+from preflight import abi_errors, backoff_seconds, simulate_settlements
+from metrics import (CALL_SECONDS, PREFLIGHT_REVERTS, RECEIPT_SECONDS, SETTLEMENT_LAG, TRANSACTIONS, cycle,
+                     start_metrics_server, timed)
 
 # Variables
 load_dotenv()  # Load .env file
 infura_api_key = os.getenv("infura_api_key")  # Create account in Infura and get it
-w3 = Web3(Web3.HTTPProvider(f"{infura_api_key}"))
+rpc_urls = os.getenv("RPC_URLS")  # Optional comma-separated backup RPC endpoints, enables the provider pool
 private_key = os.getenv("PRIVATEKEY")  # Your wallet Private Key
+private_keys = os.getenv("PRIVATEKEYS")  # Optional comma-separated extra keeper keys, markets are spread across them
+signer_policy = os.getenv("SIGNER_POLICY", "hash")  # hash (fixed key per market) or least_loaded
 account_address = os.getenv("ACCOUNT")  # Your Account Address
+state_mirror_db = os.getenv("STATE_MIRROR_DB")  # Optional SQLite file of the event-sourced market state mirror
+state_mirror_reconcile = int(os.getenv("STATE_MIRROR_RECONCILE", "3600"))  # Seconds between mirror reconciliations
+cancel_lost_settlements = os.getenv("CANCEL_LOST_SETTLEMENTS", "1") != "0"  # Cancel pending settlements another keeper beat
+metrics_port = os.getenv("METRICS_PORT")  # Optional port of the Prometheus /metrics endpoint
+market_filter = os.getenv("MARKET_FILTER")  # Optional comma-separated market name patterns or addresses
+market_shard = os.getenv("MARKET_SHARD")  # Optional index/count, e.g. 0/3, to split the markets across bots
 
-# Contract addresses - moved from .env to file
+# Markets come from markets.json (python registry.py import/list), the docs list is the default
 # check the most up to date list of active markets in the docs
 # https://www.topcut.finance/docs/resources/smart-contracts
-CONTRACTS = {
-    "Market: BTC/USD, 24h, 0.01 ETH": "0x9A5f16c1f2d6b8c9530144aD23Cfa9B3c4717eF1",  
-    "Market: BTC/USD, 24h, 0.05 ETH": "0x8B64Cf63B08f7eB3ad163282bf61d382DfFF0586",  
-    "Market: BTC/USD, 7days (Monday), 0.01 ETH": "0x10EF281AAc569Cb011BfcB4e1C6cA490011486a5",  
-    "Market: BTC/USD, 7days (Wednesday), 0.01 ETH": "0xB8eC8622D8B7924337CA7B143683459fE5a13f79",  
-    "Market: BTC/USD, 7days (Friday), 0.01 ETH": "0xE8B9a818D57E2413E05144311E2d4d190c3f711c",
-}
+registry = MarketRegistry(default_registry_path())
+CONTRACTS = registry.select(market_filter, market_shard)
 
 current_directory = os.path.dirname(__file__)  # Get the current directory of the script
 abi_path = os.path.join(current_directory, "abi.json")
 
+# One session per process: provider, ABI, contracts and account are reused by every cycle (and both bots)
+session = get_bot_session(infura_api_key, private_key, CONTRACTS, abi_path,
+                          [url.strip() for url in rpc_urls.split(",") if url.strip()] if rpc_urls else None,
+                          private_keys, signer_policy)
+w3 = session.w3
+
 def load_abi():
     """Load contract ABI from abi.json"""
-    try:
-        with open(abi_path, 'r') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        print("ERROR: abi.json file not found!")
-        print("Please create abi.json with the full contract ABI")
-        exit(1)
+    return session.load_abi()
 
 def setup_contracts():
-    """Setup contract instance"""
-    try:
-        # Test connection by getting chain ID
-        chain_id = w3.eth.chain_id
-        print(f"Connected to Arbitrum. Chain ID: {chain_id}")
-    except Exception as e:
-        print(f"ERROR: Failed to connect to blockchain: {e}")
-        exit(1)
-    
-    abi = load_abi()
-    contracts = {}
-
-    # Create contract instances for each address
-    for name, address in CONTRACTS.items():
-        try:
-            contract = w3.eth.contract(address=address, abi=abi)
-            contracts[name] = {
-                'contract': contract,
-                'address': address
-            }
-            print(f"Setup contract '{name}' at {address}")
-        except Exception as e:
-            print(f"ERROR: Failed to setup contract '{name}' at {address}: {e}")
-    
-    account = Account.from_key(private_key)
-    print(f"Using account: {account.address}")
-    
-    return contracts, account
-
-def get_current_block_timestamp():
-    """Get the timestamp of the latest block (block.timestamp equivalent)"""
-    try:
-        latest_block = w3.eth.get_block('latest')
-        return latest_block.timestamp
-    except Exception as e:
-        print(f"Error getting latest block timestamp: {e}")
-        return None
+    """Setup contract instances once per process and reuse them"""
+    return session.connect()
 
+@timed("get_contract_state")
 def get_contract_state(contract):
     """Get current contract state"""
     try:
-        next_settlement = contract.functions.nextSettlement().call()
-        active_cohort_id = contract.functions.activeCohortID().call()
-        cohort_size_1 = contract.functions.cohortSize_1().call()
-        cohort_size_2 = contract.functions.cohortSize_2().call()
-        
-        # Use block.timestamp instead of time.time()
-        current_block_timestamp = get_current_block_timestamp()
-        if current_block_timestamp is None:
-            return None
-        
-        return {
-            'next_settlement': next_settlement,
-            'active_cohort_id': active_cohort_id,
-            'cohort_size_1': cohort_size_1,
-            'cohort_size_2': cohort_size_2,
-            'current_timestamp': current_block_timestamp 
-        }
+        # One Multicall3 round trip for all views and block.timestamp
+        state = get_markets_state(w3, {'market': {'address': contract.address}})['market']
+        if state is None:
+            print("Error getting contract state: view call failed")
+        return state
     except Exception as e:
         print(f"Error getting contract state: {e}")
         return None
 
+@timed("get_all_contract_states")
+def get_all_contract_states(contracts):
+    """Get current state of all contracts from a single block snapshot"""
+    try:
+        if state_mirror_db:
+            # Replay new market logs instead of reading every market
+            mirror = get_market_mirror(w3, contracts, state_mirror_db, state_mirror_reconcile,
+                                       [signer.address for signer in session.signers.accounts], session.batch)
+            return mirror.sync()
+        return get_markets_state(w3, contracts)
+    except Exception as e:
+        print(f"Error getting contract states: {e}")
+        return {}
+
 def can_settle(state):
     """Check if settlement is possible"""
     if not state:
         return False
     return state['current_timestamp'] >= state['next_settlement']
 
-def estimate_costs_and_rewards(contract, state):
-    """Estimate gas cost and potential keeper reward"""
+def preflight_settlements(contracts, senders):
+    """Simulate the settlements of {market name: account} at the pending block in one JSON-RPC batch
+
+    Only due markets are simulated, each in its own eth_call from the key that will send it,
+    so a large cohort hitting the node's gas cap only affects its own market. Returns
+    {name: ContractRevert or None}; reverting markets are backed off in preflight_backoff.
+    None if the simulation itself failed.
+    """
+    try:
+        errors = simulate_settlements(session.batch, {name: (contracts[name]['address'], account.address)
+                                                      for name, account in senders.items()}, abi_errors(abi_path))
+    except Exception as e:
+        print(f"Error simulating settlements: {e}")
+        return None
+    for name, error in errors.items():
+        if error:
+            delay = backoff_seconds(error)
+            print(f"[{name}] Settlement would revert with {error}, retrying in {delay:.0f} seconds")
+            PREFLIGHT_REVERTS.inc(kind='settle', error=error.name)
+            preflight_backoff[name] = time.time() + delay
+    return errors
+
+def active_cohort_size(state):
+    """Size of the cohort waiting for settlement"""
+    return state['cohort_size_2'] if state['active_cohort_id'] == 2 else state['cohort_size_1']
+
+def calculate_costs_and_rewards(state, gas_price, gas_limit=None):
+    """Calculate gas cost and potential keeper reward for a given gas price"""
+    # Get active cohort size
+    active_size = active_cohort_size(state)
+    
+    keeper_reward = int(1e14) # 0.0001 ETH for each user
+    min_keeper_reward = int(1e15)  # 0.001 ETH minimum
+    
+    estimated_reward = max(active_size * keeper_reward, min_keeper_reward)
+    
+    # Estimate gas cost, from the cohort-size gas model unless a limit was estimated
+    if gas_limit is None:
+        gas_limit = get_gas_model().predict('settle', active_size)
+    estimated_gas_cost = gas_limit * gas_price
+    
+    return {
+        'gas_price': gas_price,
+        'gas_limit': gas_limit,
+        'estimated_gas_cost': estimated_gas_cost,
+        'estimated_reward': estimated_reward,
+        'profit_estimate': estimated_reward - estimated_gas_cost,
+        'active_cohort_size': active_size
+    }
+
+@timed("estimate_costs_and_rewards")
+def estimate_costs_and_rewards(contract, state, account=None):
+    """Estimate gas cost and potential keeper reward of a settlement sent from account"""
     try:
-        # Get current gas price (with max limit)
-        current_gas_price = w3.eth.gas_price
-        gas_price = current_gas_price
-        gas_price = int(gas_price * 1.2)
-        
-        # Get active cohort size
-        active_cohort_size = (state['cohort_size_2'] if state['active_cohort_id'] == 2 
-                            else state['cohort_size_1'])
-        
-        keeper_reward = int(1e14) # 0.0001 ETH for each user
-        min_keeper_reward = int(1e15)  # 0.001 ETH minimum
-        
-        estimated_reward = max(active_cohort_size * keeper_reward, min_keeper_reward)
-        
-        # Estimate gas cost
-        gas_limit = 1_000_000  # Default gas limit
-        estimated_gas_cost = gas_limit * gas_price
-        
-        return {
-            'gas_price': gas_price,
-            'gas_limit': gas_limit,
-            'estimated_gas_cost': estimated_gas_cost,
-            'estimated_reward': estimated_reward,
-            'profit_estimate': estimated_reward - estimated_gas_cost,
-            'active_cohort_size': active_cohort_size
-        }
+        # EIP-1559 fees from the shared fee history, sampled once per block
+        fees = get_fee_engine(w3).get_fees(state.get('block_number'))
+        
+        gas_limit, source = get_gas_model().estimate(
+            lambda: contract.functions.settleCohort().estimate_gas({'from': (account or session.account).address}),
+            'settle', active_cohort_size(state))
+        print(f"Gas limit: {gas_limit} ({source})")
+        
+        cost_info = calculate_costs_and_rewards(state, fees['effective_gas_price'], gas_limit)
+        cost_info['fees'] = fees
+        return cost_info
     except Exception as e:
         print(f"Error estimating costs: {e}")
         return None
 
-def settle_cohort(contract, account):
-    """Attempt to settle the cohort"""
+def report_settlement(receipt, tx_hash_hex, account, cohort_size=None):
+    """Report the outcome of a settlement transaction, returns the tx hash if it succeeded"""
+    if receipt is None:
+        # Dropped or replaced - the local nonce counter has to follow the node again
+        get_nonce_manager(w3, account.address).mark_stale()
+        print(f"Settlement not mined within 300 seconds: {tx_hash_hex}")
+        return None
+    
+    if receipt.status == 1:
+        print(f"Settlement successful! Gas used: {receipt.gasUsed}")
+        if cohort_size is not None:
+            get_gas_model().observe('settle', cohort_size, receipt.gasUsed)
+        return tx_hash_hex
+    else:
+        print(f"Settlement failed! Transaction: {tx_hash_hex}")
+        return None
+
+def observe_settlement_lag(receipt, market, deadline):
+    """Record inclusion block timestamp - nextSettlement of a mined settlement"""
     try:
-        # Get current state
-        state = get_contract_state(contract)
+        block = w3.eth.get_block(receipt.blockNumber)
+        SETTLEMENT_LAG.observe(block['timestamp'] - deadline, market=market)
+    except Exception as e:
+        print(f"Failed to read settlement block {receipt.blockNumber}: {e}")
+
+lost_settlement_guard = None
+
+def get_settlement_guard():
+    """Guard that cancels settlements another keeper beat, None if CANCEL_LOST_SETTLEMENTS=0"""
+    global lost_settlement_guard
+    if lost_settlement_guard is None and cancel_lost_settlements:
+        lost_settlement_guard = SettlementGuard(w3, session.chain_id, session.receipts())
+    return lost_settlement_guard
+
+def track_settlement(tx_hash_hex, account, cohort_size=None, on_done=None, market=None, deadline=None):
+    """Hand a sent settlement to the receipt tracker, the Future resolves to report_settlement()
+
+    market (contract address) and deadline (the settled nextSettlement) enable the lag metric.
+    """
+    sent_at = time.perf_counter()
+    session.signers.begin(account)
+    guard = get_settlement_guard()
+    def resolve(receipt):
+        session.signers.finish(account)
+        get_journal().resolve(tx_hash_hex, receipt)
+        RECEIPT_SECONDS.observe(time.perf_counter() - sent_at, kind='settle')
+        if guard and guard.unwatch(tx_hash_hex):
+            # Replaced at its nonce, the nonce counter is still right
+            print(f"Settlement {tx_hash_hex} cancelled, the market was settled by another keeper")
+            TRANSACTIONS.inc(kind='settle', outcome='cancelled')
+            if on_done:
+                on_done(None)
+            return None
+        result = report_settlement(receipt, tx_hash_hex, account, cohort_size)
+        outcome = 'timeout' if receipt is None else 'success' if result else 'failed'
+        TRANSACTIONS.inc(kind='settle', outcome=outcome)
+        if result and deadline is not None:
+            observe_settlement_lag(receipt, market, deadline)
+        if on_done:
+            on_done(result)
+        return result
+    if guard:
+        guard.watch(tx_hash_hex, account)
+    return session.receipts().track(tx_hash_hex, resolve)
+
+def wait_for_settlement(tx_hash_hex, account, cohort_size=None, market=None, deadline=None):
+    """Wait for a sent settlement transaction and report the outcome"""
+    return track_settlement(tx_hash_hex, account, cohort_size, market=market, deadline=deadline).result()
+
+def settle_cohort(contract, account, state=None, wait=True):
+    """Attempt to settle the cohort, with wait=False return right after broadcast"""
+    try:
+        # Get current state unless a fresh snapshot was passed in
+        if state is None:
+            state = get_contract_state(contract)
         if not state:
             print("Failed to get contract state")
             return None
@@ -161,7 +250,7 @@ def settle_cohort(contract, account):
             return None
         
         # Estimate costs and rewards
-        cost_info = estimate_costs_and_rewards(contract, state)
+        cost_info = estimate_costs_and_rewards(contract, state, account)
         if not cost_info:
             print("Failed to estimate costs")
             return None
@@ -172,45 +261,61 @@ def settle_cohort(contract, account):
         print(f"Estimated gas cost: {cost_info['estimated_gas_cost']/1e18} ETH")
         print(f"Estimated profit: {cost_info['profit_estimate']/1e18} ETH")
         
-        # Build transaction
-        nonce = w3.eth.get_transaction_count(account.address)
+        # Build transaction with a locally allocated nonce
+        nonce_manager = get_nonce_manager(w3, account.address)
+        nonce = nonce_manager.allocate()
+        journal = get_journal()
+        signed_txn = None
         
-        transaction = contract.functions.settleCohort().build_transaction({
-            'from': account.address,
-            'gas': cost_info['gas_limit'],
-            'gasPrice': cost_info['gas_price'],
-            'nonce': nonce,
-        })
-        
-        # Sign and send transaction
-        signed_txn = account.sign_transaction(transaction)
-        tx_hash = w3.eth.send_raw_transaction(signed_txn.rawTransaction)
+        try:
+            transaction = contract.functions.settleCohort().build_transaction({
+                'from': account.address,
+                'gas': cost_info['gas_limit'],
+                **fee_fields(cost_info['fees']),
+                'nonce': nonce,
+                'chainId': session.chain_id,
+            })
+            
+            # Sign, journal and send transaction
+            signed_txn = account.sign_transaction(transaction)
+            journal.signed(signed_txn.hash.hex(), 'settle', account.address, nonce, transaction,
+                           signed_txn.rawTransaction, market=contract.address, deadline=state['next_settlement'],
+                           cohort_size=cost_info['active_cohort_size'])
+            with CALL_SECONDS.time(site="send_raw_transaction"):
+                tx_hash = w3.eth.send_raw_transaction(signed_txn.rawTransaction)
+        except Exception as e:
+            nonce_manager.handle_send_error(nonce, e)
+            if signed_txn is not None:
+                journal.update(signed_txn.hash.hex(), 'dropped')
+            raise
         tx_hash_hex = tx_hash.hex()
+        journal.update(tx_hash_hex, 'sent')
         
-        print(f"Settlement transaction sent: {tx_hash_hex}")
-        
-        # Wait for confirmation
-        receipt = w3.eth.wait_for_transaction_receipt(tx_hash, timeout=300)
+        print(f"Settlement transaction sent: {tx_hash_hex} (nonce {nonce})")
         
-        if receipt.status == 1:
-            print(f"Settlement successful! Gas used: {receipt.gasUsed}")
+        if not wait:
             return tx_hash_hex
-        else:
-            print(f"Settlement failed! Transaction: {tx_hash_hex}")
-            return None
+        
+        # Wait for confirmation
+        return wait_for_settlement(tx_hash_hex, account, cost_info['active_cohort_size'],
+                                   contract.address, state['next_settlement'])
             
     except Exception as e:
         print(f"Error in settle_cohort: {e}")
         return None
 
-def check_single_contract(contract_info, contract_name, account):
-    """Check and potentially settle a single contract"""
+def check_single_contract(contract_info, contract_name, account, state=None, wait=True, simulated=False):
+    """Check and potentially settle a single contract
+
+    simulated=True skips the settlement's simulation, the caller batched it with others.
+    """
     try:
         contract = contract_info['contract']
         address = contract_info['address']
         
-        # Get current state
-        state = get_contract_state(contract)
+        # Get current state unless it was read in the batched snapshot
+        if state is None:
+            state = get_contract_state(contract)
         if not state:
             print(f"[{contract_name}] Failed to get contract state")
             return None
@@ -227,9 +332,17 @@ def check_single_contract(contract_info, contract_name, account):
         
         # Check if we can settle
         if can_settle(state):
+            # Simulated first, a settlement that would revert is not paid for
+            if not simulated:
+                errors = preflight_settlements({contract_name: contract_info}, {contract_name: account})
+                if errors is None or errors[contract_name]:
+                    return None
             print(f"[{contract_name}] Settlement is ready! Attempting to settle...")
-            tx_hash = settle_cohort(contract, account)
-            if tx_hash:
+            tx_hash = settle_cohort(contract, account, state, wait)
+            if tx_hash and not wait:
+                print(f"[{contract_name}] Settlement sent: {tx_hash}")
+                return tx_hash
+            elif tx_hash:
                 print(f"[{contract_name}] Settlement successful: {tx_hash}")
                 return tx_hash
             else:
@@ -243,10 +356,59 @@ def check_single_contract(contract_info, contract_name, account):
     
     return None
 
-def run_once():
-    """Run one settlement check across all contracts"""
+in_flight = {}  # market name -> Future of a sent settlement, resolved by the receipt tracker
+preflight_backoff = {}  # market name -> time before which a settlement that simulated a revert is not retried
+journal_recovered = False
+
+def recover_settlements(contracts, outcomes=None):
+    """Track the settlements a previous run left open in the transaction journal again
+
+    Runs once per process. Pending settlements are rebroadcast (re-signed if their fees
+    fell behind) and their markets count as in flight, so they are not settled twice;
+    with outcomes their receipts feed the scheduler like those of this run. Settlements
+    of markets that were settled in the meantime are cancelled instead.
+    """
+    global journal_recovered
+    if journal_recovered:
+        return
+    journal = get_journal()
+    try:
+        # The fee estimate is only read if there is anything to rebroadcast
+        fees = get_fee_engine(w3).get_fees() if journal.open_entries('settle') or journal.open_entries('cancel') else None
+        # Cancels first: one that was mined drops the settlement it replaced
+        for entry in recover(journal, session.batch, 'cancel', session.signers.accounts, fees):
+            session.receipts().track(entry['hash'], lambda receipt, tx_hash=entry['hash']: journal.resolve(tx_hash, receipt))
+        entries = recover(journal, session.batch, 'settle', session.signers.accounts, fees)
+    except Exception as e:
+        print(f"Error recovering settlements from the transaction journal: {e}")
+        return
+    journal_recovered = True
+    names = {contract_info['address'].lower(): name for name, contract_info in contracts.items()}
+    for entry in entries:
+        if entry['kind'] == 'cancel':
+            # Settlement of a market another keeper settled while this bot was down
+            session.receipts().track(entry['hash'], lambda receipt, tx_hash=entry['hash']: journal.resolve(tx_hash, receipt))
+            continue
+        name = names.get(entry['market'].lower())
+        account = session.signers.by_address(entry['sender'])
+        if name is None or account is None:
+            continue  # Market or key no longer served by this bot, the journal still holds it
+        on_done = None
+        if outcomes is not None:
+            on_done = lambda result, name=name, deadline=entry['deadline']: outcomes.put((name, result, deadline))
+        print(f"[{name}] Settlement from before the restart in flight: {entry['hash']} (nonce {entry['nonce']})")
+        in_flight[name] = track_settlement(entry['hash'], account, entry['cohort_size'], on_done,
+                                           market=entry['market'], deadline=entry['deadline'])
+
+def run_once(wait=True):
+    """Run one settlement check across all contracts
+
+    With wait=False sent settlements are left to the receipt tracker and the cycle returns
+    right after broadcast; markets whose settlement is still in flight are skipped.
+    """
     try:
         contracts, account = setup_contracts()
+        recover_settlements(contracts)
         
         print("=" * 60)
         print("Checking settlement status for all contracts...")
@@ -254,14 +416,50 @@ def run_once():
         
         results = {}
         
-        # Loop through all contracts
+        # Read every market and the block timestamp in one round trip
+        states = get_all_contract_states(contracts)
+        
+        # Simulate the due settlements in one batch, the ones that would revert are not sent
+        signers = session.signers.assign([contract_info['address'] for contract_info in contracts.values()])
+        due = {name: signers[contract_info['address']] for name, contract_info in contracts.items()
+               if can_settle(states.get(name)) and preflight_backoff.get(name, 0) <= time.time()
+               and not (name in in_flight and not in_flight[name].done())}
+        errors = preflight_settlements(contracts, due) if due else {}
+        
+        # Send due settlements back-to-back per key, and from all keys of the signer pool at once
+        jobs = {}
         for contract_name, contract_info in contracts.items():
-            print(f"\n--- Checking {contract_name} ---")
-            result = check_single_contract(contract_info, contract_name, account)
-            results[contract_name] = result
-            
-            # Add delay between contracts to avoid nonce issues
-            time.sleep(2)
+            results[contract_name] = None
+            if contract_name in in_flight and not in_flight[contract_name].done():
+                print(f"\n--- Checking {contract_name} ---")
+                print(f"[{contract_name}] Settlement still waiting for its receipt, skipping")
+                continue
+            if (errors or {}).get(contract_name) or preflight_backoff.get(contract_name, 0) > time.time():
+                print(f"\n--- Checking {contract_name} ---")
+                print(f"[{contract_name}] Settlement reverted in simulation, skipping")
+                continue
+            signer = signers[contract_info['address']]
+            def check(name=contract_name, contract_info=contract_info, signer=signer):
+                print(f"\n--- Checking {name} ---")
+                return check_single_contract(contract_info, name, signer, states.get(name), wait=False,
+                                             simulated=errors is not None)
+            jobs[contract_name] = (signer, check)
+        
+        pending = {}
+        for contract_name, tx_hash in session.signers.run(jobs).items():
+            if tx_hash:
+                pending[contract_name] = tx_hash
+                in_flight[contract_name] = track_settlement(
+                    tx_hash, jobs[contract_name][0], active_cohort_size(states[contract_name]),
+                    market=contracts[contract_name]['address'], deadline=states[contract_name]['next_settlement'])
+        
+        # Wait for all sent settlements once everything is broadcast
+        for contract_name, tx_hash in pending.items():
+            if wait:
+                print(f"\n--- Waiting for {contract_name} ---")
+                results[contract_name] = in_flight[contract_name].result()
+            else:
+                results[contract_name] = tx_hash
         
         # Summary
         print("\n" + "=" * 60)
@@ -269,12 +467,12 @@ def run_once():
         successful_settlements = 0
         for contract_name, result in results.items():
             if result:
-                print(f"✓ {contract_name}: Settlement successful - {result}")
+                print(f"✓ {contract_name}: Settlement {'successful' if wait else 'sent'} - {result}")
                 successful_settlements += 1
             else:
                 print(f"✗ {contract_name}: No settlement")
         
-        print(f"Total successful settlements: {successful_settlements}/{len(contracts)}")
+        print(f"Total {'successful' if wait else 'sent'} settlements: {successful_settlements}/{len(contracts)}")
         print("=" * 60)
         
         return results
@@ -295,7 +493,9 @@ def run_continuously(check_interval=30):
     
     while True:
         try:
-            run_once()
+            # Receipts are followed in the background, a stuck transaction never blocks the next cycle
+            with cycle("keeper_interval"):
+                run_once(wait=False)
             
             # Wait before next check
             print(f"\nWaiting {check_interval} seconds before next check...")
@@ -309,6 +509,216 @@ def run_continuously(check_interval=30):
             print("Retrying in 60 seconds...")
             time.sleep(60)
 
+def poll_settlement_window(contracts, account, scheduler, names, outcomes,
+                           poll_interval=0.25, retry_delay=60, presigner=None):
+    """Poll due markets every block until each one is sent, rescheduled or left to another keeper
+
+    Sent settlements leave the scheduler until the receipt tracker puts
+    (name, tx hash or None, settled deadline) on the outcomes queue. With a presigner the
+    settlement is signed while waiting for the deadline and only broadcast once it is due.
+    Markets due in the same block are sent from all keys of the signer pool at once.
+    Due settlements are simulated at the pending block in one batch after the state read;
+    one that would revert is retried after the backoff of its error instead of being sent.
+    """
+    names = list(names)
+    last_block = None
+    
+    while names:
+        try:
+            states = get_markets_state(w3, {name: contracts[name] for name in names})
+        except Exception as e:
+            print(f"Error getting contract states: {e}")
+            time.sleep(poll_interval)
+            continue
+        
+        # Only act once per new block
+        block_numbers = [state['block_number'] for state in states.values() if state]
+        if block_numbers:
+            scheduler.sync_clock(next(state['current_timestamp'] for state in states.values() if state))
+            if block_numbers[0] == last_block:
+                time.sleep(poll_interval)
+                continue
+            last_block = block_numbers[0]
+        
+        # Simulate every due settlement from the key that sends it, in one batch
+        due_names = [name for name in names if can_settle(states.get(name))]
+        signers = session.signers.assign([contracts[name]['address'] for name in due_names])
+        senders = {name: presigner.armed_account(name) if presigner and presigner.is_armed(name)
+                   else signers[contracts[name]['address']] for name in due_names}
+        errors = preflight_settlements(contracts, senders) if senders else {}
+        simulated = errors is not None
+        errors = errors or {}
+        
+        # Fire armed settlements first
+        jobs = {}
+        for name in list(names):
+            state = states.get(name)
+            if presigner and presigner.is_armed(name) and can_settle(state) and not errors.get(name):
+                jobs[name] = (presigner.armed_account(name), lambda name=name: presigner.fire(name))
+        sent = session.signers.run(jobs)
+        
+        due = []
+        for name in list(names):
+            state = states.get(name)
+            if not state:
+                print(f"[{name}] Failed to get contract state, retrying in {retry_delay} seconds")
+                if presigner:
+                    presigner.disarm(name)
+                scheduler.schedule(name, scheduler.chain_now() + retry_delay)
+                names.remove(name)
+            elif can_settle(state) and errors.get(name):
+                delay = backoff_seconds(errors[name])
+                if delay > 0:
+                    if presigner:
+                        presigner.disarm(name)
+                    scheduler.schedule(name, scheduler.chain_now() + delay)
+                    names.remove(name)
+            elif can_settle(state):
+                if name not in sent:
+                    due.append(name)
+                names.remove(name)
+            elif state['next_settlement'] != scheduler.deadlines.get(name):
+                # Settled by another keeper (or not yet due) - follow the on-chain deadline
+                if presigner:
+                    presigner.disarm(name)
+                scheduler.schedule(name, state['next_settlement'])
+                names.remove(name)
+            elif presigner:
+                try:
+                    fees = get_fee_engine(w3).get_fees(state['block_number'])
+                    presigner.arm(name, contracts[name]['contract'], active_cohort_size(state), fees,
+                                  state['next_settlement'])
+                except Exception as e:
+                    print(f"[{name}] Failed to arm settlement: {e}")
+        
+        jobs = {}
+        for name in due:
+            jobs[name] = (senders[name], lambda name=name:
+                          check_single_contract(contracts[name], name, senders[name], states[name], wait=False,
+                                                simulated=simulated))
+        sent.update(session.signers.run(jobs))
+        for name, tx_hash in sent.items():
+            state = states[name]
+            if tx_hash:
+                scheduler.remove(name)
+                in_flight[name] = track_settlement(
+                    tx_hash, senders[name], active_cohort_size(state),
+                    lambda result, name=name, deadline=state['next_settlement']:
+                        outcomes.put((name, result, deadline)),
+                    market=contracts[name]['address'], deadline=state['next_settlement'])
+            else:
+                scheduler.schedule(name, scheduler.chain_now() + retry_delay)
+        
+        if names:
+            time.sleep(poll_interval)
+
+def apply_settlement_outcomes(outcomes, scheduler, trade_durations, timeout=0, retry_delay=60):
+    """Roll settled markets over to their next cohort, waiting up to timeout for the first receipt
+
+    Returns True if any outcome was applied.
+    """
+    try:
+        outcome = outcomes.get(timeout=timeout) if timeout > 0 else outcomes.get_nowait()
+    except queue.Empty:
+        return False
+    
+    while outcome:
+        name, result, settled_deadline = outcome
+        if result and trade_durations.get(name):
+            scheduler.reschedule_after_settlement(name, settled_deadline, trade_durations[name])
+        else:
+            scheduler.schedule(name, scheduler.chain_now() + retry_delay)
+        try:
+            outcome = outcomes.get_nowait()
+        except queue.Empty:
+            outcome = None
+    return True
+
+def run_scheduled(window=10, poll_interval=0.25, max_sleep=3600, prearm=False, idle_task=None):
+    """Run the keeper bot driven by settlement deadlines instead of a fixed interval
+
+    With prearm=True settlements are signed inside the polling window and fired on the
+    first block at or past the deadline. idle_task(seconds_until_window) runs other work
+    (reward claims in daemon.py) between windows and returns the seconds until it wants to
+    run again, or None.
+    """
+    print("Starting Deadline-Driven TopCut Keeper Bot...")
+    print(f"Monitoring {len(CONTRACTS)} contracts:")
+    for name, address in CONTRACTS.items():
+        print(f"  - {name}: {address}")
+    print(f"Per-block polling starts {window} seconds before each settlement")
+    if prearm:
+        print("Settlements are pre-signed inside the polling window")
+    print("Press Ctrl+C to stop")
+    
+    scheduler = SettlementScheduler(window)
+    presigner = None
+    outcomes = queue.Queue()  # Settlement results delivered by the receipt tracker
+    contracts = account = trade_durations = None
+    
+    while True:
+        try:
+            # Initial load, and a full refresh whenever the bot idled for max_sleep
+            if trade_durations is None:
+                contracts, account = setup_contracts()
+                if prearm and presigner is None:
+                    presigner = SettlementPresigner(w3, session.signers, session.chain_id)
+                recover_settlements(contracts, outcomes)
+                # Immutables are read on chain only the first time a market is seen
+                registry.ensure(w3, contracts, session.batch)
+                trade_durations = {name: registry.get(name, 'trade_duration') for name in contracts}
+                states = get_all_contract_states(contracts)
+                for name in contracts:
+                    state = states.get(name)
+                    if name in in_flight and not in_flight[name].done():
+                        continue  # Rescheduled once its receipt arrives
+                    if state:
+                        scheduler.sync_clock(state['current_timestamp'])
+                        scheduler.schedule(name, state['next_settlement'])
+                    else:
+                        print(f"[{name}] Failed to get contract state, retrying in 60 seconds")
+                        scheduler.schedule(name, scheduler.chain_now() + 60)
+            
+            apply_settlement_outcomes(outcomes, scheduler, trade_durations)
+            
+            wait = scheduler.seconds_until_window()
+            idle_delay = None
+            if idle_task and (wait is None or wait > 0):
+                idle_delay = idle_task(wait)
+                apply_settlement_outcomes(outcomes, scheduler, trade_durations)
+                wait = scheduler.seconds_until_window()
+            if wait is None or wait > 0:
+                sleep_time = max_sleep if wait is None else min(wait, max_sleep)
+                if idle_delay is not None:
+                    sleep_time = min(sleep_time, idle_delay)
+                earliest = scheduler.next_deadline()
+                if earliest:
+                    from datetime import datetime, timezone
+                    deadline, name = earliest
+                    print(f"\nNext settlement: {name} at {datetime.fromtimestamp(deadline, timezone.utc)}")
+                print(f"Sleeping {sleep_time:.0f} seconds...")
+                # A settlement receipt ends the sleep early, its market needs a new deadline
+                if apply_settlement_outcomes(outcomes, scheduler, trade_durations, sleep_time):
+                    continue
+                if sleep_time == max_sleep:
+                    trade_durations = None
+                continue
+            
+            names = scheduler.in_window()
+            print(f"\nSettlement window open for: {', '.join(names)}")
+            with cycle("keeper_window"):
+                poll_settlement_window(contracts, account, scheduler, names, outcomes, poll_interval,
+                                       presigner=presigner)
+            
+        except KeyboardInterrupt:
+            print("\nStopping keeper bot...")
+            break
+        except Exception as e:
+            print(f"Unexpected error: {e}")
+            print("Retrying in 60 seconds...")
+            trade_durations = None
+            time.sleep(60)
+
 def run_single_contract(contract_name):
     """Run settlement check for a single specific contract"""
     if contract_name not in CONTRACTS:
@@ -340,6 +750,9 @@ def run_single_contract(contract_name):
 if __name__ == "__main__":
     import sys
     
+    if metrics_port:
+        start_metrics_server(int(metrics_port))
+    
     if len(sys.argv) > 1:
         if sys.argv[1] == "once":
             # Run once for all contracts
@@ -351,6 +764,12 @@ if __name__ == "__main__":
             # Run for a single specific contract
             contract_name = sys.argv[2]
             result = run_single_contract(contract_name)
+        elif sys.argv[1] == "schedule":
+            # Run continuously driven by settlement deadlines
+            run_scheduled()
+        elif sys.argv[1] == "prearm":
+            # Same, with settlements signed ahead of the deadline
+            run_scheduled(prearm=True)
         elif sys.argv[1].isdigit():
             # Run continuously with custom interval
             interval = int(sys.argv[1])
@@ -358,11 +777,13 @@ if __name__ == "__main__":
         else:
             # Show help
             print("Usage:")
-            print("  python keeper_bot_iter.py                    # Run continuously (30s interval)")
+            print("  python keeper_bot_iter.py                    # Run continuously, driven by settlement deadlines")
+            print("  python keeper_bot_iter.py schedule           # Same as above")
+            print("  python keeper_bot_iter.py prearm             # Same, with settlements pre-signed before the deadline")
             print("  python keeper_bot_iter.py once               # Run once for all contracts")
             print("  python keeper_bot_iter.py single <name>      # Run once for specific contract")
             print("  python keeper_bot_iter.py <seconds>          # Run continuously with custom interval")
             print(f"\nAvailable contracts: {list(CONTRACTS.keys())}")
     else:
-        # Run continuously with default interval
-        run_continuously(30)
\ No newline at end of file
+        # Run continuously, waking up only around settlement deadlines
+        run_scheduled()
\ No newline at end of file
@@ -0,0 +1,165 @@
+"""
+TopCut Contract Metadata Cache
+Constants per (chain id, address, code hash), persisted to SQLite
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from eth_utils import keccak, to_checksum_address
+
+from multicall import aggregate3, decode_uint, encode_call
+
+# Immutables and constants of TopCutMarket (getter, return type)
+MARKET_CONSTANTS = [
+    ("TRADE_SIZE()", 'uint256'),
+    ("TRADE_DURATION()", 'uint256'),
+    ("WIN_SIZE()", 'uint256'),
+    ("SHARE_PRECISION()", 'uint256'),
+    ("SHARE_KEEPER()", 'uint256'),
+    ("PREDICTION_DECIMALS()", 'uint256'),
+    ("ORACLE()", 'address'),
+    ("TOP_CUT_VAULT()", 'address'),
+]
+# Chainlink aggregator proxies
+ORACLE_CONSTANTS = [("decimals()", 'uint256')]
+
+DEFAULT_VERIFY_INTERVAL = 86400  # Seconds a verified code hash is trusted without eth_getCode
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS contracts (
+    chain_id INTEGER NOT NULL,
+    address TEXT NOT NULL,
+    code_hash TEXT NOT NULL,
+    constants TEXT NOT NULL,
+    verified_at REAL NOT NULL,
+    PRIMARY KEY (chain_id, address, code_hash)
+)
+"""
+
+def _decode_constant(abi_type, success, return_data):
+    if abi_type == 'address':
+        if not success or len(return_data) < 32:
+            return None
+        return to_checksum_address(return_data[12:32])
+    return decode_uint(success, return_data)
+
+class ContractMetadataCache:
+    """Values that cannot change while a contract's code stays the same
+
+    A cached entry is trusted for verify_interval seconds, after which the code hashes of
+    all stale addresses are re-checked in one JSON-RPC batch of eth_getCode; an entry whose
+    code hash changed is dropped and re-read. A getter that reverted is stored as None, so
+    it is not retried until the code changes.
+    """
+
+    def __init__(self, db_path, verify_interval=DEFAULT_VERIFY_INTERVAL):
+        self.verify_interval = verify_interval
+        self.db = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        if 'selectors' in [row[1] for row in self.db.execute("PRAGMA table_info(contracts)")]:
+            # Cache of a version that also stored ABI selectors, re-read on demand
+            self.db.execute("DROP TABLE contracts")
+        self.db.execute(SCHEMA)
+        self.db.commit()
+        self.lock = threading.Lock()
+
+    def _rows(self, chain_id, addresses):
+        placeholders = ",".join("?" * len(addresses))
+        rows = self.db.execute(
+            "SELECT address, code_hash, constants, verified_at FROM contracts "
+            f"WHERE chain_id = ? AND address IN ({placeholders})", [chain_id] + list(addresses)
+        ).fetchall()
+        return {row[0]: {'code_hash': row[1], 'constants': json.loads(row[2]), 'verified_at': row[3]}
+                for row in rows}
+
+    def _code_hashes(self, w3, addresses, send_batch):
+        """keccak of the deployed code of every address, None where there is no code"""
+        if send_batch:
+            codes = send_batch([("eth_getCode", [address, 'latest']) for address in addresses])
+        else:
+            codes = [w3.eth.get_code(address).hex() for address in addresses]
+        hashes = {}
+        for address, code in zip(addresses, codes):
+            if isinstance(code, Exception):
+                raise code
+            code = bytes.fromhex(code[2:] if code.startswith("0x") else code)
+            hashes[address] = "0x" + keccak(code).hex() if code else None
+        return hashes
+
+    def load(self, w3, addresses, signatures=MARKET_CONSTANTS, chain_id=None, send_batch=None):
+        """Constants of every address as {address: {'TRADE_SIZE': ..., ...}}
+
+        Served from disk while the entries are fresh; otherwise costs one eth_getCode batch
+        (send_batch, e.g. BotSession.batch, or one request per address without it) plus one
+        aggregate3 call for the contracts that are new or whose code changed.
+        """
+        addresses = [to_checksum_address(address) for address in addresses]
+        if not addresses:
+            return {}
+        chain_id = w3.eth.chain_id if chain_id is None else chain_id
+        names = [signature.split("(")[0] for signature, _ in signatures]
+
+        with self.lock:
+            cached = self._rows(chain_id, addresses)
+            now = time.time()
+
+            def complete(entry):
+                return entry is not None and all(name in entry['constants'] for name in names)
+
+            stale = [address for address in addresses
+                     if not complete(cached.get(address)) or now - cached[address]['verified_at'] > self.verify_interval]
+            if stale:
+                code_hashes = self._code_hashes(w3, stale, send_batch)
+                verified = [address for address in stale if complete(cached.get(address))
+                            and cached[address]['code_hash'] == code_hashes[address]]
+                refetch = [address for address in stale if address not in verified and code_hashes[address]]
+                previous = {}  # Entries of unchanged code keep the constants they already have
+                for address in stale:
+                    if address not in verified:
+                        entry = cached.pop(address, None)
+                        if entry and entry['code_hash'] == code_hashes[address]:
+                            previous[address] = entry
+
+                calls = [(address, encode_call(signature)) for address in refetch for signature, _ in signatures]
+                results = aggregate3(w3, calls) if calls else []
+                rows = []
+                for index, address in enumerate(refetch):
+                    values = results[index * len(signatures):(index + 1) * len(signatures)]
+                    entry = previous.get(address, {'constants': {}})
+                    constants = dict(entry['constants'])
+                    constants.update({name: _decode_constant(abi_type, *result)
+                                      for name, (_, abi_type), result in zip(names, signatures, values)})
+                    cached[address] = {'code_hash': code_hashes[address], 'constants': constants, 'verified_at': now}
+                    rows.append((chain_id, address, code_hashes[address], json.dumps(constants), now))
+
+                with self.db:
+                    # Entries of replaced code are removed, so only the current code hash is kept
+                    self.db.executemany("DELETE FROM contracts WHERE chain_id = ? AND address = ?",
+                                        [(chain_id, address) for address in stale if address not in verified])
+                    self.db.executemany(
+                        "UPDATE contracts SET verified_at = ? WHERE chain_id = ? AND address = ? AND code_hash = ?",
+                        [(now, chain_id, address, code_hashes[address]) for address in verified])
+                    self.db.executemany(
+                        "INSERT OR REPLACE INTO contracts (chain_id, address, code_hash, constants, verified_at) "
+                        "VALUES (?, ?, ?, ?, ?)", rows)
+                print(f"Contract metadata: {len(verified)} verified, {len(refetch)} fetched, "
+                      f"{len(addresses) - len(stale)} from cache")
+
+        return {address: dict(cached[address]['constants']) if address in cached else {} for address in addresses}
+
+    def close(self):
+        self.db.close()
+
+_metadata_cache = None
+
+def get_metadata_cache():
+    """Process-wide cache at METADATA_CACHE_PATH (default metadata_cache.db next to the scripts)"""
+    global _metadata_cache
+    if _metadata_cache is None:
+        path = os.getenv("METADATA_CACHE_PATH", os.path.join(os.path.dirname(__file__), "metadata_cache.db"))
+        verify_interval = float(os.getenv("METADATA_VERIFY_INTERVAL", str(DEFAULT_VERIFY_INTERVAL)))
+        _metadata_cache = ContractMetadataCache(path, verify_interval)
+    return _metadata_cache
@@ -0,0 +1,200 @@
+"""
+TopCut Metrics
+Histograms and counters for RPC latency, call sites and settlement lag, served in Prometheus text format
+"""
+
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+LAG_BUCKETS = (0, 1, 2, 5, 10, 15, 30, 60, 120, 300, 600, 1800, 3600)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+_metrics = []  # Every metric in registration order, rendered by render()
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+def _format_value(value):
+    return repr(float(value)) if value != float("inf") else "+Inf"
+
+class Counter:
+    """Monotonic counter per label combination"""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+        _metrics.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            values = dict(self.values)
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+class Histogram:
+    """Cumulative bucket histogram per label combination"""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self.values = {}  # label values -> [bucket counts, sum, count]
+        self.lock = threading.Lock()
+        _metrics.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self.lock:
+            counts, total, count = self.values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            self.values[key] = (counts, total + value, count + 1)
+
+    def time(self, **labels):
+        """Context manager / decorator that observes the elapsed seconds"""
+        return _Timer(self, labels)
+
+    def samples(self):
+        with self.lock:
+            values = {key: (list(counts), total, count) for key, (counts, total, count) in self.values.items()}
+        for key, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {count}"
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+        return False
+
+    def __call__(self, function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with _Timer(self.histogram, self.labels):
+                return function(*args, **kwargs)
+        return wrapper
+
+RPC_SECONDS = Histogram("topcut_rpc_request_seconds", "JSON-RPC request latency by method", ["method"])
+RPC_ERRORS = Counter("topcut_rpc_errors_total", "JSON-RPC requests that raised or returned an error", ["method"])
+CALL_SECONDS = Histogram("topcut_call_seconds", "Latency of bot call sites", ["site"])
+CYCLE_SECONDS = Histogram("topcut_cycle_seconds", "Duration of one bot cycle", ["loop"])
+CYCLE_RPC_CALLS = Histogram("topcut_cycle_rpc_calls", "JSON-RPC requests made in one bot cycle", ["loop"],
+                            buckets=COUNT_BUCKETS)
+RECEIPT_SECONDS = Histogram("topcut_receipt_wait_seconds", "Time from broadcast to receipt (or timeout)", ["kind"])
+SETTLEMENT_LAG = Histogram("topcut_settlement_lag_seconds",
+                           "Inclusion block timestamp minus nextSettlement of settled cohorts", ["market"],
+                           buckets=LAG_BUCKETS)
+TRANSACTIONS = Counter("topcut_transactions_total", "Sent transactions by kind and outcome", ["kind", "outcome"])
+PREFLIGHT_REVERTS = Counter("topcut_preflight_reverts_total", "Transactions not sent because their simulation reverted",
+                            ["kind", "error"])
+
+_rpc_calls = 0  # JSON-RPC requests seen by the middleware since start
+_rpc_calls_lock = threading.Lock()
+
+def timed(site):
+    """Decorator recording a call site in topcut_call_seconds"""
+    return CALL_SECONDS.time(site=site)
+
+def rpc_metrics_middleware(make_request, w3):
+    """web3 middleware timing every JSON-RPC request by method"""
+    def middleware(method, params):
+        global _rpc_calls
+        with _rpc_calls_lock:
+            _rpc_calls += 1
+        started = time.perf_counter()
+        try:
+            response = make_request(method, params)
+        except Exception:
+            RPC_ERRORS.inc(method=method)
+            raise
+        finally:
+            RPC_SECONDS.observe(time.perf_counter() - started, method=method)
+        if isinstance(response, dict) and 'error' in response:
+            RPC_ERRORS.inc(method=method)
+        return response
+    return middleware
+
+def observe_batch(calls, elapsed):
+    """Record a raw JSON-RPC batch sent outside of web3"""
+    global _rpc_calls
+    with _rpc_calls_lock:
+        _rpc_calls += 1
+    RPC_SECONDS.observe(elapsed, method=f"batch:{calls[0][0]}" if calls else "batch")
+
+@contextmanager
+def cycle(loop):
+    """Record the duration and JSON-RPC request count of one loop iteration"""
+    started = time.perf_counter()
+    rpc_calls = _rpc_calls
+    try:
+        yield
+    finally:
+        CYCLE_SECONDS.observe(time.perf_counter() - started, loop=loop)
+        CYCLE_RPC_CALLS.observe(_rpc_calls - rpc_calls, loop=loop)
+
+def render():
+    """All metrics in Prometheus text exposition format"""
+    lines = []
+    for metric in _metrics:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+def start_metrics_server(port, host="0.0.0.0"):
+    """Serve /metrics from a daemon thread, returns the server"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Metrics served on http://{host}:{server.server_address[1]}/metrics")
+    return server
@@ -0,0 +1,605 @@
+#!/usr/bin/env python3
+"""
+TopCut Mock Node
+Local JSON-RPC stand-in (HTTP and WebSocket) emulating TopCut markets and Multicall3
+"""
+
+import asyncio
+import json
+import random
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import websockets
+from eth_abi import encode, decode
+from eth_account import Account
+from eth_account._utils.legacy_transactions import Transaction
+from eth_account._utils.typed_transactions import TypedTransaction
+from eth_utils import function_signature_to_4byte_selector, keccak, to_checksum_address
+from hexbytes import HexBytes
+
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+CHAIN_ID = 42161
+
+KEEPER_REWARD_UNIT = 10**14
+MIN_KEEPER_REWARD = 10**15
+MAX_COHORT_SIZE = 2200
+
+TOPIC_COHORT_SETTLED = "0x" + keccak(text="CohortSettled(uint256,uint256,uint256,uint256)").hex()
+TOPIC_PREDICTION_POSTED = "0x" + keccak(text="PredictionPosted(address,uint256,uint256)").hex()
+
+def selector(signature):
+    """4-byte selector of a function or error signature"""
+    return function_signature_to_4byte_selector(signature)
+
+class Revert(Exception):
+    """Emulated custom error revert"""
+
+    def __init__(self, error_name):
+        super().__init__(error_name)
+        self.data = selector(f"{error_name}()")
+
+class MockMarket:
+    """In-memory TopCutMarket with the public surface of abi.json"""
+
+    def __init__(self, address, trade_size, trade_duration, next_settlement, cohort_size=0):
+        self.address = to_checksum_address(address)
+        self.trade_size = trade_size
+        self.trade_duration = trade_duration
+        self.next_settlement = next_settlement
+        self.active_cohort_id = 2
+        self.trades = {1: [], 2: []}
+        self.claim_amounts = {}
+        self.keeper_rewards = {}
+        self.total_pending_claims = 0
+        self.balance = 0
+        self.oracle_price = 100_000 * 10**18
+        self.revert_settle_with = None
+        for i in range(cohort_size):
+            owner = to_checksum_address(keccak(text=f"{address}-{i}")[:20])
+            self.trades[2].append((owner, self.oracle_price + (i * 7919 % 1000 - 500) * 10**18))
+        self.balance = cohort_size * trade_size
+
+    def cohort_size(self, cohort_id):
+        return len(self.trades[cohort_id])
+
+    def settlement_reward(self):
+        size = self.cohort_size(self.active_cohort_id)
+        return max(size * KEEPER_REWARD_UNIT, MIN_KEEPER_REWARD)
+
+    def views(self):
+        """Selector -> (arg types, handler returning (types, values))"""
+        return {
+            selector("nextSettlement()"): ((), lambda: (['uint256'], [self.next_settlement])),
+            selector("activeCohortID()"): ((), lambda: (['uint256'], [self.active_cohort_id])),
+            selector("cohortSize_1()"): ((), lambda: (['uint256'], [self.cohort_size(1)])),
+            selector("cohortSize_2()"): ((), lambda: (['uint256'], [self.cohort_size(2)])),
+            selector("TRADE_SIZE()"): ((), lambda: (['uint256'], [self.trade_size])),
+            selector("TRADE_DURATION()"): ((), lambda: (['uint256'], [self.trade_duration])),
+            selector("WIN_SIZE()"): ((), lambda: (['uint256'], [self.trade_size * 10])),
+            selector("SHARE_PRECISION()"): ((), lambda: (['uint256'], [1000])),
+            selector("SHARE_KEEPER()"): ((), lambda: (['uint256'], [10])),
+            selector("SHARE_VAULT()"): ((), lambda: (['uint256'], [50])),
+            selector("SHARE_FRONTEND()"): ((), lambda: (['uint256'], [30])),
+            selector("PREDICTION_DECIMALS()"): ((), lambda: (['uint256'], [18])),
+            selector("ORACLE()"): ((), lambda: (['address'], ["0x" + "11" * 20])),
+            selector("TOP_CUT_VAULT()"): ((), lambda: (['address'], ["0x" + "22" * 20])),
+            selector("totalPendingClaims()"): ((), lambda: (['uint256'], [self.total_pending_claims])),
+            selector("getSettlementReward()"): ((), lambda: (['uint256'], [self.settlement_reward()])),
+            selector("keeperRewards(address)"): (('address',), lambda a: (['uint256'], [self.keeper_rewards.get(to_checksum_address(a), 0)])),
+            selector("claimAmounts(address)"): (('address',), lambda a: (['uint256'], [self.claim_amounts.get(to_checksum_address(a), 0)])),
+            selector("tradesCohort_1(uint256)"): (('uint256',), lambda i: (['address', 'uint256'], self._trade(1, i))),
+            selector("tradesCohort_2(uint256)"): (('uint256',), lambda i: (['address', 'uint256'], self._trade(2, i))),
+        }
+
+    def _trade(self, cohort_id, index):
+        trades = self.trades[cohort_id]
+        if index < len(trades):
+            return list(trades[index])
+        return ["0x" + "00" * 20, 0]
+
+    def call(self, data, sender, timestamp, commit):
+        """Execute calldata, returns (return bytes, logs)"""
+        sel, args = bytes(data[:4]), bytes(data[4:])
+        views = self.views()
+        if sel in views:
+            arg_types, handler = views[sel]
+            out_types, values = handler(*decode(list(arg_types), args)) if arg_types else handler()
+            return encode(out_types, values), []
+        if sel == selector("settleCohort()"):
+            return b"", self._settle(sender, timestamp, commit)
+        if sel == selector("claimKeeperReward(address,uint256)"):
+            recipient, amount = decode(['address', 'uint256'], args)
+            return b"", self._claim_keeper_reward(sender, recipient, amount, commit)
+        if sel == selector("castPrediction(address,uint256,uint256,uint256)"):
+            _, _, price, cohort_id = decode(['address', 'uint256', 'uint256', 'uint256'], args)
+            return b"", self._cast(sender, price, cohort_id, timestamp, commit)
+        raise Revert("InvalidAmount")
+
+    def _settle(self, sender, timestamp, commit):
+        if self.revert_settle_with:
+            raise Revert(self.revert_settle_with)
+        if timestamp < self.next_settlement:
+            raise Revert("CohortActive")
+        active = self.active_cohort_id
+        trades = self.trades[active]
+        size = len(trades)
+        winners = (size // 11 if size > 11 else 1) if size else 0
+        if not commit:
+            return []
+        reward = self.settlement_reward()
+        if winners:
+            ranked = sorted(range(size), key=lambda i: (abs(trades[i][1] - self.oracle_price), i))
+            for i in ranked[:winners]:
+                owner = trades[i][0]
+                self.claim_amounts[owner] = self.claim_amounts.get(owner, 0) + self.trade_size * 10
+            self.total_pending_claims += winners * self.trade_size * 10
+        settlement_time = self.next_settlement
+        self.next_settlement = settlement_time + self.trade_duration
+        self.keeper_rewards[sender] = self.keeper_rewards.get(sender, 0) + reward
+        self.trades[active] = []
+        self.active_cohort_id = 1 if active == 2 else 2
+        return [{
+            'address': self.address,
+            'topics': [TOPIC_COHORT_SETTLED],
+            'data': "0x" + encode(['uint256'] * 4, [size, winners, self.oracle_price, settlement_time]).hex(),
+        }]
+
+    def _claim_keeper_reward(self, sender, recipient, amount, commit):
+        if int(recipient, 16) == 0:
+            raise Revert("ZeroAddress")
+        if amount == 0:
+            raise Revert("InvalidAmount")
+        withdrawable = max(self.balance - self.total_pending_claims, 0)
+        if amount > withdrawable:
+            raise Revert("InsufficientBalance")
+        if amount > self.keeper_rewards.get(sender, 0):
+            raise Revert("InvalidAmount")
+        if commit:
+            self.keeper_rewards[sender] -= amount
+            self.balance -= amount
+        return []
+
+    def _cast(self, sender, price, cohort_id, timestamp, commit):
+        if price == 0:
+            raise Revert("InvalidPrice")
+        if cohort_id == self.active_cohort_id:
+            raise Revert("InvalidCohortID")
+        if timestamp >= self.next_settlement:
+            raise Revert("WaitingToSettle")
+        if len(self.trades[cohort_id]) == MAX_COHORT_SIZE:
+            raise Revert("CohortFull")
+        if not commit:
+            return []
+        self.trades[cohort_id].append((sender, price))
+        self.balance += self.trade_size
+        return [{
+            'address': self.address,
+            'topics': [
+                TOPIC_PREDICTION_POSTED,
+                "0x" + encode(['address'], [sender]).hex(),
+                "0x" + encode(['uint256'], [self.next_settlement + self.trade_duration]).hex(),
+            ],
+            'data': "0x" + encode(['uint256'], [price]).hex(),
+        }]
+
+class MockChain:
+    """Deterministic chain clock, accounts, transactions and logs"""
+
+    def __init__(self, block_time=0.25, base_fee=10**7, latency=0.0, error_rate=0.0):
+        self.lock = threading.RLock()
+        self.block_time = block_time
+        self.base_fee = base_fee
+        self.latency = latency
+        self.error_rate = error_rate
+        self.start_time = time.time()
+        self.genesis_timestamp = int(self.start_time)
+        self.markets = {}
+        self.nonces = {}
+        self.balances = {}
+        self.transactions = {}
+        self.queued = {}  # sender -> nonce -> (tx hash, tx) waiting for a nonce gap
+        self.queued_hashes = set()
+        self.receipts = {}
+        self.logs = []
+        self.request_counts = {}
+        self.listeners = []
+
+    # --- chain clock ---
+    def block_number(self):
+        return int((time.time() - self.start_time) / self.block_time) + 1
+
+    def block_timestamp(self, number):
+        return self.genesis_timestamp + int(number * self.block_time)
+
+    def block(self, number):
+        return {
+            'number': hex(number),
+            'hash': "0x" + keccak(number.to_bytes(32, 'big')).hex(),
+            'parentHash': "0x" + keccak((number - 1).to_bytes(32, 'big', signed=True)).hex(),
+            'timestamp': hex(self.block_timestamp(number)),
+            'baseFeePerGas': hex(self.base_fee),
+            'gasLimit': hex(30_000_000),
+            'gasUsed': hex(0),
+            'miner': "0x" + "00" * 20,
+            'transactions': [],
+        }
+
+    def resolve_block(self, tag):
+        if tag in (None, 'latest', 'safe', 'finalized'):
+            return self.block_number()
+        if tag == 'pending':
+            return self.block_number() + 1
+        if tag == 'earliest':
+            return 0
+        return int(tag, 16)
+
+    # --- markets ---
+    def add_market(self, address, trade_size=10**16, trade_duration=86400, next_settlement=None, cohort_size=0):
+        if next_settlement is None:
+            next_settlement = self.genesis_timestamp + trade_duration
+        market = MockMarket(address, trade_size, trade_duration, next_settlement, cohort_size)
+        self.markets[market.address] = market
+        return market
+
+    def execute(self, to, data, sender, timestamp, commit):
+        """Run calldata against a market or Multicall3"""
+        to = to_checksum_address(to)
+        if to == MULTICALL3_ADDRESS:
+            return self._multicall(bytes(data), sender, timestamp), []
+        if to in self.markets:
+            return self.markets[to].call(bytes(data), sender, timestamp, commit)
+        return b"", []
+
+    def _multicall(self, data, sender, timestamp):
+        sel, args = data[:4], data[4:]
+        if sel == selector("getCurrentBlockTimestamp()"):
+            return encode(['uint256'], [timestamp])
+        if sel == selector("getBlockNumber()"):
+            return encode(['uint256'], [self.block_number()])
+        if sel == selector("getEthBalance(address)"):
+            (address,) = decode(['address'], args)
+            return encode(['uint256'], [self.get_balance(address)])
+        if sel == selector("aggregate3((address,bool,bytes)[])"):
+            (calls,) = decode(['(address,bool,bytes)[]'], args)
+            results = []
+            for target, allow_failure, call_data in calls:
+                try:
+                    return_data, _ = self.execute(target, call_data, MULTICALL3_ADDRESS, timestamp, False)
+                    results.append((True, return_data))
+                except Revert as e:
+                    if not allow_failure:
+                        raise
+                    results.append((False, e.data))
+            return encode(['(bool,bytes)[]'], [results])
+        raise Revert("InvalidAmount")
+
+    def estimate_gas(self, to, data):
+        """Gas of a call, settlements scale with the active cohort size"""
+        market = self.markets.get(to_checksum_address(to)) if to else None
+        if not data:
+            return 21_000
+        if market and bytes(data[:4]) == selector("settleCohort()"):
+            return 141_000 + 7_000 * market.cohort_size(market.active_cohort_id)
+        return 60_000
+
+    def get_balance(self, address):
+        address = to_checksum_address(address)
+        if address in self.markets:
+            return self.markets[address].balance
+        return self.balances.get(address, 10**18)
+
+    # --- transactions ---
+    def send_raw_transaction(self, raw):
+        raw = bytes.fromhex(raw[2:])
+        if raw[0] < 0x7f:
+            tx = TypedTransaction.from_bytes(HexBytes(raw)).as_dict()
+        else:
+            tx = Transaction.from_bytes(raw).as_dict()
+        tx_hash = "0x" + keccak(raw).hex()
+        sender = Account.recover_transaction(raw)
+        with self.lock:
+            if tx_hash in self.transactions or tx_hash in self.queued_hashes:
+                raise ValueError("already known")
+            expected = self.nonces.get(sender, 0)
+            if tx['nonce'] < expected:
+                raise ValueError("nonce too low")
+            # Like a node's tx pool: future nonces wait until the gap before them is filled
+            self.queued.setdefault(sender, {})[tx['nonce']] = (tx_hash, tx)
+            self.queued_hashes.add(tx_hash)
+            logs = []
+            while self.nonces.get(sender, 0) in self.queued[sender]:
+                queued_hash, queued_tx = self.queued[sender].pop(self.nonces.get(sender, 0))
+                self.queued_hashes.discard(queued_hash)
+                logs += self._include(queued_hash, queued_tx, sender)
+        for listener in self.listeners:
+            listener('logs', logs)
+        return tx_hash
+
+    def _include(self, tx_hash, tx, sender):
+        """Execute a transaction into the next block, returns its logs"""
+        number = self.block_number() + 1
+        status, logs = 1, []
+        to = "0x" + bytes(tx['to']).hex() if tx['to'] else None
+        gas_used = self.estimate_gas(to, tx['data'])
+        try:
+            if to:
+                _, logs = self.execute(to, tx['data'], sender, self.block_timestamp(number), True)
+        except Revert:
+            status = 0
+        self.nonces[sender] = tx['nonce'] + 1
+        gas_price = tx.get('gasPrice') or min(tx['maxFeePerGas'], self.base_fee + tx['maxPriorityFeePerGas'])
+        self.transactions[tx_hash] = dict(tx, hash=tx_hash, sender=sender, blockNumber=number)
+        for index, log in enumerate(logs):
+            log.update({
+                'blockNumber': hex(number),
+                'transactionHash': tx_hash,
+                'logIndex': hex(index),
+                'transactionIndex': hex(0),
+                'blockHash': self.block(number)['hash'],
+                'removed': False,
+            })
+            self.logs.append(log)
+        self.receipts[tx_hash] = {
+            'transactionHash': tx_hash,
+            'transactionIndex': hex(0),
+            'blockNumber': hex(number),
+            'blockHash': self.block(number)['hash'],
+            'from': sender,
+            'to': to,
+            'status': hex(status),
+            'gasUsed': hex(gas_used),
+            'cumulativeGasUsed': hex(gas_used),
+            'effectiveGasPrice': hex(gas_price),
+            'logs': logs,
+            'logsBloom': "0x" + "00" * 256,
+            'contractAddress': None,
+            'type': hex(tx.get('type', 0)),
+        }
+        return logs
+
+    def get_receipt(self, tx_hash):
+        receipt = self.receipts.get(tx_hash)
+        if receipt is None or int(receipt['blockNumber'], 16) > self.block_number():
+            return None
+        return receipt
+
+    def get_logs(self, params):
+        from_block = self.resolve_block(params.get('fromBlock'))
+        to_block = self.resolve_block(params.get('toBlock'))
+        addresses = params.get('address') or []
+        if isinstance(addresses, str):
+            addresses = [addresses]
+        addresses = {to_checksum_address(a) for a in addresses}
+        topics = params.get('topics') or []
+        matches = []
+        for log in self.logs:
+            number = int(log['blockNumber'], 16)
+            if not from_block <= number <= to_block:
+                continue
+            if addresses and to_checksum_address(log['address']) not in addresses:
+                continue
+            if topics and topics[0] and log['topics'][0] not in (topics[0] if isinstance(topics[0], list) else [topics[0]]):
+                continue
+            matches.append(log)
+        return matches
+
+    # --- JSON-RPC ---
+    def handle(self, request):
+        """Handle one JSON-RPC request object"""
+        method = request.get('method')
+        params = request.get('params') or []
+        with self.lock:
+            self.request_counts[method] = self.request_counts.get(method, 0) + 1
+        response = {'jsonrpc': "2.0", 'id': request.get('id')}
+        if self.error_rate and random.random() < self.error_rate:
+            response['error'] = {'code': -32603, 'message': "injected error"}
+            return response
+        try:
+            response['result'] = self.dispatch(method, params)
+        except Revert as e:
+            response['error'] = {'code': 3, 'message': "execution reverted", 'data': "0x" + e.data.hex()}
+        except ValueError as e:
+            response['error'] = {'code': -32000, 'message': str(e)}
+        return response
+
+    def dispatch(self, method, params):
+        if method == 'eth_chainId':
+            return hex(CHAIN_ID)
+        if method == 'net_version':
+            return str(CHAIN_ID)
+        if method == 'eth_blockNumber':
+            return hex(self.block_number())
+        if method == 'eth_getBlockByNumber':
+            return self.block(self.resolve_block(params[0]))
+        if method == 'eth_gasPrice':
+            return hex(self.base_fee)
+        if method == 'eth_maxPriorityFeePerGas':
+            return hex(0)
+        if method == 'eth_feeHistory':
+            count = int(params[0], 16) if isinstance(params[0], str) else params[0]
+            newest = self.resolve_block(params[1])
+            percentiles = params[2] if len(params) > 2 else []
+            return {
+                'oldestBlock': hex(max(newest - count + 1, 0)),
+                'baseFeePerGas': [hex(self.base_fee)] * (count + 1),
+                'gasUsedRatio': [0.1] * count,
+                'reward': [[hex(0)] * len(percentiles) for _ in range(count)],
+            }
+        if method == 'eth_getTransactionCount':
+            return hex(self.nonces.get(to_checksum_address(params[0]), 0))
+        if method == 'eth_getBalance':
+            return hex(self.get_balance(params[0]))
+        if method == 'eth_getCode':
+            address = to_checksum_address(params[0])
+            if address in self.markets or address == MULTICALL3_ADDRESS:
+                return "0x" + keccak(text=address).hex()
+            return "0x"
+        if method in ('eth_call', 'eth_estimateGas'):
+            tx = params[0]
+            number = self.resolve_block(params[1] if len(params) > 1 else 'latest')
+            sender = to_checksum_address(tx.get('from') or "0x" + "00" * 20)
+            data = bytes.fromhex((tx.get('data') or tx.get('input') or "0x")[2:])
+            return_data, _ = self.execute(tx['to'], data, sender, self.block_timestamp(number), False)
+            if method == 'eth_estimateGas':
+                return hex(self.estimate_gas(tx['to'], data))
+            return "0x" + return_data.hex()
+        if method == 'eth_sendRawTransaction':
+            return self.send_raw_transaction(params[0])
+        if method == 'eth_getTransactionReceipt':
+            return self.get_receipt(params[0])
+        if method == 'eth_getTransactionByHash':
+            tx = self.transactions.get(params[0])
+            if tx is None:
+                return None
+            return {'hash': tx['hash'], 'from': tx['sender'], 'nonce': hex(tx['nonce']), 'blockNumber': hex(tx['blockNumber'])}
+        if method == 'eth_getLogs':
+            return self.get_logs(params[0])
+        raise ValueError(f"method not supported: {method}")
+
+    def handle_payload(self, payload):
+        if self.latency:
+            time.sleep(self.latency)
+        if isinstance(payload, list):
+            return [self.handle(request) for request in payload]
+        return self.handle(payload)
+
+def make_http_server(chain, host="127.0.0.1", port=0, latency=0.0):
+    """Create a threaded HTTP JSON-RPC server for the chain
+
+    latency is added to every request of this server on top of the chain's own latency, so
+    several servers of one chain can stand in for RPC endpoints of different speed. It can be
+    a callable returning the delay per request.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            # Headers and body go out in separate writes, without this every keep-alive
+            # request waits for a delayed ACK (~40 ms)
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            delay = latency() if callable(latency) else latency
+            if delay:
+                time.sleep(delay)
+            response = json.dumps(chain.handle_payload(json.loads(body))).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(response)))
+            self.end_headers()
+            self.wfile.write(response)
+
+        def log_message(self, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+def serve_http(chain, host="127.0.0.1", port=0, latency=0.0):
+    """Start the HTTP server in a daemon thread, returns (server, url)"""
+    server = make_http_server(chain, host, port, latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+async def _ws_session(chain, websocket):
+    """Serve JSON-RPC and eth_subscribe notifications on one WebSocket connection"""
+    subscriptions = {}
+    last_block = chain.block_number()
+
+    async def push_blocks():
+        nonlocal last_block
+        while True:
+            await asyncio.sleep(chain.block_time / 2)
+            current = chain.block_number()
+            for number in range(last_block + 1, current + 1):
+                for subscription_id, (kind, params) in list(subscriptions.items()):
+                    if kind == 'newHeads':
+                        results = [chain.block(number)]
+                    else:
+                        results = chain.get_logs(dict(params, fromBlock=hex(number), toBlock=hex(number)))
+                    for result in results:
+                        await websocket.send(json.dumps({
+                            'jsonrpc': "2.0",
+                            'method': "eth_subscription",
+                            'params': {'subscription': subscription_id, 'result': result},
+                        }))
+            last_block = current
+
+    pusher = asyncio.create_task(push_blocks())
+    try:
+        async for message in websocket:
+            request = json.loads(message)
+            if isinstance(request, dict) and request.get('method') == 'eth_subscribe':
+                params = request['params']
+                subscription_id = hex(random.getrandbits(64))
+                subscriptions[subscription_id] = (params[0], params[1] if len(params) > 1 else {})
+                response = {'jsonrpc': "2.0", 'id': request['id'], 'result': subscription_id}
+            elif isinstance(request, dict) and request.get('method') == 'eth_unsubscribe':
+                existed = subscriptions.pop(request['params'][0], None) is not None
+                response = {'jsonrpc': "2.0", 'id': request['id'], 'result': existed}
+            else:
+                response = await asyncio.to_thread(chain.handle_payload, request)
+            await websocket.send(json.dumps(response))
+    except websockets.ConnectionClosed:
+        pass
+    finally:
+        pusher.cancel()
+
+def serve_ws(chain, host="127.0.0.1", port=0):
+    """Start the WebSocket server in a daemon thread, returns url"""
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    address = {}
+
+    async def start():
+        server = await websockets.serve(lambda ws, *args: _ws_session(chain, ws), host, port)
+        address['port'] = server.sockets[0].getsockname()[1]
+        started.set()
+        await asyncio.Future()
+
+    threading.Thread(target=loop.run_until_complete, args=(start(),), daemon=True).start()
+    started.wait()
+    return f"ws://{host}:{address['port']}"
+
+def main():
+    """Run a mock node with synthetic markets until interrupted"""
+    import argparse
+    parser = argparse.ArgumentParser(description="Local TopCut JSON-RPC stand-in")
+    parser.add_argument("--markets", type=int, default=5, help="number of synthetic markets")
+    parser.add_argument("--http-port", type=int, default=8545)
+    parser.add_argument("--ws-port", type=int, default=8546)
+    parser.add_argument("--block-time", type=float, default=0.25)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with an error")
+    parser.add_argument("--due-in", type=int, default=30, help="seconds until the first markets can be settled")
+    args = parser.parse_args()
+
+    chain = MockChain(args.block_time, latency=args.latency, error_rate=args.error_rate)
+    for address in synthetic_market_addresses(args.markets):
+        chain.add_market(address, next_settlement=chain.genesis_timestamp + args.due_in, cohort_size=25)
+
+    _, http_url = serve_http(chain, port=args.http_port)
+    ws_url = serve_ws(chain, port=args.ws_port)
+    print(f"HTTP JSON-RPC: {http_url}")
+    print(f"WebSocket JSON-RPC: {ws_url}")
+    print("Markets:")
+    for address in chain.markets:
+        print(f"  {address}")
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+
+def synthetic_market_addresses(count):
+    """Deterministic market addresses for mock deployments"""
+    return [to_checksum_address(keccak(text=f"topcut-mock-market-{i}")[:20]) for i in range(count)]
+
+if __name__ == "__main__":
+    main()
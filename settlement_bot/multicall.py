@@ -0,0 +1,135 @@
+"""
+TopCut Multicall3 Helpers
+Batch view calls across all markets into a single eth_call
+"""
+
+from eth_abi import encode
+from eth_utils import function_signature_to_4byte_selector
+
+# The aggregate3 codec is shared with fast_status.py
+from rpc_codec import MULTICALL3_ADDRESS, decode_aggregate3, decode_uint, encode_aggregate3
+
+# Market view functions read for every settlement check (state key, signature)
+MARKET_STATE_CALLS = [
+    ('next_settlement', "nextSettlement()"),
+    ('active_cohort_id', "activeCohortID()"),
+    ('cohort_size_1', "cohortSize_1()"),
+    ('cohort_size_2', "cohortSize_2()"),
+]
+
+# Per-market values of a rewards snapshot, in the order of build_rewards_calls
+REWARD_FIELDS = ['keeper_rewards', 'contract_balance', 'total_pending_claims']
+
+def encode_call(signature, arg_types=(), args=()):
+    """Encode calldata for a function signature like 'keeperRewards(address)'"""
+    call_data = function_signature_to_4byte_selector(signature)
+    if arg_types:
+        call_data += encode(list(arg_types), list(args))
+    return call_data
+
+def aggregate3(w3, calls, block_identifier='latest'):
+    """Execute (target, call_data) pairs in one eth_call, returns (success, return_data) pairs"""
+    raw_result = w3.eth.call({
+        'to': MULTICALL3_ADDRESS,
+        'data': encode_aggregate3(calls),
+    }, block_identifier)
+    return decode_aggregate3(raw_result)
+
+async def async_aggregate3(w3, calls, block_identifier='latest'):
+    """aggregate3 for an AsyncWeb3 instance"""
+    raw_result = await w3.eth.call({
+        'to': MULTICALL3_ADDRESS,
+        'data': encode_aggregate3(calls),
+    }, block_identifier)
+    return decode_aggregate3(raw_result)
+
+def build_markets_state_calls(contracts):
+    """Calls for block timestamp, block number and every market's state views"""
+    calls = [
+        (MULTICALL3_ADDRESS, encode_call("getCurrentBlockTimestamp()")),
+        (MULTICALL3_ADDRESS, encode_call("getBlockNumber()")),
+    ]
+    for contract_info in contracts.values():
+        for _, signature in MARKET_STATE_CALLS:
+            calls.append((contract_info['address'], encode_call(signature)))
+    return calls
+
+def parse_markets_state(contracts, results):
+    """Turn aggregate3 results of build_markets_state_calls into per-market state dicts"""
+    current_block_timestamp = decode_uint(*results[0])
+    block_number = decode_uint(*results[1])
+
+    states = {}
+    offset = 2
+    for name in contracts:
+        values = [decode_uint(*result) for result in results[offset:offset + len(MARKET_STATE_CALLS)]]
+        offset += len(MARKET_STATE_CALLS)
+
+        # A market is only usable if every one of its reads succeeded
+        if current_block_timestamp is None or None in values:
+            states[name] = None
+            continue
+
+        state = {key: value for (key, _), value in zip(MARKET_STATE_CALLS, values)}
+        state['current_timestamp'] = current_block_timestamp
+        state['block_number'] = block_number
+        states[name] = state
+
+    return states
+
+def build_rewards_calls(contracts, account_address, keeper_rewards=True):
+    """Calls for block number, account balance and every market's keeper reward, balance and pending claims
+
+    keeper_rewards=False leaves out keeperRewards, for callers that take it from the state mirror.
+    """
+    calls = [
+        (MULTICALL3_ADDRESS, encode_call("getBlockNumber()")),
+        (MULTICALL3_ADDRESS, encode_call("getEthBalance(address)", ['address'], [account_address])),
+    ]
+    for contract_info in contracts.values():
+        if keeper_rewards:
+            calls.append((contract_info['address'], encode_call("keeperRewards(address)", ['address'], [account_address])))
+        calls.append((MULTICALL3_ADDRESS, encode_call("getEthBalance(address)", ['address'], [contract_info['address']])))
+        calls.append((contract_info['address'], encode_call("totalPendingClaims()")))
+    return calls
+
+def parse_rewards(contracts, results, keeper_rewards=None):
+    """Turn aggregate3 results of build_rewards_calls into a rewards snapshot
+
+    keeper_rewards ({name: amount}, see MarketMirror.keeper_rewards) is given when the calls
+    were built with keeper_rewards=False.
+    """
+    per_market = 3 if keeper_rewards is None else 2
+    markets = {}
+    for index, name in enumerate(contracts):
+        values = [decode_uint(*result) for result in results[2 + per_market * index:2 + per_market * (index + 1)]]
+        if keeper_rewards is not None:
+            values.insert(0, keeper_rewards.get(name))
+        markets[name] = None if None in values else dict(zip(REWARD_FIELDS, values))
+    return {
+        'block_number': decode_uint(*results[0]),
+        'account_balance': decode_uint(*results[1]),
+        'markets': markets,
+    }
+
+def get_markets_uint(w3, contracts, signature, block_identifier='latest'):
+    """Read one uint256 view (e.g. 'TRADE_DURATION()') from every market in one eth_call"""
+    calls = [(contract_info['address'], encode_call(signature)) for contract_info in contracts.values()]
+    results = aggregate3(w3, calls, block_identifier)
+    return {name: decode_uint(*result) for name, result in zip(contracts, results)}
+
+async def async_get_markets_uint(w3, contracts, signature, block_identifier='latest'):
+    """get_markets_uint for an AsyncWeb3 instance"""
+    calls = [(contract_info['address'], encode_call(signature)) for contract_info in contracts.values()]
+    results = await async_aggregate3(w3, calls, block_identifier)
+    return {name: decode_uint(*result) for name, result in zip(contracts, results)}
+
+def get_markets_state(w3, contracts, block_identifier='latest'):
+    """Get the state of every market and the block timestamp from one snapshot"""
+    results = aggregate3(w3, build_markets_state_calls(contracts), block_identifier)
+    return parse_markets_state(contracts, results)
+
+async def async_get_markets_state(w3, contracts, block_identifier='latest'):
+    """get_markets_state for an AsyncWeb3 instance"""
+    results = await async_aggregate3(w3, build_markets_state_calls(contracts), block_identifier)
+    return parse_markets_state(contracts, results)
@@ -0,0 +1,106 @@
+"""
+TopCut Nonce Manager
+Hands out transaction nonces locally so transactions can be sent back-to-back
+"""
+
+import asyncio
+import threading
+
+# Fragments of node error messages that mean our local nonce view is wrong
+NONCE_ERRORS = (
+    "nonce too low",
+    "nonce too high",
+    "already known",
+    "replacement transaction underpriced",
+    "known transaction",
+    "invalid nonce",
+)
+
+def is_nonce_error(error):
+    """Check if an exception raised by the node is caused by a stale nonce"""
+    message = str(error).lower()
+    return any(fragment in message for fragment in NONCE_ERRORS)
+
+class NonceManager:
+    """Nonce allocator seeded once from the pending transaction count"""
+
+    def __init__(self, w3, address):
+        self.w3 = w3
+        self.address = address
+        self.lock = threading.RLock()
+        self.next_nonce = None
+
+    def sync(self):
+        """Reset the local counter from the node's pending transaction count"""
+        with self.lock:
+            self.next_nonce = self.w3.eth.get_transaction_count(self.address, 'pending')
+            return self.next_nonce
+
+    def allocate(self):
+        """Get the next nonce without an RPC call (seeds on first use or after a resync request)"""
+        with self.lock:
+            if self.next_nonce is None:
+                self.sync()
+            nonce = self.next_nonce
+            self.next_nonce += 1
+            return nonce
+
+    def peek(self):
+        """Next nonce without allocating it (seeds on first use or after a resync request)"""
+        with self.lock:
+            if self.next_nonce is None:
+                self.sync()
+            return self.next_nonce
+
+    def release(self, nonce):
+        """Return a nonce whose transaction was never broadcast"""
+        with self.lock:
+            if self.next_nonce is not None and nonce == self.next_nonce - 1:
+                self.next_nonce = nonce
+            else:
+                # A later nonce is already out, the gap can only be fixed from the node's view
+                self.next_nonce = None
+
+    def mark_stale(self):
+        """Force a resync before the next allocation (dropped or replaced transaction)"""
+        with self.lock:
+            self.next_nonce = None
+
+    def handle_send_error(self, nonce, error):
+        """Recover the counter after send_raw_transaction failed"""
+        if is_nonce_error(error):
+            self.mark_stale()
+        else:
+            self.release(nonce)
+
+class AsyncNonceManager(NonceManager):
+    """NonceManager for an AsyncWeb3 instance, used from a single event loop"""
+
+    def __init__(self, w3, address):
+        super().__init__(w3, address)
+        self.sync_lock = asyncio.Lock()
+
+    async def sync(self):
+        """Reset the local counter from the node's pending transaction count"""
+        async with self.sync_lock:
+            self.next_nonce = await self.w3.eth.get_transaction_count(self.address, 'pending')
+            return self.next_nonce
+
+    async def allocate(self):
+        """Get the next nonce without an RPC call (seeds on first use or after a resync request)"""
+        async with self.sync_lock:
+            if self.next_nonce is None:
+                self.next_nonce = await self.w3.eth.get_transaction_count(self.address, 'pending')
+            nonce = self.next_nonce
+            self.next_nonce += 1
+            return nonce
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+def get_nonce_manager(w3, address):
+    """Get the process-wide NonceManager for an address"""
+    with _managers_lock:
+        if address not in _managers:
+            _managers[address] = NonceManager(w3, address)
+        return _managers[address]
@@ -0,0 +1,157 @@
+"""
+TopCut Pre-flight Simulation
+Transactions simulated with eth_call before they are signed, reverts decoded into the market's custom errors
+"""
+
+import json
+import os
+import threading
+
+from eth_abi import decode
+from eth_utils import function_signature_to_4byte_selector
+
+from multicall import encode_call
+
+ERROR_STRING_SELECTOR = function_signature_to_4byte_selector("Error(string)")
+PANIC_SELECTOR = function_signature_to_4byte_selector("Panic(uint256)")
+
+class ContractRevert(Exception):
+    """A simulated transaction reverted; name is the decoded custom error
+
+    retry_delay is the default number of seconds before the transaction is tried again,
+    0 means on the next check. PREFLIGHT_BACKOFF overrides it per error.
+    """
+    retry_delay = 60
+
+    def __init__(self, name, data=b"", reason=None):
+        super().__init__(f"{name}: {reason}" if reason else name)
+        self.name = name
+        self.data = data
+        self.reason = reason
+
+class SequencerDown(ContractRevert):
+    retry_delay = 60  # The sequencer uptime feed reports an outage, nothing settles until it is back
+
+class GracePeriodNotOver(ContractRevert):
+    retry_delay = 120  # The sequencer is back, prices are not trusted until the grace period ends
+
+class StalePrice(ContractRevert):
+    retry_delay = 30  # Waits for the next oracle heartbeat or deviation update
+
+class InvalidPrice(ContractRevert):
+    retry_delay = 60
+
+class CohortActive(ContractRevert):
+    retry_delay = 0  # The deadline is not reached at the simulated block, the next block may be
+
+class InsufficientBalance(ContractRevert):
+    retry_delay = 1800  # The market holds less than the claim until winners claim or it is funded
+
+class InvalidAmount(ContractRevert):
+    retry_delay = 0  # The rewards changed since the snapshot, the next check reads them again
+
+ERROR_TYPES = {error_type.__name__: error_type for error_type in (
+    SequencerDown, GracePeriodNotOver, StalePrice, InvalidPrice, CohortActive, InsufficientBalance, InvalidAmount)}
+
+def parse_backoff(spec):
+    """'StalePrice=10,SequencerDown=300' -> {error name: seconds}"""
+    backoff = {}
+    for item in (spec or "").split(","):
+        if "=" in item:
+            name, seconds = item.split("=", 1)
+            backoff[name.strip()] = float(seconds)
+    return backoff
+
+BACKOFF = parse_backoff(os.getenv("PREFLIGHT_BACKOFF"))  # Per-error retry delays replacing the defaults
+
+def backoff_seconds(error):
+    """Seconds before a transaction whose simulation raised error is tried again"""
+    return BACKOFF.get(error.name, error.retry_delay)
+
+_selectors = {}  # ABI file -> {4-byte selector: error name}
+_selectors_lock = threading.Lock()
+
+def abi_errors(abi_path):
+    """{4-byte selector: error name} of the custom errors in an ABI file, parsed once per file"""
+    with _selectors_lock:
+        if abi_path not in _selectors:
+            with open(abi_path, 'r') as f:
+                abi = json.load(f)
+            _selectors[abi_path] = {
+                function_signature_to_4byte_selector(
+                    f"{entry['name']}({','.join(item['type'] for item in entry.get('inputs', []))})"): entry['name']
+                for entry in abi if entry.get('type') == 'error'
+            }
+        return _selectors[abi_path]
+
+def decode_revert(data, errors):
+    """Revert data -> typed ContractRevert, errors from abi_errors()"""
+    data = bytes(data or b"")
+    selector = data[:4]
+    if selector == ERROR_STRING_SELECTOR:
+        return ContractRevert("Error", data, decode(['string'], data[4:])[0])
+    if selector == PANIC_SELECTOR:
+        return ContractRevert("Panic", data, hex(decode(['uint256'], data[4:])[0]))
+    name = errors.get(selector)
+    if name is None:
+        return ContractRevert("Unknown", data, "0x" + data.hex() if data else "no revert data")
+    return ERROR_TYPES.get(name, ContractRevert)(name, data)
+
+def revert_data(error):
+    """Revert data of a failed eth_call, from a JSON-RPC error dict or a web3 exception; None if there is none"""
+    data = getattr(error, 'data', None)
+    if data is None and error.args and isinstance(error.args[0], dict):
+        data = error.args[0].get('data')
+        if isinstance(data, dict):  # Some nodes nest it: {'data': {'data': '0x...'}}
+            data = data.get('data')
+    if isinstance(data, str) and data.startswith("0x"):
+        return bytes.fromhex(data[2:])
+    return data if isinstance(data, (bytes, bytearray)) else None
+
+def call_error(error, errors):
+    """Typed ContractRevert of a failed eth_call, None if it failed without revert data (node error)"""
+    data = revert_data(error)
+    return decode_revert(data, errors) if data is not None else None
+
+def settle_calls(settlements, block_identifier='pending'):
+    """eth_call per (market address, sender) settlement, simulated from the sender"""
+    return [("eth_call", [{'from': sender, 'to': market, 'data': "0x" + encode_call("settleCohort()").hex()},
+                          block_identifier])
+            for market, sender in settlements]
+
+def claim_calls(claims, block_identifier='pending'):
+    """eth_call per (market address, sender, recipient, amount) claim, simulated from the sender"""
+    return [("eth_call", [{'from': sender, 'to': market,
+                           'data': "0x" + encode_call("claimKeeperReward(address,uint256)", ['address', 'uint256'],
+                                                      [recipient, int(amount)]).hex()}, block_identifier])
+            for market, sender, recipient, amount in claims]
+
+def simulate(send_batch, keys, calls, errors):
+    """Send one eth_call per key in one JSON-RPC batch, returns {key: ContractRevert or None}
+
+    Every call succeeds or reverts on its own, so one market hitting the node's eth_call
+    gas cap does not hide the others. A call that failed without revert data counts as
+    passed, the transaction itself decides then.
+    """
+    if not calls:
+        return {}
+    results = send_batch(calls)
+    return {key: call_error(result, errors) if isinstance(result, Exception) else None
+            for key, result in zip(keys, results)}
+
+def simulate_settlements(send_batch, settlements, errors, block_identifier='pending'):
+    """Simulate {key: (market address, sender)} settleCohort() calls in one JSON-RPC batch"""
+    return simulate(send_batch, list(settlements), settle_calls(settlements.values(), block_identifier), errors)
+
+def simulate_claims(send_batch, claims, errors, block_identifier='pending'):
+    """Simulate {key: (market address, sender, recipient, amount)} claims in one JSON-RPC batch"""
+    return simulate(send_batch, list(claims), claim_calls(claims.values(), block_identifier), errors)
+
+async def async_simulate_settlement(w3, market, sender, errors, block_identifier='pending'):
+    """Simulate one settleCohort() with an AsyncWeb3 instance, returns ContractRevert or None"""
+    transaction = {'from': sender, 'to': market, 'data': "0x" + encode_call("settleCohort()").hex()}
+    try:
+        await w3.eth.call(transaction, block_identifier)
+    except Exception as e:
+        return call_error(e, errors)
+    return None
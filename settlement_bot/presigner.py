@@ -0,0 +1,116 @@
+"""
+TopCut Settlement Presigner
+settleCohort transactions signed before the deadline, so firing is a single send_raw_transaction
+"""
+
+import time
+
+from fee_engine import fee_fields
+from gas_model import get_gas_model
+from metrics import CALL_SECONDS
+from nonce_manager import get_nonce_manager
+from tx_journal import get_journal
+
+class SettlementPresigner:
+    """Keeps one signed settleCohort transaction per market ready to broadcast
+
+    Every market is signed by the key the signer pool assigns to it, from that key's nonce stream.
+    """
+
+    def __init__(self, w3, signers, chain_id):
+        self.w3 = w3
+        self.signers = signers
+        self.chain_id = chain_id
+        self.armed = {}  # market name -> signed transaction and the inputs it was signed with
+
+    def _sign(self, account, address, data, nonce, fees, gas_limit):
+        """(unsigned transaction, signed transaction)"""
+        transaction = {
+            'to': address,
+            'data': data,
+            'value': 0,
+            'gas': gas_limit,
+            **fee_fields(fees),
+            'nonce': nonce,
+            'chainId': self.chain_id,
+        }
+        return transaction, account.sign_transaction(transaction)
+
+    def arm(self, name, contract, cohort_size, fees, deadline=None):
+        """Sign (or re-sign) the settlement of a market that is about to become due
+
+        eth_estimateGas reverts before nextSettlement, so the gas limit comes from the gas model.
+        An armed transaction is kept while its nonce is still next, its priority fee matches
+        and its fee cap and gas limit still cover the current estimate. cohort_size and the
+        deadline being settled are kept for the transaction journal.
+        """
+        account = self.signers.account_for(contract.address)
+        nonce = get_nonce_manager(self.w3, account.address).peek()
+        gas_limit = get_gas_model().predict('settle', cohort_size)
+        armed = self.armed.get(name)
+        if (armed and armed['account'] is account and armed['nonce'] == nonce and armed['gas_limit'] >= gas_limit
+                and armed['fees']['max_priority_fee_per_gas'] == fees['max_priority_fee_per_gas']
+                and armed['fees']['max_fee_per_gas'] >= fees['max_fee_per_gas']):
+            return armed
+
+        data = armed['data'] if armed else contract.encodeABI(fn_name="settleCohort")
+        transaction, signed = self._sign(account, contract.address, data, nonce, fees, gas_limit)
+        self.armed[name] = {
+            'account': account,
+            'address': contract.address,
+            'data': data,
+            'nonce': nonce,
+            'fees': fees,
+            'gas_limit': gas_limit,
+            'cohort_size': cohort_size,
+            'deadline': deadline,
+            'transaction': transaction,
+            'signed': signed,
+        }
+        print(f"[{name}] Settlement {'re-signed' if armed else 'armed'} (nonce {nonce}, "
+              f"max fee {fees['max_fee_per_gas'] / 1e9:.3f} gwei, gas {gas_limit})")
+        return self.armed[name]
+
+    def is_armed(self, name):
+        return name in self.armed
+
+    def armed_account(self, name):
+        """Account that signed the armed settlement of a market"""
+        return self.armed[name]['account']
+
+    def disarm(self, name):
+        """Drop the armed transaction of a market (settled elsewhere or rescheduled)"""
+        self.armed.pop(name, None)
+
+    def fire(self, name):
+        """Broadcast the armed settlement, returns the tx hash or None on failure
+
+        The nonce is allocated locally; if another transaction took the armed one in the
+        meantime the settlement is re-signed, which costs no round trip.
+        """
+        armed = self.armed.pop(name)
+        nonce_manager = get_nonce_manager(self.w3, armed['account'].address)
+        nonce = nonce_manager.allocate()
+        transaction, signed = armed['transaction'], armed['signed']
+        if nonce != armed['nonce']:
+            transaction, signed = self._sign(armed['account'], armed['address'], armed['data'], nonce,
+                                             armed['fees'], armed['gas_limit'])
+        journal = get_journal()
+        journal.signed(signed.hash.hex(), 'settle', armed['account'].address, nonce, transaction,
+                       signed.rawTransaction, market=armed['address'], deadline=armed['deadline'],
+                       cohort_size=armed['cohort_size'])
+
+        started = time.time()
+        try:
+            with CALL_SECONDS.time(site="send_raw_transaction"):
+                tx_hash = self.w3.eth.send_raw_transaction(signed.rawTransaction)
+        except Exception as e:
+            nonce_manager.handle_send_error(nonce, e)
+            journal.update(signed.hash.hex(), 'dropped')
+            print(f"[{name}] Error sending armed settlement: {e}")
+            return None
+        tx_hash_hex = tx_hash.hex()
+        journal.update(tx_hash_hex, 'sent')
+        print(f"[{name}] Armed settlement sent in {(time.time() - started) * 1000:.0f} ms: "
+              f"{tx_hash_hex} (nonce {nonce})")
+        return tx_hash_hex
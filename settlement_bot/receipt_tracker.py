@@ -0,0 +1,154 @@
+"""
+TopCut Receipt Tracker
+Background thread that polls all outstanding transaction receipts in one JSON-RPC batch per block
+"""
+
+import threading
+import time
+from concurrent.futures import Future
+
+import requests
+from web3.datastructures import AttributeDict
+
+from metrics import observe_batch
+from rpc_codec import rpc_batch
+
+RECEIPT_INT_FIELDS = ['blockNumber', 'status', 'gasUsed', 'cumulativeGasUsed', 'effectiveGasPrice',
+                      'transactionIndex', 'type']
+
+def format_receipt(raw_receipt):
+    """JSON-RPC receipt -> AttributeDict with integer fields, like web3's receipts"""
+    receipt = dict(raw_receipt)
+    for field in RECEIPT_INT_FIELDS:
+        if isinstance(receipt.get(field), str):
+            receipt[field] = int(receipt[field], 16)
+    return AttributeDict(receipt)
+
+class ReceiptTracker:
+    """Resolves a Future per tracked transaction once it is mined or times out"""
+
+    def __init__(self, url=None, poll_interval=0.25, timeout=300, send_batch=None):
+        self.url = url
+        self.poll_interval = poll_interval  # Seconds between eth_blockNumber checks
+        self.timeout = timeout  # Default seconds before a transaction counts as not mined
+        self.http_session = requests.Session()
+        # Sends a list of (method, params) as one batch, e.g. RPCPool.batch; defaults to url
+        self.send_batch = send_batch or (lambda calls: rpc_batch(self.http_session, self.url, calls))
+        self.lock = threading.Lock()
+        self.pending = {}  # tx hash -> [(callback, future, deadline)]
+        self.block_hooks = []  # Objects whose calls() ride in every per-block batch, see add_block_hook()
+        self.last_block = None
+        self.thread = None
+        self.stopped = threading.Event()
+
+    def track(self, tx_hash, callback=None, timeout=None):
+        """Watch a transaction; the Future resolves to callback(receipt), receipt is None on timeout
+
+        Without a callback the Future resolves to the receipt itself. Callbacks run on the
+        tracker thread and should return quickly.
+        """
+        future = Future()
+        deadline = time.time() + (self.timeout if timeout is None else timeout)
+        with self.lock:
+            self.pending.setdefault(tx_hash, []).append((callback, future, deadline))
+            if self.thread is None or not self.thread.is_alive():
+                self.stopped.clear()
+                self.thread = threading.Thread(target=self._run, name="receipt-tracker", daemon=True)
+                self.thread.start()
+        return future
+
+    def add_block_hook(self, hook):
+        """Add (method, params) calls to the receipt batch of every new block
+
+        hook.calls() returns the calls (may be empty), hook.handle(results, resolved) gets
+        their results and the hashes whose receipts arrived in the same batch.
+        """
+        with self.lock:
+            self.block_hooks.append(hook)
+
+    def abandon(self, tx_hash):
+        """Stop waiting for a transaction that can no longer be mined, its waiters get None"""
+        with self.lock:
+            waiters = self.pending.pop(tx_hash, [])
+        self._resolve(waiters, None)
+
+    def outstanding(self):
+        """Number of transactions still waiting for a receipt"""
+        with self.lock:
+            return len(self.pending)
+
+    def stop(self):
+        self.stopped.set()
+
+    def _resolve(self, waiters, receipt):
+        for callback, future, _ in waiters:
+            try:
+                future.set_result(callback(receipt) if callback else receipt)
+            except Exception as e:
+                future.set_exception(e)
+
+    def _send(self, calls):
+        started = time.perf_counter()
+        try:
+            return self.send_batch(calls)
+        finally:
+            observe_batch(calls, time.perf_counter() - started)
+
+    def _poll_once(self):
+        with self.lock:
+            tx_hashes = list(self.pending)
+        if not tx_hashes:
+            return
+
+        # Receipts only change with a new block
+        block_number = int(self._send([("eth_blockNumber", [])])[0], 16)
+        if block_number != self.last_block:
+            self.last_block = block_number
+            calls = [("eth_getTransactionReceipt", [tx_hash]) for tx_hash in tx_hashes]
+            hook_calls = []
+            for hook in list(self.block_hooks):
+                try:
+                    hook_calls.append((hook, hook.calls()))
+                except Exception as e:
+                    print(f"Receipt batch hook error: {e}")
+            results = self._send(calls + [call for _, extra in hook_calls for call in extra])
+            resolved = set()
+            for tx_hash, result in zip(tx_hashes, results):
+                if result is None or isinstance(result, Exception):
+                    continue
+                with self.lock:
+                    waiters = self.pending.pop(tx_hash, [])
+                resolved.add(tx_hash)
+                self._resolve(waiters, format_receipt(result))
+            offset = len(tx_hashes)
+            for hook, extra in hook_calls:
+                try:
+                    hook.handle(results[offset:offset + len(extra)], resolved)
+                except Exception as e:
+                    print(f"Receipt batch hook error: {e}")
+                offset += len(extra)
+
+        # Give up on transactions that were not mined in time
+        now = time.time()
+        expired = []
+        with self.lock:
+            for tx_hash, waiters in list(self.pending.items()):
+                still_waiting = [waiter for waiter in waiters if waiter[2] > now]
+                expired += [waiter for waiter in waiters if waiter[2] <= now]
+                if still_waiting:
+                    self.pending[tx_hash] = still_waiting
+                else:
+                    del self.pending[tx_hash]
+        self._resolve(expired, None)
+
+    def _run(self):
+        while not self.stopped.is_set():
+            try:
+                self._poll_once()
+            except Exception as e:
+                print(f"Receipt polling error: {e}")
+            with self.lock:
+                if not self.pending:
+                    self.thread = None
+                    return
+            self.stopped.wait(self.poll_interval)
@@ -0,0 +1,238 @@
+"""
+TopCut Market Registry
+Markets and their immutables from markets.json or forge deployment logs, selected by filter or shard
+"""
+
+import fnmatch
+import glob
+import json
+import os
+import re
+import sys
+from datetime import datetime, timezone
+
+# Markets used when no markets.json exists yet
+# check the most up to date list of active markets in the docs
+# https://www.topcut.finance/docs/resources/smart-contracts
+DEFAULT_MARKETS = {
+    "Market: BTC/USD, 24h, 0.01 ETH": "0x9A5f16c1f2d6b8c9530144aD23Cfa9B3c4717eF1",
+    "Market: BTC/USD, 24h, 0.05 ETH": "0x8B64Cf63B08f7eB3ad163282bf61d382DfFF0586",
+    "Market: BTC/USD, 7days (Monday), 0.01 ETH": "0x10EF281AAc569Cb011BfcB4e1C6cA490011486a5",
+    "Market: BTC/USD, 7days (Wednesday), 0.01 ETH": "0xB8eC8622D8B7924337CA7B143683459fE5a13f79",
+    "Market: BTC/USD, 7days (Friday), 0.01 ETH": "0xE8B9a818D57E2413E05144311E2d4d190c3f711c",
+}
+
+# Public immutables of TopCutMarket (registry key, getter)
+IMMUTABLES = [
+    ('trade_size', "TRADE_SIZE"),
+    ('trade_duration', "TRADE_DURATION"),
+    ('win_size', "WIN_SIZE"),
+    ('oracle', "ORACLE"),
+    ('top_cut_vault', "TOP_CUT_VAULT"),
+]
+
+# Chainlink price feeds on Arbitrum, used to name markets imported from deployment logs
+FEED_PAIRS = {
+    "0x6ce185860a4963106506C203335A2910413708e9": "BTC/USD",
+    "0x639Fe6ab55C921f74e7fac1ee960C0B6293ba612": "ETH/USD",
+    "0x9A7FB1b3950837a8D9b40517626E11D4127C098C": "DOGE/USD",
+    "0x02DEd5a7EDDA750E3Eb240b54437a54d57b74dBE": "PEPE/USD",
+    "0x86E53CF1B870786351Da77A57575e79CB55812CB": "LINK/USD",
+    "0xb2A824043730FE05F3DA2efaFa1CBbe83fa548D6": "ARB/USD",
+}
+
+ADDRESS_PATTERN = re.compile(r"^0x[0-9a-fA-F]{40}$")
+
+def to_checksum_address(address):
+    # eth_utils is imported on first use, so reading the registry (fast_status.py) does not load it
+    from eth_utils import to_checksum_address
+    return to_checksum_address(address)
+
+def default_registry_path():
+    return os.getenv("MARKETS_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "markets.json"))
+
+def market_name(oracle, trade_size, trade_duration, first_settlement):
+    """Name in the style of the docs, e.g. 'Market: BTC/USD, 7days (Monday), 0.01 ETH'"""
+    pair = FEED_PAIRS.get(to_checksum_address(oracle), to_checksum_address(oracle)[:10])
+    if trade_duration % 604800 == 0:
+        weekday = datetime.fromtimestamp(first_settlement, timezone.utc).strftime("%A")
+        duration = f"{trade_duration // 86400}days ({weekday})"
+    elif trade_duration % 3600 == 0:
+        duration = f"{trade_duration // 3600}h"
+    else:
+        duration = f"{trade_duration}s"
+    return f"Market: {pair}, {duration}, {trade_size / 1e18:g} ETH"
+
+def parse_shard(shard):
+    """'index/count' -> (index, count)"""
+    index, _, count = str(shard).partition("/")
+    index, count = int(index), int(count)
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Invalid shard '{shard}', expected index/count with 0 <= index < count")
+    return index, count
+
+class MarketRegistry:
+    """Known markets by name with their immutables, persisted as JSON"""
+
+    def __init__(self, path):
+        self.path = path
+        self.markets = {}  # name -> {'address': ..., immutable key -> value}
+        self._load()
+
+    def _load(self):
+        if self.path and os.path.exists(self.path):
+            try:
+                with open(self.path, 'r') as f:
+                    for entry in json.load(f).get('markets', []):
+                        entry = dict(entry)
+                        self.markets[entry.pop('name')] = entry
+                return
+            except Exception as e:
+                print(f"Ignoring unreadable market registry {self.path}: {e}")
+                self.markets = {}
+        for name, address in DEFAULT_MARKETS.items():
+            self.markets[name] = {'address': address}
+
+    def save(self):
+        if not self.path:
+            return
+        try:
+            with open(self.path, 'w') as f:
+                json.dump({'markets': [{'name': name, **entry} for name, entry in self.markets.items()]}, f, indent=2)
+        except OSError as e:
+            print(f"Could not write market registry {self.path}: {e}")
+
+    def add(self, name, address, **immutables):
+        """Add or update a market, returns True if anything changed"""
+        address = to_checksum_address(address)
+        entry = self.markets.get(name)
+        if entry and entry['address'] != address:
+            entry = None  # Same name, new deployment: the old immutables do not apply
+        updated = dict(entry or {'address': address})
+        updated.update({key: value for key, value in immutables.items() if value is not None})
+        if updated == entry:
+            return False
+        self.markets[name] = updated
+        return True
+
+    def get(self, name, key):
+        entry = self.markets.get(name)
+        return entry.get(key) if entry else None
+
+    def names_by_address(self):
+        return {entry['address']: name for name, entry in self.markets.items()}
+
+    def import_broadcast(self, paths):
+        """Add every TopCutMarket created in forge broadcast logs (files or directories)
+
+        The immutables come from the constructor arguments, so no RPC call is needed.
+        Returns the names of the added markets.
+        """
+        files = []
+        for path in paths:
+            if os.path.isdir(path):
+                files += sorted(glob.glob(os.path.join(path, "**", "run-*.json"), recursive=True))
+            else:
+                files.append(path)
+
+        added = []
+        for path in files:
+            try:
+                with open(path, 'r') as f:
+                    transactions = json.load(f).get('transactions', [])
+            except Exception as e:
+                print(f"Skipping unreadable deployment log {path}: {e}")
+                continue
+            for transaction in transactions:
+                if (transaction.get('contractName') != "TopCutMarket"
+                        or transaction.get('transactionType') not in ("CREATE", "CREATE2")
+                        or not transaction.get('contractAddress')):
+                    continue
+                oracle, _, vault, trade_size, trade_duration, first_settlement = transaction['arguments']
+                trade_size, trade_duration = int(trade_size, 0), int(trade_duration, 0)
+                address = to_checksum_address(transaction['contractAddress'])
+                names = self.names_by_address()
+                name = names.get(address) or market_name(oracle, trade_size, trade_duration, int(first_settlement, 0))
+                if self.get(name, 'address') not in (None, address):
+                    name = f"{name} ({address[:8]})"  # Two deployments with the same parameters
+                if self.add(name, address,
+                            trade_size=trade_size, trade_duration=trade_duration, win_size=trade_size * 10,
+                            oracle=to_checksum_address(oracle), top_cut_vault=to_checksum_address(vault)):
+                    added.append(name)
+        return added
+
+    def ensure(self, w3, contracts, send_batch=None):
+        """Register the given markets and fill in missing immutables from the metadata cache
+
+        contracts maps names to {'address': ...} as returned by setup_contracts(). Markets the
+        cache has not seen are read in one aggregate3 call, see metadata_cache.py.
+        """
+        changed = False
+        for name, contract_info in contracts.items():
+            if self.get(name, 'address') != to_checksum_address(contract_info['address']):
+                changed |= self.add(name, contract_info['address'])
+
+        missing = [name for name in contracts if any(self.get(name, key) is None for key, _ in IMMUTABLES)]
+        if missing:
+            addresses = [self.markets[name]['address'] for name in missing]
+            from metadata_cache import get_metadata_cache
+            constants = get_metadata_cache().load(w3, addresses, send_batch=send_batch)
+            for name, address in zip(missing, addresses):
+                changed |= self.add(name, address, **{key: constants[address].get(getter) for key, getter in IMMUTABLES})
+
+        if changed:
+            self.save()
+        return changed
+
+    def select(self, patterns=None, shard=None):
+        """Markets as {name: address}, filtered by name patterns / addresses and a shard
+
+        patterns is a comma separated list of case-insensitive shell patterns on the market
+        name ('*BTC*24h*') or addresses. shard 'index/count' keeps the markets whose address
+        modulo count equals index, so several bots can split the markets without overlap.
+        """
+        selected = {name: entry['address'] for name, entry in self.markets.items()}
+        if patterns:
+            wanted = [pattern.strip() for pattern in patterns.split(",") if pattern.strip()]
+            addresses = {pattern.lower() for pattern in wanted if ADDRESS_PATTERN.match(pattern)}
+            globs = [pattern.lower() for pattern in wanted if not ADDRESS_PATTERN.match(pattern)]
+            selected = {name: address for name, address in selected.items()
+                        if address.lower() in addresses or any(fnmatch.fnmatchcase(name.lower(), g) for g in globs)}
+        if shard:
+            index, count = parse_shard(shard)
+            selected = {name: address for name, address in selected.items() if int(address, 16) % count == index}
+        return selected
+
+def main():
+    """List, import or fetch the markets of the registry"""
+    command = sys.argv[1] if len(sys.argv) > 1 else "list"
+    registry = MarketRegistry(default_registry_path())
+
+    if command == "import" and len(sys.argv) > 2:
+        added = registry.import_broadcast(sys.argv[2:])
+        registry.save()
+        print(f"Imported {len(added)} markets into {registry.path}")
+        for name in added:
+            print(f"  - {name}")
+    elif command == "fetch":
+        from keeper_bot_iter import session
+
+        markets = registry.select()
+        registry.ensure(session.w3, {name: {'address': address} for name, address in markets.items()}, session.batch)
+        print(f"Immutables of {len(markets)} markets stored in {registry.path}")
+    elif command == "list":
+        print(f"Markets in {registry.path}:")
+        for name, entry in registry.markets.items():
+            trade_size = entry.get('trade_size')
+            details = f", trade size {trade_size / 1e18:g} ETH" if trade_size is not None else ""
+            if entry.get('trade_duration') is not None:
+                details += f", duration {entry['trade_duration']} s"
+            print(f"  - {name}: {entry['address']}{details}")
+    else:
+        print("Usage:")
+        print("  python registry.py list                      # Show the registered markets")
+        print("  python registry.py import <broadcast paths>  # Add markets from forge broadcast logs")
+        print("  python registry.py fetch                     # Read missing immutables on chain")
+
+if __name__ == "__main__":
+    main()
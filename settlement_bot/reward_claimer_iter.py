@@ -4,99 +4,151 @@ TopCut Keeper Reward Claimer
 Simple version using dotenv
 """
 
-import json
 import time
 import sys
 import os
+
+# Status only reads, so it takes the fast path that never imports web3 (FULL_STATUS=1 for the full one)
+if __name__ == "__main__" and sys.argv[1:2] in ([], ["status"]) and not os.getenv("FULL_STATUS"):
+    from fast_status import main as fast_status
+    sys.exit(fast_status(sys.argv[2:]))
+
 from dotenv import load_dotenv
-from web3 import Web3
-from eth_account import Account
+from session import get_bot_session
+from registry import MarketRegistry, default_registry_path
+from gas_model import get_gas_model
+from fee_engine import get_fee_engine, fee_fields
+from nonce_manager import get_nonce_manager
+from tx_journal import get_journal, recover
+from state_mirror import get_market_mirror
+from preflight import abi_errors, backoff_seconds, simulate_claims
+from multicall import MULTICALL3_ADDRESS, build_rewards_calls, decode_aggregate3, encode_aggregate3, parse_rewards
+from metrics import (CALL_SECONDS, PREFLIGHT_REVERTS, RECEIPT_SECONDS, TRANSACTIONS, cycle, observe_batch,
+                     start_metrics_server, timed)
 
 # Variables
 load_dotenv()  # Load .env file
 infura_api_key = os.getenv("infura_api_key")  # Create account in Infura and get it
-w3 = Web3(Web3.HTTPProvider(f"{infura_api_key}"))
+rpc_urls = os.getenv("RPC_URLS")  # Optional comma-separated backup RPC endpoints, enables the provider pool
 private_key = os.getenv("PRIVATEKEY")  # Your wallet Private Key
+private_keys = os.getenv("PRIVATEKEYS")  # Optional comma-separated extra keeper keys, markets are spread across them
+signer_policy = os.getenv("SIGNER_POLICY", "hash")  # hash (fixed key per market) or least_loaded
 account_address = os.getenv("ACCOUNT")  # Your Account Address
+metrics_port = os.getenv("METRICS_PORT")  # Optional port of the Prometheus /metrics endpoint
+market_filter = os.getenv("MARKET_FILTER")  # Optional comma-separated market name patterns or addresses
+market_shard = os.getenv("MARKET_SHARD")  # Optional index/count, e.g. 0/3, to split the markets across bots
+state_mirror_db = os.getenv("STATE_MIRROR_DB")  # Optional SQLite file of the market state mirror, keeper rewards are read from it
+state_mirror_reconcile = int(os.getenv("STATE_MIRROR_RECONCILE", "3600"))  # Seconds between mirror reconciliations
 
-# Contract addresses - moved from .env to file
+# Markets come from markets.json (python registry.py import/list), the docs list is the default
 # check the most up to date list of active markets in the docs
 # https://www.topcut.finance/docs/resources/smart-contracts
-CONTRACTS = {
-    "Market: BTC/USD, 24h, 0.01 ETH": "0x9A5f16c1f2d6b8c9530144aD23Cfa9B3c4717eF1",  
-    "Market: BTC/USD, 24h, 0.05 ETH": "0x8B64Cf63B08f7eB3ad163282bf61d382DfFF0586",  
-    "Market: BTC/USD, 7days (Monday), 0.01 ETH": "0x10EF281AAc569Cb011BfcB4e1C6cA490011486a5",  
-    "Market: BTC/USD, 7days (Wednesday), 0.01 ETH": "0xB8eC8622D8B7924337CA7B143683459fE5a13f79",  
-    "Market: BTC/USD, 7days (Friday), 0.01 ETH": "0xE8B9a818D57E2413E05144311E2d4d190c3f711c", 
-}
+registry = MarketRegistry(default_registry_path())
+CONTRACTS = registry.select(market_filter, market_shard)
 
 current_directory = os.path.dirname(__file__)  # Get the current directory of the script
 abi_path = os.path.join(current_directory, "abi.json")
 
+# One session per process: provider, ABI, contracts and account are reused by every cycle (and both bots)
+session = get_bot_session(infura_api_key, private_key, CONTRACTS, abi_path,
+                          [url.strip() for url in rpc_urls.split(",") if url.strip()] if rpc_urls else None,
+                          private_keys, signer_policy)
+w3 = session.w3
+
 def load_abi():
     """Load contract ABI from abi.json"""
-    try:
-        with open(abi_path, 'r') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        print("ERROR: abi.json file not found!")
-        print("Please create abi.json with the full contract ABI")
-        exit(1)
+    return session.load_abi()
 
 def setup_contracts():
-    """Setup contract instance"""
-    try:
-        # Test connection by getting chain ID
-        chain_id = w3.eth.chain_id
-        print(f"Connected to Arbitrum. Chain ID: {chain_id}")
-    except Exception as e:
-        print(f"ERROR: Failed to connect to blockchain: {e}")
-        exit(1)
-    
-    abi = load_abi()
-    abi = load_abi()
-    contracts = {}
-    
-    # Create contract instances for each address
-    for name, address in CONTRACTS.items():
-        try:
-            contract = w3.eth.contract(address=address, abi=abi)
-            contracts[name] = {
-                'contract': contract,
-                'address': address
-            }
-            print(f"Setup contract '{name}' at {address}")
-        except Exception as e:
-            print(f"ERROR: Failed to setup contract '{name}' at {address}: {e}")
-    
-    account = Account.from_key(private_key)
-    print(f"Using account: {account.address}")
-    
-    return contracts, account
+    """Setup contract instances once per process and reuse them"""
+    return session.connect()
+
+def get_rewards_mirror():
+    """State mirror of all markets that tracks the keeper rewards of every key, None without STATE_MIRROR_DB"""
+    if not state_mirror_db:
+        return None
+    contracts, _ = setup_contracts()
+    return get_market_mirror(w3, contracts, state_mirror_db, state_mirror_reconcile,
+                             [signer.address for signer in session.signers.accounts], session.batch)
 
-def get_reward_info(contract, account_addr):
-    """Get current reward and contract balance information"""
+@timed("get_rewards_snapshot")
+def get_rewards_snapshots(contracts, account_addrs):
+    """Rewards snapshot of every account, see get_rewards_snapshot(), as {address: snapshot}
+
+    All accounts of the signer pool are read in one JSON-RPC batch with one Multicall3
+    eth_call per account, plus eth_feeHistory when the fee engine's sample is stale.
+    With STATE_MIRROR_DB the keeper rewards come from the mirror instead of keeperRewards calls.
+    Returns None if the batch failed.
+    """
     try:
-        # Get keeper rewards for this account
-        keeper_rewards = contract.functions.keeperRewards(account_addr).call()
+        fee_engine = get_fee_engine(w3)
+        mirror = get_rewards_mirror()
+        if mirror:
+            mirror.sync()
+        calls = []
+        for account_addr in account_addrs:
+            call_data = encode_aggregate3(build_rewards_calls(contracts, account_addr, keeper_rewards=mirror is None))
+            calls.append(("eth_call", [{'to': MULTICALL3_ADDRESS, 'data': "0x" + call_data.hex()}, 'latest']))
+        history_call = fee_engine.history_call()
+        if history_call:
+            calls.append(history_call)
         
-        # Get contract balance
-        contract_balance = w3.eth.get_balance(contract.address)
-
-        # Get account balance
-        account_balance = w3.eth.get_balance(account_addr)
+        started = time.perf_counter()
+        try:
+            results = session.batch(calls)
+        finally:
+            observe_batch(calls, time.perf_counter() - started)
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
         
-        return {
-            'keeper_rewards': keeper_rewards,
-            'contract_balance': contract_balance,
-            'account_balance': account_balance,
-            'keeper_rewards_eth': keeper_rewards / 1e18,
-            'contract_balance_eth': contract_balance/ 1e18,
-            'account_balance_eth': account_balance/ 1e18
-        }
+        if history_call:
+            fee_engine.ingest(results[len(account_addrs)])
+        fees = fee_engine.get_fees()
+        snapshots = {}
+        for account_addr, result in zip(account_addrs, results):
+            snapshots[account_addr] = parse_rewards(contracts, decode_aggregate3(bytes.fromhex(result[2:])),
+                                                    mirror.keeper_rewards(account_addr) if mirror else None)
+            snapshots[account_addr]['fees'] = fees
+        return snapshots
     except Exception as e:
-        print(f"Error getting reward info: {e}")
+        print(f"Error getting rewards snapshot: {e}")
+        return None
+
+def get_rewards_snapshot(contracts, account_addr):
+    """Keeper rewards, balances and pending claims of every market, account balance and fees
+
+    Everything comes from one JSON-RPC batch: a Multicall3 eth_call, plus eth_feeHistory
+    when the fee engine's sample is stale. Returns None if the batch failed.
+    """
+    snapshots = get_rewards_snapshots(contracts, [account_addr])
+    return snapshots[account_addr] if snapshots else None
+
+def combine_snapshots(snapshots):
+    """One snapshot with the keeper rewards and account balances of all keys added up"""
+    if not snapshots:
         return None
+    snapshots = list(snapshots.values())
+    combined = {**snapshots[0], 'markets': {}}
+    combined['account_balance'] = sum(snapshot['account_balance'] for snapshot in snapshots)
+    for name, market in snapshots[0]['markets'].items():
+        rewards = [snapshot['markets'][name] for snapshot in snapshots]
+        combined['markets'][name] = None if None in rewards else {
+            **market, 'keeper_rewards': sum(reward['keeper_rewards'] for reward in rewards)}
+    return combined
+
+def get_reward_info(snapshot, contract_name):
+    """Get current reward and contract balance information of one market from a snapshot"""
+    market = snapshot['markets'].get(contract_name) if snapshot else None
+    if market is None:
+        return None
+    return {
+        **market,
+        'account_balance': snapshot['account_balance'],
+        'keeper_rewards_eth': market['keeper_rewards'] / 1e18,
+        'contract_balance_eth': market['contract_balance'] / 1e18,
+        'account_balance_eth': snapshot['account_balance'] / 1e18
+    }
 
 def calculate_claimable_amount(reward_info):
     """Calculate the maximum claimable amount"""
@@ -106,21 +158,36 @@ def calculate_claimable_amount(reward_info):
     keeper_rewards = reward_info['keeper_rewards']
     contract_balance = reward_info['contract_balance']
     
-    # Can claim up to the minimum of keeper rewards and contract balance
-    return min(keeper_rewards, contract_balance)
+    # ETH owed to winning traders is not withdrawable (claimKeeperReward reverts with InsufficientBalance)
+    withdrawable = max(contract_balance - reward_info['total_pending_claims'], 0)
+    return min(keeper_rewards, withdrawable)
 
-def estimate_gas_cost(contract, amount, recipient, account_addr):
-    """Estimate gas cost for claiming rewards"""
+@timed("estimate_gas_cost")
+def estimate_gas_cost(contract, amount, recipient, account_addr, fees=None, estimate=True):
+    """Estimate gas cost for claiming rewards
+
+    fees defaults to the fee engine's current estimate; with estimate=False the gas limit
+    comes from the gas model without an eth_estimateGas call (status reports).
+    """
     try:
-        current_gas_price = w3.eth.gas_price
-        gas_price = current_gas_price
-        gas_price = int(gas_price * 1.2)
-        gas_limit = 1_000_000  # Default gas limit
+        fees = fees or get_fee_engine(w3).get_fees()
+        gas_price = fees['effective_gas_price']
+        if recipient is None:
+            recipient = account_addr
+        
+        # Claims are cheap - estimate them instead of reserving a fixed 1M gas
+        if estimate:
+            gas_limit, _ = get_gas_model().estimate(
+                lambda: contract.functions.claimKeeperReward(recipient, int(amount)).estimate_gas({'from': account_addr}),
+                'claim')
+        else:
+            gas_limit = get_gas_model().predict('claim')
         
         gas_cost = gas_limit * gas_price
         
         return {
             'gas_price': gas_price,
+            'fees': fees,
             'gas_limit': gas_limit,
             'gas_cost': gas_cost,
             'gas_cost_eth': gas_cost/1e18
@@ -129,14 +196,88 @@ def estimate_gas_cost(contract, amount, recipient, account_addr):
         print(f"Error estimating gas cost: {e}")
         return None
 
-def claim_rewards(contract, account, amount, recipient, contract_name):
-    """Claim keeper rewards"""
+def report_claim(receipt, tx_hash_hex, account, contract_name):
+    """Report the outcome of a claim transaction, returns the tx hash if it succeeded"""
+    if receipt is None:
+        # Dropped or replaced - the local nonce counter has to follow the node again
+        get_nonce_manager(w3, account.address).mark_stale()
+        print(f"[{contract_name}] Claim not mined within 300 seconds: {tx_hash_hex}")
+        return None
+    
+    if receipt.status == 1:
+        print(f"[{contract_name}] Claim successful! Gas used: {receipt.gasUsed}")
+        get_gas_model().observe('claim', 0, receipt.gasUsed)
+        return tx_hash_hex
+    else:
+        print(f"[{contract_name}] Claim failed! Transaction: {tx_hash_hex}")
+        return None
+
+def track_claim(tx_hash_hex, account, contract_name):
+    """Hand a sent claim to the receipt tracker, the Future resolves to report_claim()"""
+    sent_at = time.perf_counter()
+    session.signers.begin(account)
+    def resolve(receipt):
+        session.signers.finish(account)
+        journal = get_journal()
+        entry = journal.entry(tx_hash_hex)
+        journal.resolve(tx_hash_hex, receipt)
+        RECEIPT_SECONDS.observe(time.perf_counter() - sent_at, kind='claim')
+        result = report_claim(receipt, tx_hash_hex, account, contract_name)
+        mirror = get_rewards_mirror()
+        if result and mirror and entry and entry.get('amount'):
+            # claimKeeperReward emits no event, the mirror deducts the mined claim itself
+            mirror.record_claim(contract_name, account.address, entry['amount'])
+        TRANSACTIONS.inc(kind='claim', outcome='timeout' if receipt is None else 'success' if result else 'failed')
+        return result
+    return session.receipts().track(tx_hash_hex, resolve)
+
+def wait_for_claim(tx_hash_hex, account, contract_name):
+    """Wait for a sent claim transaction and report the outcome"""
+    return track_claim(tx_hash_hex, account, contract_name).result()
+
+def preflight_claims(claims):
+    """Simulate {(market name, account address): (market address, sender, recipient, amount)} in one batch
+
+    Returns {key: ContractRevert or None}; claims that would revert are backed off in
+    claim_backoff. None if the simulation itself failed.
+    """
+    def send_batch(calls):
+        started = time.perf_counter()
+        try:
+            return session.batch(calls)
+        finally:
+            observe_batch(calls, time.perf_counter() - started)
+    try:
+        errors = simulate_claims(send_batch, claims, abi_errors(abi_path))
+    except Exception as e:
+        print(f"Error simulating claims: {e}")
+        return None
+    for (name, address), error in errors.items():
+        if error:
+            delay = backoff_seconds(error)
+            print(f"[{name}] Claim of {address} would revert with {error}, retrying in {delay:.0f} seconds")
+            PREFLIGHT_REVERTS.inc(kind='claim', error=error.name)
+            claim_backoff[(name, address)] = time.time() + delay
+    return errors
+
+def claim_rewards(contract, account, amount, recipient, contract_name, wait=True, gas_info=None, simulated=False):
+    """Claim keeper rewards, with wait=False return right after broadcast
+
+    gas_info from the profitability check is reused instead of estimating again. The claim
+    is simulated first unless the caller already did (simulated=True).
+    """
     try:
         if recipient is None:
             recipient = account.address
         
+        if not simulated:
+            key = (contract_name, account.address)
+            errors = preflight_claims({key: (contract.address, account.address, recipient, amount)})
+            if errors is None or errors[key]:
+                return None
+        
         # Get gas estimates
-        gas_info = estimate_gas_cost(contract, amount, recipient, account.address)
+        gas_info = gas_info or estimate_gas_cost(contract, amount, recipient, account.address)
         if not gas_info:
             print(f"[{contract_name}] Failed to estimate gas costs")
             return None
@@ -144,59 +285,72 @@ def claim_rewards(contract, account, amount, recipient, contract_name):
         print(f"[{contract_name}] Claiming {amount/1e18} ETH to {recipient}")
         print(f"[{contract_name}] Estimated gas cost: {gas_info['gas_cost_eth']} ETH")
         
-        # Build transaction
-        nonce = w3.eth.get_transaction_count(account.address)
-        
-        transaction = contract.functions.claimKeeperReward(
-            recipient, int(amount)
-        ).build_transaction({
-            'gas': gas_info['gas_limit'],
-            'gasPrice': gas_info['gas_price'],
-            'nonce': nonce,
-            'value': 0
-        })
-        
-        # Sign and send transaction
-        signed_txn = account.sign_transaction(transaction)
-        tx_hash = w3.eth.send_raw_transaction(signed_txn.rawTransaction)
+        # Build transaction with a locally allocated nonce
+        nonce_manager = get_nonce_manager(w3, account.address)
+        nonce = nonce_manager.allocate()
+        journal = get_journal()
+        signed_txn = None
+        
+        try:
+            transaction = contract.functions.claimKeeperReward(
+                recipient, int(amount)
+            ).build_transaction({
+                'from': account.address,
+                'gas': gas_info['gas_limit'],
+                **fee_fields(gas_info['fees']),
+                'nonce': nonce,
+                'chainId': session.chain_id,
+                'value': 0
+            })
+            
+            # Sign, journal and send transaction
+            signed_txn = account.sign_transaction(transaction)
+            journal.signed(signed_txn.hash.hex(), 'claim', account.address, nonce, transaction,
+                           signed_txn.rawTransaction, market=contract.address, amount=int(amount))
+            with CALL_SECONDS.time(site="send_raw_transaction"):
+                tx_hash = w3.eth.send_raw_transaction(signed_txn.rawTransaction)
+        except Exception as e:
+            nonce_manager.handle_send_error(nonce, e)
+            if signed_txn is not None:
+                journal.update(signed_txn.hash.hex(), 'dropped')
+            raise
         tx_hash_hex = tx_hash.hex()
+        journal.update(tx_hash_hex, 'sent')
         
-        print(f"[{contract_name}] Claim transaction sent: {tx_hash_hex}")
+        print(f"[{contract_name}] Claim transaction sent: {tx_hash_hex} (nonce {nonce})")
         
-        # Wait for confirmation
-        receipt = w3.eth.wait_for_transaction_receipt(tx_hash, timeout=300)
-        
-        if receipt.status == 1:
-            print(f"[{contract_name}] Claim successful! Gas used: {receipt.gasUsed}")
+        if not wait:
             return tx_hash_hex
-        else:
-            print(f"[{contract_name}] Claim failed! Transaction: {tx_hash_hex}")
-            return None
+        
+        # Wait for confirmation
+        return wait_for_claim(tx_hash_hex, account, contract_name)
             
     except Exception as e:
         print(f"[{contract_name}] Error claiming rewards: {e}")
         return None
 
-def show_status_single_contract(contract_info, contract_name, account_addr):
-    """Show status for a single contract"""
+def show_status_single_contract(contract_info, contract_name, account_addr, snapshot):
+    """Show status for a single contract from a rewards snapshot"""
     try:
         contract = contract_info['contract']
         address = contract_info['address']
         
         print(f"\n[{contract_name}] Contract: {address}")
         
-        reward_info = get_reward_info(contract, account_addr)
+        reward_info = get_reward_info(snapshot, contract_name)
         if reward_info:
             claimable_amount = calculate_claimable_amount(reward_info)
             claimable_eth = claimable_amount/1e18
             
             print(f"[{contract_name}] Keeper rewards: {reward_info['keeper_rewards_eth']:.6f} ETH")
             print(f"[{contract_name}] Contract balance: {reward_info['contract_balance_eth']:.6f} ETH") 
+            if reward_info['total_pending_claims']:
+                print(f"[{contract_name}] Pending trader claims: {reward_info['total_pending_claims']/1e18:.6f} ETH")
             print(f"[{contract_name}] Claimable amount: {claimable_eth:.6f} ETH")
             
             if claimable_amount > 0:
-                gas_info = estimate_gas_cost(contract, claimable_amount, 
-                                           account_addr, account_addr)
+                gas_info = estimate_gas_cost(contract, claimable_amount, account_addr, account_addr,
+                                             fees=snapshot['fees'], estimate=False)
                 if gas_info:
                     net_profit = claimable_amount - gas_info['gas_cost']
                     net_profit_eth = net_profit/1e18
@@ -221,8 +375,10 @@ def show_status(contract_name=None):
     """Show current reward status for all contracts or specific contract"""
     try:
         contracts, account = setup_contracts()
+        # Rewards of every key of the signer pool are reported together
+        account_addrs = [signer.address for signer in session.signers.accounts]
         
-        print(f"\nChecking rewards for account: {account.address}")
+        print(f"\nChecking rewards for account{'s' if len(account_addrs) > 1 else ''}: {', '.join(account_addrs)}")
         
         if contract_name:
             # Show status for specific contract
@@ -231,11 +387,14 @@ def show_status(contract_name=None):
                 print(f"Available contracts: {list(contracts.keys())}")
                 return
             
+            snapshot = combine_snapshots(get_rewards_snapshots({contract_name: contracts[contract_name]}, account_addrs))
             print(f"\n=== REWARD STATUS FOR {contract_name.upper()} ===")
-            show_status_single_contract(contracts[contract_name], contract_name, account.address)
+            show_status_single_contract(contracts[contract_name], contract_name, account.address, snapshot)
             print("=" * 50)
         else:
             # Show status for all contracts
+            # One round trip for every market, the summary reuses the same snapshot
+            snapshot = combine_snapshots(get_rewards_snapshots(contracts, account_addrs))
             print("\n" + "=" * 60)
             print("REWARD STATUS FOR ALL CONTRACTS")
             print("=" * 60)
@@ -244,14 +403,15 @@ def show_status(contract_name=None):
             contract_summaries = []
             
             for name, contract_info in contracts.items():
-                result = show_status_single_contract(contract_info, name, account.address)
+                result = show_status_single_contract(contract_info, name, account.address, snapshot)
                 if result:
                     total_claimable += result['claimable_eth']
                     contract_summaries.append(result)
             
             # Show summary
             print(f"\n--- SUMMARY ---")
-            print(f"Account balance: {w3.eth.get_balance(account.address)/1e18:.6f} ETH")
+            if snapshot:
+                print(f"Account balance: {snapshot['account_balance']/1e18:.6f} ETH")
             print(f"Total claimable across all contracts: {total_claimable:.6f} ETH")
             
             profitable_contracts = sum(1 for c in contract_summaries if c['claimable_eth'] > 0.001)
@@ -262,13 +422,20 @@ def show_status(contract_name=None):
         print(f"Error showing status: {e}")
 
 def check_and_claim_single_contract(contract_info, contract_name, account, 
-                                   min_claim_amount_eth=0.001, recipient=None):
-    """Check and claim rewards for a single contract"""
+                                   min_claim_amount_eth=0.001, recipient=None, wait=True, snapshot=None,
+                                   simulated=False):
+    """Check and claim rewards for a single contract
+
+    snapshot is a rewards snapshot covering this market, read for it alone if not given.
+    simulated=True skips the claim's simulation, the caller batched it with others.
+    """
     try:
         contract = contract_info['contract']
         
         # Get current reward info
-        reward_info = get_reward_info(contract, account.address)
+        if snapshot is None:
+            snapshot = get_rewards_snapshot({contract_name: contract_info}, account.address)
+        reward_info = get_reward_info(snapshot, contract_name)
         if not reward_info:
             print(f"[{contract_name}] Failed to get reward info")
             return None
@@ -291,7 +458,7 @@ def check_and_claim_single_contract(contract_info, contract_name, account,
         
         # Check profitability
         gas_info = estimate_gas_cost(contract, claimable_amount, 
-                                   recipient or account.address, account.address)
+                                   recipient or account.address, account.address, fees=snapshot['fees'])
         if gas_info:
             net_profit = claimable_amount - gas_info['gas_cost']
             net_profit_eth = net_profit/1e18
@@ -303,16 +470,51 @@ def check_and_claim_single_contract(contract_info, contract_name, account,
                 return None
         
         # Claim rewards
-        return claim_rewards(contract, account, claimable_amount, recipient, contract_name)
+        return claim_rewards(contract, account, claimable_amount, recipient, contract_name, wait, gas_info,
+                             simulated)
         
     except Exception as e:
         print(f"[{contract_name}] Error in check_and_claim: {e}")
         return None
 
-def check_and_claim(min_claim_amount_eth=0.001, recipient=None, contract_name=None):
-    """Check rewards and claim if above minimum threshold"""
+in_flight = {}  # (market name, account address) -> Future of a sent claim, resolved by the receipt tracker
+claim_backoff = {}  # (market name, account address) -> time before which a claim that simulated a revert is not retried
+journal_recovered = False
+
+def recover_claims(contracts):
+    """Track the claims a previous run left open in the transaction journal again (once per process)"""
+    global journal_recovered
+    if journal_recovered:
+        return
+    journal = get_journal()
+    try:
+        # The fee estimate is only read if there is anything to rebroadcast
+        fees = get_fee_engine(w3).get_fees() if journal.open_entries('claim') else None
+        entries = recover(journal, session.batch, 'claim', session.signers.accounts, fees)
+    except Exception as e:
+        print(f"Error recovering claims from the transaction journal: {e}")
+        return
+    journal_recovered = True
+    names = {contract_info['address'].lower(): name for name, contract_info in contracts.items()}
+    for entry in entries:
+        name = names.get(entry['market'].lower())
+        account = session.signers.by_address(entry['sender'])
+        if name is None or account is None:
+            continue  # Market or key no longer served by this bot, the journal still holds it
+        print(f"[{name}] Claim from before the restart in flight: {entry['hash']} (nonce {entry['nonce']})")
+        in_flight[(name, account.address)] = track_claim(entry['hash'], account, name)
+
+def check_and_claim(min_claim_amount_eth=0.001, recipient=None, contract_name=None, wait=True):
+    """Check rewards and claim if above minimum threshold
+
+    With wait=False sent claims are left to the receipt tracker; markets whose claim is
+    still in flight are skipped, their rewards are already on the way. Claiming from all
+    contracts sweeps the rewards of every key of the signer pool to the main account (or
+    recipient) in the same pass.
+    """
     try:
         contracts, account = setup_contracts()
+        recover_claims(contracts)
         
         if contract_name:
             # Process single contract
@@ -321,10 +523,22 @@ def check_and_claim(min_claim_amount_eth=0.001, recipient=None, contract_name=No
                 print(f"Available contracts: {list(contracts.keys())}")
                 return None
             
-            return check_and_claim_single_contract(
+            key = (contract_name, account.address)
+            if key in in_flight and not in_flight[key].done():
+                print(f"[{contract_name}] Claim still waiting for its receipt, skipping")
+                return None
+            if claim_backoff.get(key, 0) > time.time():
+                print(f"[{contract_name}] Claim reverted in simulation, retrying in "
+                      f"{claim_backoff[key] - time.time():.0f} seconds")
+                return None
+            tx_hash = check_and_claim_single_contract(
                 contracts[contract_name], contract_name, account, 
-                min_claim_amount_eth, recipient
+                min_claim_amount_eth, recipient, wait=False
             )
+            if not tx_hash:
+                return None
+            in_flight[key] = track_claim(tx_hash, account, contract_name)
+            return in_flight[key].result() if wait else tx_hash
         else:
             # Process all contracts
             results = {}
@@ -334,28 +548,79 @@ def check_and_claim(min_claim_amount_eth=0.001, recipient=None, contract_name=No
             print("CHECKING ALL CONTRACTS FOR CLAIMABLE REWARDS")
             print("=" * 60)
             
+            # Rewards, balances and fees of every market and key from one round trip drive all claim decisions
+            signers = session.signers.accounts
+            snapshots = get_rewards_snapshots(contracts, [signer.address for signer in signers])
+            if snapshots is None:
+                return None
+            
+            # Simulate every claim of this pass in one batch, drawing on each market's balance like the claims will
+            claims, drawn = {}, {}
+            for name, contract_info in contracts.items():
+                for signer in signers:
+                    key = (name, signer.address)
+                    reward_info = get_reward_info(snapshots[signer.address], name)
+                    if (not reward_info or claim_backoff.get(key, 0) > time.time()
+                            or (key in in_flight and not in_flight[key].done())):
+                        continue
+                    amount = calculate_claimable_amount(
+                        {**reward_info, 'contract_balance': reward_info['contract_balance'] - drawn.get(name, 0)})
+                    if amount and amount / 1e18 >= min_claim_amount_eth:
+                        claims[key] = (contract_info['address'], signer.address, recipient or account.address, amount)
+                        drawn[name] = drawn.get(name, 0) + amount
+            errors = preflight_claims(claims)
+            if errors is None:
+                return None
+            
+            # Send all claims back-to-back, then wait for them together (or leave them to the tracker)
+            pending = {}
             for name, contract_info in contracts.items():
                 print(f"\n--- Checking {name} ---")
-                result = check_and_claim_single_contract(
-                    contract_info, name, account, min_claim_amount_eth, recipient
-                )
-                results[name] = result
+                results[name] = None
+                claimants = [signer for signer in signers if snapshots[signer.address]['markets'].get(name) is None
+                             or snapshots[signer.address]['markets'][name]['keeper_rewards'] > 0]
+                if not claimants:
+                    print(f"[{name}] No rewards to claim")
+                    continue
+                for signer in claimants:
+                    key = (name, signer.address)
+                    if key in in_flight and not in_flight[key].done():
+                        print(f"[{name}] Claim of {signer.address} still waiting for its receipt, skipping")
+                        continue
+                    if errors.get(key) or claim_backoff.get(key, 0) > time.time():
+                        print(f"[{name}] Claim of {signer.address} reverted in simulation, skipping")
+                        continue
+                    snapshot = snapshots[signer.address]
+                    claimed = calculate_claimable_amount(get_reward_info(snapshot, name))
+                    tx_hash = check_and_claim_single_contract(
+                        contract_info, name, signer, min_claim_amount_eth, recipient or account.address,
+                        wait=False, snapshot=snapshot, simulated=key in claims
+                    )
+                    if tx_hash:
+                        pending[key] = tx_hash
+                        in_flight[key] = track_claim(tx_hash, signer, name)
+                        # The other keys draw on the same contract balance
+                        for other in snapshots.values():
+                            if other['markets'].get(name):
+                                other['markets'][name]['contract_balance'] -= claimed
+            
+            for key, tx_hash in pending.items():
+                name = key[0]
+                result = in_flight[key].result() if wait else tx_hash
                 if result:
+                    results[name] = f"{results[name]}, {result}" if results[name] else result
                     successful_claims += 1
-                
-                # Add delay between claims to avoid nonce issues
-                time.sleep(2)
             
             # Summary
             print("\n" + "=" * 60)
             print("CLAIM SUMMARY:")
             for name, result in results.items():
                 if result:
-                    print(f"✓ {name}: Claim successful - {result}")
+                    print(f"✓ {name}: Claim {'successful' if wait else 'sent'} - {result}")
                 else:
                     print(f"✗ {name}: No claim")
             
-            print(f"Total successful claims: {successful_claims}/{len(contracts)}")
+            print(f"Total {'successful' if wait else 'sent'} claims: {successful_claims}/{len(contracts)}")
             print("=" * 60)
             
             return results
@@ -381,7 +646,8 @@ def claim_specific_amount(amount_eth, recipient=None, contract_name=None):
             contract = contracts[contract_name]['contract']
             
             # Check if amount is available
-            reward_info = get_reward_info(contract, account.address)
+            snapshot = get_rewards_snapshot({contract_name: contracts[contract_name]}, account.address)
+            reward_info = get_reward_info(snapshot, contract_name)
             if not reward_info:
                 print(f"[{contract_name}] Failed to get reward info")
                 return None
@@ -393,7 +659,8 @@ def claim_specific_amount(amount_eth, recipient=None, contract_name=None):
                       f"({claimable_amount/1e18} ETH)")
                 return None
             
-            return claim_rewards(contract, account, amount_wei, recipient, contract_name)
+            gas_info = estimate_gas_cost(contract, amount_wei, recipient, account.address, fees=snapshot['fees'])
+            return claim_rewards(contract, account, amount_wei, recipient, contract_name, gas_info=gas_info)
         else:
             print("Error: Must specify contract_name when claiming specific amount")
             print(f"Available contracts: {list(contracts.keys())}")
@@ -417,17 +684,19 @@ def run_continuous_monitoring(check_interval=300, min_claim_amount_eth=0.001, co
     while True:
         try:
             print(f"\nChecking for claimable rewards...")
-            results = check_and_claim(min_claim_amount_eth, contract_name=contract_name)
+            # Receipts are followed in the background, a stuck claim never blocks the next check
+            with cycle("claimer"):
+                results = check_and_claim(min_claim_amount_eth, contract_name=contract_name, wait=False)
             
             if results:
                 if isinstance(results, dict) and not contract_name:
                     # Multiple contracts
                     successful = sum(1 for r in results.values() if r)
                     if successful > 0:
-                        print(f"Successfully claimed rewards from {successful} contracts")
+                        print(f"Sent reward claims for {successful} contracts")
                 elif results and contract_name:
                     # Single contract
-                    print(f"Successfully claimed rewards: {results}")
+                    print(f"Sent reward claim: {results}")
             
             # Wait before next check
             print(f"Waiting {check_interval} seconds before next check...")
@@ -472,6 +741,9 @@ def run_single_contract_operation(contract_name, operation, *args):
         run_continuous_monitoring(interval, min_amount, contract_name)
 
 if __name__ == "__main__":
+    if metrics_port:
+        start_metrics_server(int(metrics_port))
+    
     if len(sys.argv) > 1:
         command = sys.argv[1]
         
@@ -0,0 +1,87 @@
+"""
+TopCut RPC Codec
+JSON-RPC batches, Multicall3 aggregate3 encoding and gas defaults shared by the full bots and
+fast_status.py, so neither web3 nor eth_abi has to be imported for them
+"""
+
+import json
+import urllib.request
+
+# Multicall3 is deployed at the same address on Arbitrum and most EVM chains
+# https://github.com/mds1/multicall
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+AGGREGATE3_SELECTOR = bytes.fromhex("82ad56cb")  # aggregate3((address,bool,bytes)[])
+
+GAS_MARGIN = 1.25  # Multiplier applied to eth_estimateGas results and model predictions
+DEFAULT_CLAIM_GAS = 60_000  # Claim gas limit until a claim receipt was observed
+
+def _word(value):
+    return value.to_bytes(32, 'big')
+
+def encode_aggregate3(calls):
+    """Encode (target, call_data) pairs as aggregate3 calldata, failures allowed"""
+    tuples = []
+    for target, call_data in calls:
+        call_data = bytes(call_data)
+        padded = call_data.ljust((len(call_data) + 31) // 32 * 32, b"\0")
+        target = bytes.fromhex(target[2:]) if isinstance(target, str) else bytes(target)
+        tuples.append(target.rjust(32, b"\0") + _word(1) + _word(0x60) + _word(len(call_data)) + padded)
+    offsets, position = [], 32 * len(tuples)
+    for encoded in tuples:
+        offsets.append(_word(position))
+        position += len(encoded)
+    return AGGREGATE3_SELECTOR + _word(0x20) + _word(len(calls)) + b"".join(offsets) + b"".join(tuples)
+
+def decode_aggregate3(raw_result):
+    """Decode aggregate3 return data into (success, return_data) pairs"""
+    data = bytes(raw_result)
+    word = lambda offset: int.from_bytes(data[offset:offset + 32], 'big')
+    start = word(0)
+    results = []
+    for index in range(word(start)):
+        item = start + 32 + word(start + 32 + 32 * index)
+        length_at = item + word(item + 32)
+        length = word(length_at)
+        results.append((word(item) == 1, data[length_at + 32:length_at + 32 + length]))
+    return results
+
+def decode_uint(success, return_data):
+    """Decode a single uint256 return value, None if the call failed"""
+    if not success or len(return_data) < 32:
+        return None
+    return int.from_bytes(return_data[:32], 'big')
+
+def batch_payload(calls):
+    """(method, params) pairs -> JSON-RPC batch with ids in call order"""
+    return [{'jsonrpc': "2.0", 'id': index, 'method': method, 'params': params}
+            for index, (method, params) in enumerate(calls)]
+
+def batch_results(replies, count):
+    """Results of a JSON-RPC batch reply in call order
+
+    A failed call yields its error dict wrapped in a ValueError instead of a result.
+    """
+    if isinstance(replies, dict):
+        # Some nodes answer a rejected batch with a single error object
+        raise ValueError(replies.get('error', replies))
+    by_id = {reply.get('id'): reply for reply in replies}
+    results = []
+    for index in range(count):
+        reply = by_id.get(index, {'error': {'message': "missing batch reply"}})
+        results.append(ValueError(reply['error']) if 'error' in reply else reply.get('result'))
+    return results
+
+def rpc_batch(http_session, url, calls, timeout=10):
+    """Send (method, params) pairs as one JSON-RPC batch, returns results in call order
+
+    http_session is a requests.Session; without one the batch goes over urllib, which
+    keeps requests out of the imports of fast_status.py.
+    """
+    if http_session is not None:
+        response = http_session.post(url, json=batch_payload(calls), timeout=timeout)
+        response.raise_for_status()
+        return batch_results(response.json(), len(calls))
+    request = urllib.request.Request(url, data=json.dumps(batch_payload(calls)).encode(),
+                                     headers={'Content-Type': "application/json"})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return batch_results(json.loads(response.read()), len(calls))
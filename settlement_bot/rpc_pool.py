@@ -0,0 +1,220 @@
+"""
+TopCut RPC Pool
+Web3 provider over several JSON-RPC endpoints: hedged reads, fan-out broadcast, per-endpoint health
+"""
+
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from web3.providers.base import JSONBaseProvider
+
+from rpc_codec import batch_payload, batch_results
+
+BROADCAST_METHODS = {'eth_sendRawTransaction'}  # Sent to every endpoint at once
+LATENCY_SAMPLES = 100  # Response times kept per endpoint
+MIN_SAMPLES = 5  # Samples needed before the p95 replaces the default hedge delay
+DEFAULT_HEDGE_DELAY = 0.5  # Seconds before a read is also sent to the next endpoint
+MIN_HEDGE_DELAY = 0.02
+MAX_HEDGE_DELAY = 2.0
+MAX_COOLDOWN = 60  # Longest time an endpoint is skipped after repeated failures
+
+def endpoint_label(url):
+    """URL without path or query, which usually hold the API key"""
+    scheme, _, rest = url.partition("://")
+    return f"{scheme}://{rest.split('/')[0]}" if rest else url
+
+class Endpoint:
+    """One JSON-RPC URL with its latency samples and failure state"""
+
+    def __init__(self, url):
+        self.url = url
+        self.label = endpoint_label(url)
+        self.http_session = requests.Session()
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.failures = 0  # Consecutive transport failures
+        self.down_until = 0
+        self.requests = 0
+        self.wins = 0  # Requests this endpoint answered first
+        self.in_flight = {}  # request number -> start time
+        self.lock = threading.Lock()
+
+    def quantile(self, q):
+        with self.lock:
+            samples = sorted(self.latencies)
+        if not samples:
+            return None
+        return samples[min(int(q * len(samples)), len(samples) - 1)]
+
+    def hedge_delay(self):
+        """p95 response time of this endpoint, how long to wait before hedging"""
+        if len(self.latencies) < MIN_SAMPLES:
+            return DEFAULT_HEDGE_DELAY
+        return min(max(self.quantile(0.95), MIN_HEDGE_DELAY), MAX_HEDGE_DELAY)
+
+    def expected_latency(self):
+        """Median response time, or longer while an outstanding request has been waiting longer"""
+        median = self.quantile(0.5)
+        median = DEFAULT_HEDGE_DELAY if median is None else median
+        with self.lock:
+            oldest = min(self.in_flight.values(), default=None)
+        return median if oldest is None else max(median, time.time() - oldest)
+
+    def is_up(self):
+        return time.time() >= self.down_until
+
+    def start(self):
+        with self.lock:
+            self.requests += 1
+            number = self.requests
+            self.in_flight[number] = time.time()
+            return number
+
+    def record_success(self, number):
+        with self.lock:
+            self.latencies.append(time.time() - self.in_flight.pop(number))
+            self.failures = 0
+            self.down_until = 0
+
+    def record_failure(self, number):
+        with self.lock:
+            self.in_flight.pop(number, None)
+            self.failures += 1
+            # Back off exponentially so a dead node is only probed now and then
+            self.down_until = time.time() + min(2 ** (self.failures - 1), MAX_COOLDOWN)
+
+class RPCPool(JSONBaseProvider):
+    """Provider that spreads requests over several endpoints
+
+    Reads go to the healthiest endpoint and are hedged to the next one if no answer came
+    within the first endpoint's p95 latency; the first reply wins. eth_sendRawTransaction
+    is broadcast to every endpoint at once. A JSON-RPC error (e.g. a revert) is a valid
+    answer; only transport failures count against an endpoint's health.
+    """
+
+    def __init__(self, urls, request_timeout=10):
+        super().__init__()
+        if not urls:
+            raise ValueError("RPCPool needs at least one endpoint URL")
+        self.endpoints = [Endpoint(url) for url in urls]
+        self.request_timeout = request_timeout
+        self.request_ids = itertools.count()
+        self.executor = ThreadPoolExecutor(max_workers=4 * len(self.endpoints), thread_name_prefix="rpc-pool")
+        self.hedges = 0
+
+    def ranked(self):
+        """Endpoints ordered by health: available first, then by expected latency"""
+        return sorted(self.endpoints, key=lambda endpoint: (not endpoint.is_up(), endpoint.expected_latency()))
+
+    def _post(self, endpoint, payload):
+        number = endpoint.start()
+        try:
+            response = endpoint.http_session.post(endpoint.url, json=payload, timeout=self.request_timeout)
+            response.raise_for_status()
+            reply = response.json()
+        except Exception:
+            endpoint.record_failure(number)
+            raise
+        endpoint.record_success(number)
+        return reply
+
+    def _hedged(self, payload):
+        """Send to the best endpoint, add the next one each time the hedge delay passes"""
+        waiting = self.ranked()
+        futures = {}
+        delay = None
+        last_error = None
+        while waiting or futures:
+            if waiting and (not futures or delay is not None):
+                endpoint = waiting.pop(0)
+                if futures:
+                    self.hedges += 1
+                futures[self.executor.submit(self._post, endpoint, payload)] = endpoint
+                delay = endpoint.hedge_delay()
+            done, _ = wait(futures, timeout=delay if waiting else None, return_when=FIRST_COMPLETED)
+            if not done:
+                continue  # Hedge to the next endpoint
+            delay = None
+            for future in done:
+                endpoint = futures.pop(future)
+                try:
+                    reply = future.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                endpoint.wins += 1
+                return reply
+            if futures:
+                delay = 0 if waiting else None  # A failed endpoint is replaced right away
+        raise ConnectionError(f"All RPC endpoints failed: {last_error}")
+
+    def _broadcast(self, payload):
+        """Send to every endpoint, return the first success or else the first error reply
+
+        For a batch payload a reply succeeds when none of its calls failed; otherwise the
+        replies are merged per call, each taking the first endpoint that accepted it.
+        """
+        futures = {self.executor.submit(self._post, endpoint, payload): endpoint for endpoint in self.ranked()}
+        error_replies = []
+        last_error = None
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                endpoint = futures.pop(future)
+                try:
+                    reply = future.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                items = reply if isinstance(reply, list) else [reply]
+                if not any('error' in item for item in items):
+                    endpoint.wins += 1
+                    return reply
+                error_replies.append(reply)
+        if not error_replies:
+            raise ConnectionError(f"Broadcast failed on all RPC endpoints: {last_error}")
+        if not isinstance(payload, list) or not all(isinstance(reply, list) for reply in error_replies):
+            return error_replies[0]
+        merged = {}
+        for reply in error_replies:
+            for item in reply:
+                if item.get('id') not in merged or 'error' in merged[item.get('id')]:
+                    merged[item.get('id')] = item
+        return list(merged.values())
+
+    def make_request(self, method, params):
+        payload = {'jsonrpc': "2.0", 'id': next(self.request_ids), 'method': method, 'params': params}
+        if method in BROADCAST_METHODS:
+            return self._broadcast(payload)
+        return self._hedged(payload)
+
+    def batch(self, calls):
+        """JSON-RPC batch of (method, params) pairs, returns results in call order
+
+        Hedged like a single read, or broadcast to every endpoint if it sends a transaction
+        (e.g. the rebroadcasts of tx_journal.recover).
+        """
+        payload = batch_payload(calls)
+        if any(method in BROADCAST_METHODS for method, _ in calls):
+            return batch_results(self._broadcast(payload), len(calls))
+        return batch_results(self._hedged(payload), len(calls))
+
+    def health(self):
+        """Per-endpoint statistics for logging"""
+        return [{
+            'endpoint': endpoint.label,
+            'up': endpoint.is_up(),
+            'failures': endpoint.failures,
+            'p50': endpoint.quantile(0.5),
+            'p95': endpoint.quantile(0.95),
+            'requests': endpoint.requests,
+            'wins': endpoint.wins,
+        } for endpoint in self.endpoints]
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        for endpoint in self.endpoints:
+            endpoint.http_session.close()
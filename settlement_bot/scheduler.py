@@ -0,0 +1,60 @@
+"""
+TopCut Settlement Scheduler
+Min-heap of market settlement deadlines measured in chain time
+"""
+
+import heapq
+import time
+
+class SettlementScheduler:
+    """Tracks the next settlement deadline of every market"""
+
+    def __init__(self, window=10):
+        self.window = window  # Seconds before a deadline when per-block polling starts
+        self.heap = []  # (deadline, market name), may contain outdated entries
+        self.deadlines = {}  # market name -> current deadline
+        self.clock_offset = 0  # block.timestamp - local time, from the last snapshot
+
+    def sync_clock(self, block_timestamp):
+        """Align the local clock with the latest block timestamp"""
+        self.clock_offset = block_timestamp - time.time()
+
+    def chain_now(self):
+        """Estimated block.timestamp of the chain head"""
+        return time.time() + self.clock_offset
+
+    def schedule(self, name, deadline):
+        """Set (or move) the deadline of a market"""
+        if self.deadlines.get(name) == deadline:
+            return
+        self.deadlines[name] = deadline
+        heapq.heappush(self.heap, (deadline, name))
+
+    def reschedule_after_settlement(self, name, settled_deadline, trade_duration):
+        """Move a market to its next cohort after settleCohort rolled nextSettlement over"""
+        self.schedule(name, settled_deadline + trade_duration)
+
+    def remove(self, name):
+        """Stop tracking a market"""
+        self.deadlines.pop(name, None)
+
+    def _drop_outdated(self):
+        while self.heap and self.deadlines.get(self.heap[0][1]) != self.heap[0][0]:
+            heapq.heappop(self.heap)
+
+    def next_deadline(self):
+        """Earliest (deadline, name) or None if nothing is scheduled"""
+        self._drop_outdated()
+        return self.heap[0] if self.heap else None
+
+    def seconds_until_window(self):
+        """Seconds to sleep before the earliest deadline's polling window opens"""
+        earliest = self.next_deadline()
+        if earliest is None:
+            return None
+        return max(earliest[0] - self.window - self.chain_now(), 0)
+
+    def in_window(self):
+        """Names of all markets whose deadline is within the polling window"""
+        horizon = self.chain_now() + self.window
+        return sorted(name for name, deadline in self.deadlines.items() if deadline <= horizon)
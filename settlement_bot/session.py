@@ -0,0 +1,142 @@
+"""
+TopCut Bot Session
+Provider, ABI, contract instances and account created once per process
+"""
+
+import json
+import requests
+from web3 import Web3
+from web3.middleware import construct_simple_cache_middleware
+from signer_pool import SignerPool, parse_keys
+from receipt_tracker import ReceiptTracker
+from rpc_codec import rpc_batch
+from rpc_pool import RPCPool
+from metrics import rpc_metrics_middleware
+
+class BotSession:
+    """Long-lived connection state shared by every bot cycle"""
+
+    def __init__(self, provider_url, private_key, contract_addresses, abi_path, extra_urls=None,
+                 private_keys=None, signer_policy="hash"):
+        self.provider_url = provider_url
+        self.private_key = private_key
+        self.private_keys = private_keys  # Comma separated keys sending next to private_key
+        self.signer_policy = signer_policy
+        self.contract_addresses = contract_addresses
+        self.abi_path = abi_path
+
+        # Keep-alive HTTP connection reused by every RPC call
+        self.http_session = requests.Session()
+        self.pool = None
+        if extra_urls:
+            # Several endpoints: hedged reads, broadcast to all, routing around slow nodes
+            self.pool = RPCPool([f"{provider_url}"] + list(extra_urls))
+            self.w3 = Web3(self.pool)
+        else:
+            self.w3 = Web3(Web3.HTTPProvider(f"{provider_url}", session=self.http_session))
+
+        # The chain id never changes, web3 would otherwise re-query it for every transaction
+        self.w3.middleware_onion.add(
+            construct_simple_cache_middleware(rpc_whitelist={'eth_chainId', 'net_version'}),
+            name='chain_id_cache'
+        )
+        # Innermost layer, so only requests that reach the provider are timed
+        self.w3.middleware_onion.inject(rpc_metrics_middleware, name='rpc_metrics', layer=0)
+
+        self.chain_id = None
+        self.abi = None
+        self.contracts = None
+        self.account = None
+        self.signers = None
+        self.receipt_tracker = None
+
+    def load_abi(self):
+        """Load contract ABI from abi.json, parsed only once"""
+        if self.abi is None:
+            try:
+                with open(self.abi_path, 'r') as f:
+                    self.abi = json.load(f)
+            except FileNotFoundError:
+                print("ERROR: abi.json file not found!")
+                print("Please create abi.json with the full contract ABI")
+                exit(1)
+        return self.abi
+
+    def connect(self):
+        """Setup chain id, contract instances and account on first use, then reuse them"""
+        if self.contracts is not None:
+            return self.contracts, self.account
+
+        try:
+            # Test connection by getting chain ID
+            self.chain_id = self.w3.eth.chain_id
+            print(f"Connected to Arbitrum. Chain ID: {self.chain_id}")
+        except Exception as e:
+            print(f"ERROR: Failed to connect to blockchain: {e}")
+            if self.pool:
+                # The pool may recover, let the caller's retry loop try again
+                raise
+            exit(1)
+
+        abi = self.load_abi()
+        contracts = {}
+
+        # Create contract instances for each address
+        for name, address in self.contract_addresses.items():
+            try:
+                contract = self.w3.eth.contract(address=address, abi=abi)
+                contracts[name] = {
+                    'contract': contract,
+                    'address': address
+                }
+                print(f"Setup contract '{name}' at {address}")
+            except Exception as e:
+                print(f"ERROR: Failed to setup contract '{name}' at {address}: {e}")
+
+        # The first key is the main account, rewards of the other keys are claimed to it
+        self.signers = SignerPool(parse_keys(self.private_key, self.private_keys), self.signer_policy)
+        self.account = self.signers.accounts[0]
+        print(f"Using account: {self.account.address}")
+        if len(self.signers.accounts) > 1:
+            print(f"Signer pool: {len(self.signers.accounts)} keys, {self.signer_policy} assignment")
+
+        self.contracts = contracts
+        return self.contracts, self.account
+
+    def batch(self, calls):
+        """Send (method, params) pairs as one JSON-RPC batch, returns results in call order"""
+        if self.pool:
+            return self.pool.batch(calls)
+        return rpc_batch(self.http_session, f"{self.provider_url}", calls)
+
+    def receipts(self):
+        """Background receipt tracker shared by all transactions of this session"""
+        if self.receipt_tracker is None:
+            self.receipt_tracker = ReceiptTracker(send_batch=self.batch)
+        return self.receipt_tracker
+
+    def close(self):
+        """Stop receipt polling and close the keep-alive HTTP connections"""
+        if self.receipt_tracker is not None:
+            self.receipt_tracker.stop()
+        if self.signers is not None:
+            self.signers.close()
+        if self.pool:
+            self.pool.close()
+        self.http_session.close()
+
+_sessions = {}
+
+def get_bot_session(provider_url, private_key, contract_addresses, abi_path, extra_urls=None,
+                    private_keys=None, signer_policy="hash"):
+    """Process-wide BotSession per endpoint set and key
+
+    Bots loaded into one process (daemon.py) get the same provider, receipt tracker, fee
+    engine and nonce stream. They select their markets from the same registry, so the
+    first caller's contract_addresses serve both.
+    """
+    key = (provider_url, private_key, tuple(extra_urls or ()), private_keys, signer_policy)
+    if key not in _sessions:
+        _sessions[key] = BotSession(provider_url, private_key, contract_addresses, abi_path, extra_urls,
+                                    private_keys, signer_policy)
+    return _sessions[key]
@@ -0,0 +1,124 @@
+"""
+TopCut Settlement Guard
+Cancels a pending settlement as soon as another keeper settled the same market
+"""
+
+import threading
+
+from fee_engine import get_fee_engine
+from metrics import CALL_SECONDS
+from multicall import MULTICALL3_ADDRESS, encode_aggregate3, decode_aggregate3, decode_uint, encode_call
+from tx_journal import cancel_transaction, get_journal
+
+class SettlementGuard:
+    """Receipt tracker block hook that watches the markets of pending settlements
+
+    Every new block the tracker's receipt batch also reads nextSettlement of each watched
+    market in one aggregate3 eth_call. If it moved past the deadline our settlement was
+    signed for while that settlement is still unmined, another keeper won: ours would only
+    revert and burn gas, so a zero-value transfer to ourselves is sent at the same nonce
+    with replacement fees. When that transfer is mined the settlement can never be, and its
+    waiters resolve right away with no receipt instead of after the tracker timeout.
+    """
+
+    def __init__(self, w3, chain_id, tracker):
+        self.w3 = w3
+        self.chain_id = chain_id
+        self.tracker = tracker
+        self.lock = threading.Lock()
+        self.watched = {}  # settlement tx hash -> account, market, deadline, unsigned transaction, cancel hash
+        self.cancelled = set()  # settlement tx hashes whose cancel was mined
+        self.markets = []  # Markets and senders read by the last calls(), in result order
+        self.senders = []
+        tracker.add_block_hook(self)
+
+    def watch(self, tx_hash, account):
+        """Guard a sent settlement, it needs a journal entry with market and deadline"""
+        entry = get_journal().entry(tx_hash)
+        if not entry or entry.get('deadline') is None:
+            return
+        with self.lock:
+            self.watched[tx_hash] = {'account': account, 'market': entry['market'], 'deadline': entry['deadline'],
+                                     'transaction': entry['transaction'], 'cancelling': False, 'cancel': None}
+
+    def unwatch(self, tx_hash):
+        """Stop guarding a resolved settlement, True if it was cancelled"""
+        with self.lock:
+            watched = self.watched.pop(tx_hash, None)
+            cancelled = tx_hash in self.cancelled
+            self.cancelled.discard(tx_hash)
+        if watched and watched['cancel'] and not cancelled:
+            # The settlement was mined first, the cancel at its nonce can never be
+            get_journal().update(watched['cancel'], 'dropped')
+            self.tracker.abandon(watched['cancel'])
+        return cancelled
+
+    def calls(self):
+        """nextSettlement of the watched markets, then the mined nonce of their senders
+
+        The nonces are read after the markets, so a settlement of ours that the market read
+        already sees has used its nonce in the nonce read too, even if a block arrived in between.
+        """
+        with self.lock:
+            open_watches = [watched for watched in self.watched.values() if not watched['cancelling']]
+        self.markets = sorted({watched['market'] for watched in open_watches})
+        self.senders = sorted({watched['account'].address for watched in open_watches})
+        if not self.markets:
+            return []
+        data = encode_aggregate3([(market, encode_call("nextSettlement()")) for market in self.markets])
+        return ([("eth_call", [{'to': MULTICALL3_ADDRESS, 'data': "0x" + data.hex()}, 'latest'])]
+                + [("eth_getTransactionCount", [sender, 'latest']) for sender in self.senders])
+
+    def handle(self, results, resolved):
+        if not results or any(isinstance(result, Exception) for result in results):
+            return
+        next_settlements = {market: decode_uint(success, return_data) for market, (success, return_data)
+                            in zip(self.markets, decode_aggregate3(bytes.fromhex(results[0][2:])))}
+        mined_nonces = {sender: int(result, 16) for sender, result in zip(self.senders, results[1:])}
+        with self.lock:
+            lost = [tx_hash for tx_hash, watched in self.watched.items()
+                    if not watched['cancelling'] and tx_hash not in resolved
+                    and (next_settlements.get(watched['market']) or 0) > watched['deadline']
+                    and mined_nonces.get(watched['account'].address, 0) <= watched['transaction']['nonce']]
+        for tx_hash in lost:
+            self.cancel(tx_hash)
+
+    def cancel(self, tx_hash):
+        """Replace a pending settlement with a zero-value transfer to its sender at the same nonce"""
+        with self.lock:
+            watched = self.watched.get(tx_hash)
+            if watched is None or watched['cancelling']:
+                return None
+            watched['cancelling'] = True  # One attempt per settlement
+        account, settlement = watched['account'], watched['transaction']
+        transaction = cancel_transaction(account.address, {**settlement, 'chainId': self.chain_id},
+                                         get_fee_engine(self.w3).get_fees())
+        signed = account.sign_transaction(transaction)
+        cancel_hash = signed.hash.hex()
+        journal = get_journal()
+        journal.signed(cancel_hash, 'cancel', account.address, settlement['nonce'], transaction,
+                       signed.rawTransaction, market=watched['market'], replaces=tx_hash)
+        try:
+            with CALL_SECONDS.time(site="send_raw_transaction"):
+                self.w3.eth.send_raw_transaction(signed.rawTransaction)
+        except Exception as e:
+            # Most likely the settlement was mined in the meantime, its receipt arrives next block
+            journal.update(cancel_hash, 'dropped')
+            print(f"Error cancelling settlement {tx_hash}: {e}")
+            return None
+        journal.update(cancel_hash, 'sent')
+        with self.lock:
+            watched['cancel'] = cancel_hash
+        print(f"Market {watched['market']} was settled by another keeper, cancelling {tx_hash} "
+              f"(nonce {settlement['nonce']}): {cancel_hash}")
+
+        def resolve(receipt):
+            journal.resolve(cancel_hash, receipt)
+            if receipt is not None:
+                journal.update(tx_hash, 'replaced', replaced_by=cancel_hash)
+                with self.lock:
+                    self.cancelled.add(tx_hash)
+                self.tracker.abandon(tx_hash)
+            return receipt
+        self.tracker.track(cancel_hash, resolve)
+        return cancel_hash
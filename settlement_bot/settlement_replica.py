@@ -0,0 +1,237 @@
+"""
+TopCut Settlement Replica
+Bit-exact offline replica of TopCutMarket.settleCohort() winner selection, vectorized with NumPy
+"""
+
+import numpy as np
+
+PREDICTION_DECIMALS = 18
+KEEPER_REWARD_UNIT = int(1e14)
+MIN_KEEPER_REWARD = int(1e15)
+
+MASK64 = (1 << 64) - 1
+
+def normalize_price(price, oracle_decimals, prediction_decimals=PREDICTION_DECIMALS):
+    """Oracle answer -> settlement price, same integer math as settleCohort"""
+    return (int(price) * 10 ** prediction_decimals) // 10 ** oracle_decimals
+
+def cohort_winners(cohort_size):
+    """Number of winners of a cohort: 1 in 11, minimum 1 (0 for an empty cohort)"""
+    if cohort_size == 0:
+        return 0
+    return cohort_size // 11 if cohort_size > 11 else 1
+
+def settlement_reward(cohort_size):
+    """Keeper reward for settling a cohort, see getSettlementReward()"""
+    return max(cohort_size * KEEPER_REWARD_UNIT, MIN_KEEPER_REWARD)
+
+def select_winners_loop(predictions, settlement_price):
+    """Literal port of the settleCohort loop for one cohort, returns the winning trade IDs in slot order"""
+    cohort_size = len(predictions)
+    winners = cohort_winners(cohort_size)
+    winner_diffs = [0] * winners
+    slots = [0] * winners
+    current_max_index = 0
+    current_max_value = 0
+
+    for i, prediction in enumerate(predictions):
+        diff = abs(int(prediction) - settlement_price)
+        if i < winners:
+            winner_diffs[i] = diff
+            slots[i] = i
+            if diff >= current_max_value:
+                current_max_value = diff
+                current_max_index = i
+        elif diff < current_max_value:
+            winner_diffs[current_max_index] = diff
+            slots[current_max_index] = i
+            # _findMaxIndex: first index holding the largest difference
+            current_max_index = 0
+            for j in range(1, winners):
+                if winner_diffs[j] > winner_diffs[current_max_index]:
+                    current_max_index = j
+            current_max_value = winner_diffs[current_max_index]
+    return slots
+
+def _to_words(values):
+    """Split non-negative integers into (hi, lo) uint64 words, None if any value needs more than 128 bits"""
+    values = np.asarray(values)
+    if values.dtype.kind in 'ui':
+        return np.zeros(values.shape, dtype=np.uint64), values.astype(np.uint64)
+    values = values.astype(object)
+    try:
+        hi = (values >> 64).astype(np.uint64)
+    except OverflowError:
+        return None
+    return hi, (values & MASK64).astype(np.uint64)
+
+def exact_diffs(predictions, settlement_prices):
+    """|prediction - settlement price| as (hi, lo) uint64 words, exact for uint256 inputs
+
+    predictions is (n,) or (scenarios, n), settlement_prices a scalar or (scenarios,).
+    Values above 128 bits fall back to Python ints and are replaced by their dense rank,
+    which keeps every comparison of the settleCohort loop unchanged.
+    """
+    if not isinstance(predictions, np.ndarray):
+        predictions = np.asarray(predictions, dtype=object)
+    if not isinstance(settlement_prices, np.ndarray):
+        settlement_prices = np.asarray(settlement_prices, dtype=object)
+    if predictions.ndim == 1:
+        predictions = predictions[None, :]
+    prices = settlement_prices.reshape(-1, 1)
+    shape = np.broadcast_shapes(predictions.shape, prices.shape)
+
+    prediction_words = _to_words(predictions)
+    price_words = _to_words(prices)
+    if prediction_words is None or price_words is None:
+        diffs = np.broadcast_to(np.abs(predictions.astype(object) - prices.astype(object)), shape)
+        _, ranks = np.unique(diffs.ravel(), return_inverse=True)
+        return np.zeros(shape, dtype=np.uint64), ranks.reshape(shape).astype(np.uint64)
+
+    (p_hi, p_lo), (s_hi, s_lo) = prediction_words, price_words
+    p_hi, p_lo, s_hi, s_lo = np.broadcast_arrays(p_hi, p_lo, s_hi, s_lo)
+    above = (p_hi > s_hi) | ((p_hi == s_hi) & (p_lo > s_lo))
+    a_hi, a_lo = np.where(above, p_hi, s_hi), np.where(above, p_lo, s_lo)
+    b_hi, b_lo = np.where(above, s_hi, p_hi), np.where(above, s_lo, p_lo)
+    borrow = (a_lo < b_lo).astype(np.uint64)
+    return a_hi - b_hi - borrow, a_lo - b_lo
+
+def _is_max(hi, lo):
+    """Mask of the slots holding the largest two-word value of each row"""
+    max_hi = hi.max(axis=1, keepdims=True)
+    top = hi == max_hi
+    max_lo = np.where(top, lo, 0).max(axis=1, keepdims=True)
+    return top & (lo == max_lo)
+
+def _cohort_shape(diff_hi, cohort_sizes):
+    scenarios, n = diff_hi.shape
+    if cohort_sizes is None:
+        sizes = np.full(scenarios, n, dtype=np.int64)
+    else:
+        sizes = np.broadcast_to(np.asarray(cohort_sizes, dtype=np.int64), (scenarios,))
+    winners = np.where(sizes > 11, sizes // 11, np.minimum(sizes, 1))
+    return sizes, winners
+
+def select_winner_slots(predictions, settlement_prices, cohort_sizes=None):
+    """Run the settleCohort loop for many cohorts / price scenarios in lockstep
+
+    Rows of a (scenarios, n) prediction matrix can hold cohorts of different sizes, padded
+    up to n; cohort_sizes gives the real size per row. Returns a (scenarios, max winners)
+    int64 array of trade IDs in the contract's winner slot order, -1 for unused slots.
+    """
+    diff_hi, diff_lo = exact_diffs(predictions, settlement_prices)
+    sizes, winners = _cohort_shape(diff_hi, cohort_sizes)
+    return _lockstep_slots(diff_hi, diff_lo, sizes, winners)
+
+def _lockstep_slots(diff_hi, diff_lo, sizes, winners):
+    scenarios = diff_hi.shape[0]
+    max_winners = int(winners.max()) if scenarios else 0
+    if max_winners == 0:
+        return np.full((scenarios, 0), -1, dtype=np.int64)
+
+    # Seed the first `winners` trades; `diff >= currentMaxValue` leaves the last maximum selected.
+    # Unused slots hold 0 and come after the seeded ones, so they never win _findMaxIndex.
+    seeded = np.arange(max_winners)[None, :] < winners[:, None]
+    slots = np.where(seeded, np.arange(max_winners)[None, :], -1)
+    slot_hi = np.where(seeded, diff_hi[:, :max_winners], 0).astype(np.uint64)
+    slot_lo = np.where(seeded, diff_lo[:, :max_winners], 0).astype(np.uint64)
+    last_max = seeded & _is_max(slot_hi, slot_lo)
+    current_max_index = max_winners - 1 - np.argmax(last_max[:, ::-1], axis=1)
+    all_rows = np.arange(scenarios)
+    max_hi = slot_hi[all_rows, current_max_index]
+    max_lo = slot_lo[all_rows, current_max_index]
+
+    for i in range(int(winners.min()), int(sizes.max())):
+        hi, lo = diff_hi[:, i], diff_lo[:, i]
+        below = (hi < max_hi) | ((hi == max_hi) & (lo < max_lo))
+        rows = np.nonzero(below & (i >= winners) & (i < sizes))[0]
+        if rows.size == 0:
+            continue
+        index = current_max_index[rows]
+        slot_hi[rows, index] = hi[rows]
+        slot_lo[rows, index] = lo[rows]
+        slots[rows, index] = i
+        # _findMaxIndex keeps the first index of the largest difference, as argmax does
+        index = np.argmax(_is_max(slot_hi[rows], slot_lo[rows]), axis=1)
+        current_max_index[rows] = index
+        max_hi[rows] = slot_hi[rows, index]
+        max_lo[rows] = slot_lo[rows, index]
+    return slots
+
+def winner_mask(predictions, settlement_prices, cohort_sizes=None):
+    """(scenarios, n) bool mask of the trades that settleCohort would pay out
+
+    The loop always ends with every difference below the k-th smallest one among the
+    winners and none above it, so a partition finds the winners of most rows directly.
+    Rows with several equal differences at the boundary depend on the slot order of
+    the loop and are replayed with select_winner_slots semantics.
+    """
+    diff_hi, diff_lo = exact_diffs(predictions, settlement_prices)
+    sizes, winners = _cohort_shape(diff_hi, cohort_sizes)
+    scenarios, n = diff_hi.shape
+    mask = np.zeros((scenarios, n), dtype=bool)
+
+    # float64 rounding is monotone, so a smaller key always means a smaller exact difference
+    keys = diff_hi.astype(np.float64) * 2.0 ** 64 + diff_lo.astype(np.float64)
+    keys[np.arange(n)[None, :] >= sizes[:, None]] = np.inf
+
+    replay = []
+    for k in np.unique(winners):
+        if k == 0:
+            continue
+        rows = np.nonzero(winners == k)[0]
+        row_keys = keys[rows]
+        boundary = np.partition(row_keys, k - 1, axis=1)[:, k - 1:k]
+        below = row_keys < boundary
+        at_boundary = row_keys == boundary
+        exact = below.sum(axis=1) + at_boundary.sum(axis=1) == k
+        mask[rows[exact]] = (below | at_boundary)[exact]
+        replay.append(rows[~exact])
+
+    replay = np.concatenate(replay) if replay else np.zeros(0, dtype=np.int64)
+    if replay.size:
+        slots = _lockstep_slots(diff_hi[replay], diff_lo[replay], sizes[replay], winners[replay])
+        row_index, slot_index = np.nonzero(slots >= 0)
+        mask[replay[row_index], slots[row_index, slot_index]] = True
+    return mask
+
+def select_winners(predictions, settlement_prices, cohort_sizes=None):
+    """Winning trade IDs of many cohorts / price scenarios at once
+
+    Same inputs as select_winner_slots. Returns a (scenarios, max winners) int64 array of
+    the winning trade IDs in ascending order, -1 for unused slots. claimAmounts only depend
+    on this set; use select_winner_slots for the exact order of the contract's owners array.
+    """
+    mask = winner_mask(predictions, settlement_prices, cohort_sizes)
+    counts = mask.sum(axis=1)
+    winners = np.full((mask.shape[0], int(counts.max()) if mask.size else 0), -1, dtype=np.int64)
+    row_index, trade_ids = np.nonzero(mask)
+    position = np.arange(row_index.size) - np.repeat(np.cumsum(counts) - counts, counts)
+    winners[row_index, position] = trade_ids
+    return winners
+
+def claim_deltas(owners, winner_slots, win_size):
+    """claimAmounts increase per owner address for one settled cohort"""
+    deltas = {}
+    for trade_id in winner_slots:
+        if trade_id < 0:
+            continue
+        owner = owners[trade_id]
+        deltas[owner] = deltas.get(owner, 0) + win_size
+    return deltas
+
+def simulate_settlement(predictions, owners, settlement_price, trade_size):
+    """Outcome of settling one cohort at a given (normalized) price, as settleCohort would record it"""
+    cohort_size = len(predictions)
+    winners = cohort_winners(cohort_size)
+    win_size = trade_size * 10
+    slots = select_winners(predictions, settlement_price)[0].tolist() if cohort_size else []
+    return {
+        'cohort_size': cohort_size,
+        'winners': winners,
+        'settlement_price': settlement_price,
+        'winner_trade_ids': slots,
+        'claim_deltas': claim_deltas(owners, slots, win_size),
+        'pending_claims_delta': winners * win_size,
+        'keeper_reward': settlement_reward(cohort_size),
+    }
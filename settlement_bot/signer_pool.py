@@ -0,0 +1,104 @@
+"""
+TopCut Signer Pool
+Several keeper keys with their own nonce streams, markets assigned to keys and sent in parallel
+"""
+
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from eth_account import Account
+
+POLICIES = ("hash", "least_loaded")
+
+def parse_keys(private_key, private_keys=None):
+    """PRIVATEKEY followed by the comma separated PRIVATEKEYS, without duplicates"""
+    keys = []
+    for key in [private_key] + (private_keys or "").split(","):
+        key = (key or "").strip()
+        if key and key not in keys:
+            keys.append(key)
+    return keys
+
+def _rank(market_address, account_address):
+    return hashlib.sha256(f"{market_address.lower()}:{account_address.lower()}".encode()).digest()
+
+class SignerPool:
+    """Keeper accounts that each send from their own nonce sequence
+
+    With policy 'hash' every market is bound to one key by rendezvous hashing of market and
+    account address, so adding or removing a key only moves the markets of that key. With
+    'least_loaded' a market goes to the key with the fewest transactions in flight, which
+    routes around a key whose nonce is stuck; ties fall back to the hash order.
+    """
+
+    def __init__(self, private_keys, policy="hash"):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown signer policy '{policy}', expected one of {', '.join(POLICIES)}")
+        self.accounts = [Account.from_key(key) for key in private_keys]
+        self.policy = policy
+        self.in_flight = {account.address: 0 for account in self.accounts}
+        self.lock = threading.Lock()
+        self.executor = None
+
+    def _ranked(self, market_address):
+        return sorted(self.accounts, key=lambda account: _rank(market_address, account.address), reverse=True)
+
+    def assign(self, market_addresses):
+        """{market address: account} for markets sent together
+
+        With least_loaded every assignment counts towards its key's load, so markets due in
+        the same block are spread over the keys instead of all going to the idlest one.
+        """
+        with self.lock:
+            load = dict(self.in_flight)
+        assigned = {}
+        for address in market_addresses:
+            ranked = self._ranked(address)
+            account = ranked[0] if self.policy == "hash" else min(ranked, key=lambda a: load[a.address])
+            load[account.address] += 1
+            assigned[address] = account
+        return assigned
+
+    def by_address(self, address):
+        """Account of the pool with this address, None if its key is not in the pool"""
+        return next((account for account in self.accounts if account.address.lower() == address.lower()), None)
+
+    def account_for(self, market_address):
+        """Account that sends the next transaction of a market"""
+        return self.assign([market_address])[market_address]
+
+    def begin(self, account):
+        """Count a sent transaction of account until finish() is called for it"""
+        with self.lock:
+            self.in_flight[account.address] = self.in_flight.get(account.address, 0) + 1
+
+    def finish(self, account):
+        with self.lock:
+            self.in_flight[account.address] = max(self.in_flight.get(account.address, 0) - 1, 0)
+
+    def run(self, jobs):
+        """Run {name: (account, function)} with one thread per account, returns {name: result}
+
+        Jobs of the same account run in order, so its nonces are allocated without gaps;
+        different accounts send at the same time, so their transactions can share a block.
+        """
+        by_account = {}
+        for name, (account, function) in jobs.items():
+            by_account.setdefault(account.address, []).append((name, function))
+        if len(by_account) <= 1:
+            return {name: function() for name, (_, function) in jobs.items()}
+
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=len(self.accounts), thread_name_prefix="signer")
+        def run_serially(queued):
+            return [(name, function()) for name, function in queued]
+        futures = [self.executor.submit(run_serially, queued) for queued in by_account.values()]
+        results = {}
+        for future in futures:
+            results.update(future.result())
+        return {name: results.get(name) for name in jobs}
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
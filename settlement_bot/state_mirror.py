@@ -0,0 +1,299 @@
+"""
+TopCut Market State Mirror
+Cohort state and keeper rewards rebuilt from CohortSettled / PredictionPosted logs and checkpointed to SQLite
+"""
+
+import sqlite3
+import threading
+import time
+
+from events import MARKET_EVENT_TOPICS, apply_market_event, decode_market_log
+from multicall import aggregate3, build_markets_state_calls, parse_markets_state, encode_call, decode_uint
+
+KEEPER_REWARD_UNIT = int(1e14)  # Keeper reward per prediction in the settled cohort
+MIN_KEEPER_REWARD = int(1e15)  # Minimum keeper reward per settlement
+
+STATE_FIELDS = ['next_settlement', 'active_cohort_id', 'cohort_size_1', 'cohort_size_2']
+MARKET_COLUMNS = ['address', 'name', 'trade_duration', 'next_settlement', 'active_cohort_id', 'cohort_size_1',
+                  'cohort_size_2', 'block_number', 'block_hash', 'reconciled_at']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS markets (
+    address TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    trade_duration INTEGER NOT NULL,
+    next_settlement INTEGER NOT NULL,
+    active_cohort_id INTEGER NOT NULL,
+    cohort_size_1 INTEGER NOT NULL,
+    cohort_size_2 INTEGER NOT NULL,
+    block_number INTEGER NOT NULL,
+    block_hash TEXT,
+    reconciled_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS keeper_rewards (
+    address TEXT NOT NULL,
+    keeper TEXT NOT NULL,
+    amount TEXT NOT NULL,
+    PRIMARY KEY (address, keeper)
+)
+"""
+
+def settlement_reward(cohort_size):
+    """Keeper reward credited by settleCohort, see getSettlementReward()"""
+    return max(cohort_size * KEEPER_REWARD_UNIT, MIN_KEEPER_REWARD)
+
+class MarketMirror:
+    """Answers 'what is due, how big is it and what did we earn' without per-market view calls
+
+    keepers are the addresses whose keeperRewards are mirrored, usually every key of the
+    signer pool. CohortSettled carries no keeper address, so the senders of the settlements
+    in a range of logs are looked up in one JSON-RPC batch (send_batch, e.g. BotSession.batch)
+    and our keys are credited with the settlement reward. claimKeeperReward emits no event:
+    claims are deducted with record_claim() once mined. The hash of the checkpoint block is
+    stored, a reorg below it is caught on the next sync and answered with a direct read.
+    """
+
+    def __init__(self, w3, contracts, db_path, reconcile_interval=3600, max_block_range=10_000,
+                 keepers=(), send_batch=None):
+        self.w3 = w3
+        self.contracts = contracts
+        self.keepers = sorted({keeper.lower() for keeper in keepers})
+        self.send_batch = send_batch
+        self.reconcile_interval = reconcile_interval  # Seconds between direct reads that correct drift
+        self.max_block_range = max_block_range  # Block span per eth_getLogs request
+        # Claims are recorded from the receipt tracker's thread
+        self.db = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.lock = threading.RLock()
+        columns = [row[1] for row in self.db.execute("PRAGMA table_info(markets)")]
+        if columns and columns != MARKET_COLUMNS:
+            # Checkpoint written by another version, rebuilt by a direct read
+            self.db.execute("DROP TABLE markets")
+            self.db.execute("DROP TABLE IF EXISTS keeper_rewards")
+        self.db.executescript(SCHEMA)
+        self.db.commit()
+        self.states = {}  # name -> state dict incl. trade_duration and keeper_rewards {keeper: amount}
+        self.current_timestamp = None
+        self._load()
+
+    def _load(self):
+        """Resume from the last checkpoint of every configured market"""
+        names_by_address = {info['address'].lower(): name for name, info in self.contracts.items()}
+        rows = self.db.execute(
+            "SELECT address, trade_duration, next_settlement, active_cohort_id, cohort_size_1, "
+            "cohort_size_2, block_number, block_hash, reconciled_at FROM markets"
+        ).fetchall()
+        for row in rows:
+            name = names_by_address.get(row[0].lower())
+            if name is None:
+                continue
+            self.states[name] = {
+                'trade_duration': row[1],
+                'next_settlement': row[2],
+                'active_cohort_id': row[3],
+                'cohort_size_1': row[4],
+                'cohort_size_2': row[5],
+                'block_number': row[6],
+                'block_hash': row[7],
+                'reconciled_at': row[8],
+                'keeper_rewards': {},
+            }
+        for address, keeper, amount in self.db.execute("SELECT address, keeper, amount FROM keeper_rewards"):
+            name = names_by_address.get(address.lower())
+            if name in self.states:
+                self.states[name]['keeper_rewards'][keeper] = int(amount)
+
+    def _save(self):
+        rows = [
+            (self.contracts[name]['address'], name, state['trade_duration'], state['next_settlement'],
+             state['active_cohort_id'], state['cohort_size_1'], state['cohort_size_2'],
+             state['block_number'], state.get('block_hash'), state['reconciled_at'])
+            for name, state in self.states.items()
+        ]
+        rewards = [(self.contracts[name]['address'], keeper, str(amount))
+                   for name, state in self.states.items() for keeper, amount in state['keeper_rewards'].items()]
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO markets (address, name, trade_duration, next_settlement, "
+                "active_cohort_id, cohort_size_1, cohort_size_2, block_number, block_hash, reconciled_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self.db.executemany(
+                "INSERT OR REPLACE INTO keeper_rewards (address, keeper, amount) VALUES (?, ?, ?)", rewards)
+
+    def _batch(self, calls):
+        if self.send_batch:
+            results = self.send_batch(calls)
+        else:
+            results = [self.w3.provider.make_request(method, params).get('result') for method, params in calls]
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return results
+
+    def read_direct(self, names, block_number):
+        """Read state, TRADE_DURATION and keeperRewards of our keepers of the given markets in one eth_call"""
+        contracts = {name: self.contracts[name] for name in names}
+        calls = build_markets_state_calls(contracts)
+        per_market = 1 + len(self.keepers)
+        for info in contracts.values():
+            calls.append((info['address'], encode_call("TRADE_DURATION()")))
+            for keeper in self.keepers:
+                calls.append((info['address'], encode_call("keeperRewards(address)", ['address'], [keeper])))
+
+        results = aggregate3(self.w3, calls, block_number)
+        states = parse_markets_state(contracts, results)
+
+        extra = results[len(calls) - per_market * len(contracts):]
+        for index, name in enumerate(contracts):
+            state = states[name]
+            values = [decode_uint(*result) for result in extra[per_market * index:per_market * (index + 1)]]
+            if state is None or None in values:
+                states[name] = None
+                continue
+            state['trade_duration'] = values[0]
+            state['keeper_rewards'] = dict(zip(self.keepers, values[1:]))
+            state['block_number'] = block_number
+            state['reconciled_at'] = time.time()
+        return states
+
+    def reconcile(self, names=None, block_number=None):
+        """Overwrite the mirrored state with a direct read and report drift"""
+        names = list(names or self.contracts)
+        if block_number is None:
+            block_number = self.w3.eth.block_number
+
+        for name, fresh in self.read_direct(names, block_number).items():
+            if fresh is None:
+                print(f"[{name}] Reconciliation read failed, keeping mirrored state")
+                continue
+            mirrored = self.states.get(name)
+            if mirrored:
+                drift = [field for field in STATE_FIELDS + ['keeper_rewards'] if mirrored[field] != fresh[field]]
+                if drift:
+                    print(f"[{name}] Mirror drift corrected at block {block_number}: {', '.join(drift)}")
+            self.states[name] = {key: fresh[key] for key in STATE_FIELDS + ['keeper_rewards', 'trade_duration',
+                                                                            'block_number', 'reconciled_at']}
+        self._save()
+
+    def _settlement_senders(self, transaction_hashes):
+        """Sender of every settlement transaction, one JSON-RPC batch for a range of logs"""
+        if not transaction_hashes or not self.keepers:
+            return {}
+        transactions = self._batch([("eth_getTransactionByHash", [tx_hash]) for tx_hash in transaction_hashes])
+        return {tx_hash: (transaction or {}).get('from', "").lower()
+                for tx_hash, transaction in zip(transaction_hashes, transactions)}
+
+    def _apply_logs(self, from_block, to_block):
+        names_by_address = {info['address'].lower(): name for name, info in self.contracts.items()}
+        addresses = [self.contracts[name]['address'] for name in self.states]
+
+        start = from_block
+        while start <= to_block:
+            end = min(start + self.max_block_range - 1, to_block)
+            logs = self.w3.eth.get_logs({
+                'fromBlock': start,
+                'toBlock': end,
+                'address': addresses,
+                'topics': [MARKET_EVENT_TOPICS],
+            })
+            events = []
+            for log in sorted(logs, key=lambda l: (l['blockNumber'], l['logIndex'])):
+                event = decode_market_log(log)
+                name = names_by_address.get(event['address'].lower()) if event else None
+                if name is not None and event['block_number'] > self.states[name]['block_number']:
+                    events.append((name, event))
+            senders = self._settlement_senders(sorted({event['transaction_hash'] for _, event in events
+                                                       if event['event'] == 'CohortSettled'}))
+            for name, event in events:
+                state = self.states[name]
+                sender = senders.get(event['transaction_hash'])
+                if sender in self.keepers:
+                    state['keeper_rewards'][sender] = (state['keeper_rewards'].get(sender, 0)
+                                                       + settlement_reward(event['cohort_size']))
+                apply_market_event(state, event, state['trade_duration'])
+            start = end + 1
+
+    def _blocks(self, numbers):
+        """Number, hash and timestamp of the head block and of the given block numbers"""
+        blocks = self._batch([("eth_getBlockByNumber", ['latest', False])]
+                             + [("eth_getBlockByNumber", [hex(number), False]) for number in numbers])
+        return [{'number': int(block['number'], 16) if isinstance(block['number'], str) else block['number'],
+                 'hash': block['hash'] if isinstance(block['hash'], str) else "0x" + bytes(block['hash']).hex(),
+                 'timestamp': int(block['timestamp'], 16) if isinstance(block['timestamp'], str) else block['timestamp']}
+                for block in blocks]
+
+    def sync(self):
+        """Replay logs since the last checkpoint up to the head block, returns market states"""
+        with self.lock:
+            return self._sync()
+
+    def _sync(self):
+        checkpoints = sorted({state['block_number'] for state in self.states.values() if state.get('block_hash')})
+        head, *checked = self._blocks(checkpoints)
+        head_number, self.current_timestamp = head['number'], head['timestamp']
+
+        # A checkpoint block that is no longer canonical means logs we applied were reorged out
+        hashes = {block['number']: block['hash'] for block in checked}
+        reorged = [name for name, state in self.states.items()
+                   if state.get('block_hash') and hashes.get(state['block_number']) != state['block_hash']]
+        if reorged:
+            print(f"Mirror checkpoint reorged out, reading {len(reorged)} markets directly at block {head_number}")
+            self.reconcile(reorged, head_number)
+
+        # Markets without a checkpoint, or without the rewards of a new key, start from a direct read
+        missing = [name for name in self.contracts if name not in self.states
+                   or any(keeper not in self.states[name]['keeper_rewards'] for keeper in self.keepers)]
+        if missing:
+            self.reconcile(missing, head_number)
+
+        checkpoints = [state['block_number'] for state in self.states.values()]
+        if checkpoints and min(checkpoints) < head_number:
+            self._apply_logs(min(checkpoints) + 1, head_number)
+        for state in self.states.values():
+            state['block_number'] = head_number
+            state['block_hash'] = head['hash']
+
+        stale = [name for name, state in self.states.items()
+                 if time.time() - state['reconciled_at'] >= self.reconcile_interval]
+        if stale:
+            self.reconcile(stale, head_number)
+            for name in stale:
+                self.states[name]['block_hash'] = head['hash']
+        self._save()
+
+        return self.market_states()
+
+    def record_claim(self, name, keeper, amount):
+        """Deduct a mined keeper reward claim, claimKeeperReward emits no event"""
+        with self.lock:
+            state = self.states.get(name)
+            if state is not None and keeper.lower() in state['keeper_rewards']:
+                rewards = state['keeper_rewards']
+                rewards[keeper.lower()] = max(rewards[keeper.lower()] - int(amount), 0)
+                self._save()
+
+    def keeper_rewards(self, keeper):
+        """Mirrored keeperRewards of one keeper as {name: amount}, None for markets without a checkpoint"""
+        with self.lock:
+            return {name: (self.states[name]['keeper_rewards'].get(keeper.lower()) if name in self.states else None)
+                    for name in self.contracts}
+
+    def market_states(self):
+        """State dicts in the format of multicall.get_markets_state plus trade_duration and keeper_rewards"""
+        states = {}
+        for name in self.contracts:
+            state = self.states.get(name)
+            if state is None:
+                states[name] = None
+                continue
+            states[name] = dict(state, keeper_rewards=dict(state['keeper_rewards']),
+                                current_timestamp=self.current_timestamp)
+        return states
+
+_mirrors = {}
+
+def get_market_mirror(w3, contracts, db_path, reconcile_interval=3600, keepers=(), send_batch=None):
+    """Get the process-wide MarketMirror for a database file"""
+    if db_path not in _mirrors:
+        _mirrors[db_path] = MarketMirror(w3, contracts, db_path, reconcile_interval,
+                                         keepers=keepers, send_batch=send_batch)
+    return _mirrors[db_path]
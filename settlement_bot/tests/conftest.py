@@ -0,0 +1,22 @@
+"""The bot scripts import each other as top-level modules"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture(autouse=True)
+def state_files(tmp_path, monkeypatch):
+    """Journal, gas model and metadata cache of every test go to its tmp_path, never next to the sources"""
+    import tx_journal
+
+    monkeypatch.setenv("STATE_DIR", str(tmp_path / "state"))
+    monkeypatch.setenv("TX_JOURNAL", str(tmp_path / "state" / "test.journal.jsonl"))
+    monkeypatch.setenv("GAS_MODEL_PATH", str(tmp_path / "gas_model.json"))
+    monkeypatch.setenv("METADATA_CACHE_PATH", str(tmp_path / "metadata_cache.db"))
+    monkeypatch.setattr(tx_journal, "_journal", None)
+    yield tmp_path
+    if tx_journal._journal is not None:
+        tx_journal._journal.close()
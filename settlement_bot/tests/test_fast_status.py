@@ -0,0 +1,48 @@
+"""fast_status against the mock node, it has to agree with the full status path"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+from fast_status import read_status
+from mock_node import MockChain, serve_http, synthetic_market_addresses
+
+BOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture
+def chain():
+    chain = MockChain(block_time=3600)
+    server, chain.url = serve_http(chain)
+    yield chain
+    server.shutdown()
+    server.server_close()
+
+def test_read_status_sums_every_key(chain):
+    keepers = ["0x" + "11" * 20, "0x" + "22" * 20]
+    addresses = synthetic_market_addresses(2)
+    for address in addresses:
+        chain.add_market(address, cohort_size=5)
+    chain.markets[addresses[0]].keeper_rewards = {"0x" + "11" * 20: 3 * 10**15, "0x" + "22" * 20: 10**15}
+    chain.markets[addresses[1]].total_pending_claims = 10**16
+
+    markets = {"Market 0": addresses[0], "Market 1": addresses[1]}
+    status, account_balance, fees = read_status(chain.url, markets, keepers)
+
+    assert status["Market 0"] == {'keeper_rewards': 4 * 10**15, 'contract_balance': 5 * 10**16,
+                                  'total_pending_claims': 0}
+    assert status["Market 1"] == {'keeper_rewards': 0, 'contract_balance': 5 * 10**16,
+                                  'total_pending_claims': 10**16}
+    assert account_balance == 2 * 10**18
+    # The fee engine's estimate from the same batch, not eth_gasPrice
+    assert fees['effective_gas_price'] == chain.base_fee
+    assert fees['max_fee_per_gas'] == 2 * chain.base_fee
+    assert chain.request_counts.get('eth_gasPrice', 0) == 0
+    assert chain.request_counts['eth_feeHistory'] == 1
+
+def test_imports_neither_web3_nor_eth_abi():
+    # A fresh interpreter, the other tests already imported web3 into this one
+    script = "import sys, fast_status; print(sorted({'web3', 'eth_abi', 'eth_account', 'requests'} & set(sys.modules)))"
+    output = subprocess.run([sys.executable, "-c", script], cwd=BOT_DIR, capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == "[]"
@@ -0,0 +1,162 @@
+"""keeper_bot_async against the mock node"""
+
+import asyncio
+import json
+import os
+
+import pytest
+from eth_account import Account
+from web3 import AsyncWeb3
+
+import keeper_bot_async
+from mock_node import CHAIN_ID, MockChain, serve_http, serve_ws, synthetic_market_addresses
+from multicall import encode_call
+from nonce_manager import AsyncNonceManager
+from signer_pool import SignerPool
+
+ABI_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "abi.json")
+
+@pytest.fixture
+def chain():
+    chain = MockChain(block_time=3600)  # Blocks only advance when a test moves the clock
+    server, chain.url = serve_http(chain)
+    yield chain
+    server.shutdown()
+    server.server_close()
+
+def next_block(chain):
+    chain.start_time -= chain.block_time
+
+def add_due_markets(chain, count):
+    now = chain.block_timestamp(chain.block_number())
+    addresses = synthetic_market_addresses(count)
+    for address in addresses:
+        chain.add_market(address, next_settlement=now - 1, cohort_size=11)
+    return addresses
+
+def connect(chain, addresses, keys=1):
+    """Like setup_async_contracts(), with fresh keys"""
+    w3 = AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(chain.url))
+    with open(ABI_PATH) as f:
+        abi = json.load(f)
+    contracts = {f"Market {index}": {'contract': w3.eth.contract(address=address, abi=abi), 'address': address}
+                 for index, address in enumerate(addresses)}
+    signers = SignerPool([Account.create().key.hex() for _ in range(keys)])
+    return w3, contracts, signers, {account.address: AsyncNonceManager(w3, account.address)
+                                    for account in signers.accounts}
+
+async def mine_when_sent(chain, count):
+    """Advance one block once count transactions were sent"""
+    while len(chain.transactions) < count:
+        await asyncio.sleep(0.01)
+    next_block(chain)
+
+def test_receipt_waits_do_not_hold_the_concurrency_limit(chain, monkeypatch):
+    # One market at a time may send, the block with the receipts only comes after all four sent
+    monkeypatch.setattr(keeper_bot_async, 'max_concurrency', 1)
+    monkeypatch.setattr(keeper_bot_async, 'settle_timeout', 10)
+    addresses = add_due_markets(chain, 4)
+    w3, contracts, signers, nonce_managers = connect(chain, addresses)
+
+    async def run():
+        miner = asyncio.create_task(mine_when_sent(chain, 4))
+        results = await asyncio.wait_for(keeper_bot_async.run_once_async(w3, contracts, signers, nonce_managers), 5)
+        await miner
+        return results
+
+    results = asyncio.run(run())
+    assert all(results.values())
+    assert sorted(tx['nonce'] for tx in chain.transactions.values()) == [0, 1, 2, 3]
+
+def test_receipt_timeout_marks_the_nonce_stale(chain, monkeypatch):
+    monkeypatch.setattr(keeper_bot_async, 'settle_timeout', 1)
+    addresses = add_due_markets(chain, 1)
+    w3, contracts, signers, nonce_managers = connect(chain, addresses)
+
+    results = asyncio.run(keeper_bot_async.run_once_async(w3, contracts, signers, nonce_managers))
+
+    assert results == {"Market 0": None}
+    assert len(chain.transactions) == 1
+    assert nonce_managers[signers.accounts[0].address].next_nonce is None
+
+def test_markets_are_sent_from_their_assigned_keys(chain):
+    addresses = add_due_markets(chain, 6)
+    w3, contracts, signers, nonce_managers = connect(chain, addresses, keys=3)
+    assigned = signers.assign(addresses)
+
+    async def run():
+        miner = asyncio.create_task(mine_when_sent(chain, 6))
+        results = await asyncio.wait_for(keeper_bot_async.run_once_async(w3, contracts, signers, nonce_managers), 5)
+        await miner
+        return results
+
+    assert all(asyncio.run(run()).values())
+    by_key = {}
+    for tx in chain.transactions.values():
+        market = "0x" + bytes(tx['to']).hex()
+        assert tx['sender'] == assigned[next(a for a in addresses if a.lower() == market)].address
+        by_key.setdefault(tx['sender'], []).append(tx['nonce'])
+    # Every key counts its own nonces from zero
+    assert all(sorted(nonces) == list(range(len(nonces))) for nonces in by_key.values())
+    assert set(by_key) == {account.address for account in assigned.values()}
+    assert signers.in_flight == {account.address: 0 for account in signers.accounts}
+
+@pytest.fixture
+def ws_chain():
+    chain = MockChain(block_time=1)  # One second blocks with distinct timestamps
+    server, chain.url = serve_http(chain)
+    chain.ws_url = serve_ws(chain)
+    yield chain
+    server.shutdown()
+    server.server_close()
+
+def test_ws_mode_settles_on_the_block_that_crosses_next_settlement(ws_chain, monkeypatch, capsys):
+    chain = ws_chain
+    crossing = chain.block_number() + 3
+    next_settlement = chain.block_timestamp(crossing)
+    address = synthetic_market_addresses(1)[0]
+    chain.add_market(address, trade_duration=3600, next_settlement=next_settlement, cohort_size=11)
+    connection = connect(chain, [address])
+    monkeypatch.setattr(keeper_bot_async, 'setup_async_contracts', lambda: connection)
+
+    checked = []
+    check = keeper_bot_async.check_single_contract_async
+    async def spy(w3, contract_info, contract_name, account, nonce_manager, state, semaphore):
+        checked.append((chain.block_number(), dict(state)))
+        return await check(w3, contract_info, contract_name, account, nonce_manager, state, semaphore)
+    monkeypatch.setattr(keeper_bot_async, 'check_single_contract_async', spy)
+
+    # A trader's prediction for the open cohort, its PredictionPosted log reaches the bot over the feed
+    trader = Account.create()
+    prediction = trader.sign_transaction({
+        'to': address, 'value': 10**16, 'gas': 200_000, 'maxFeePerGas': 3 * 10**7, 'maxPriorityFeePerGas': 10**6,
+        'nonce': 0, 'chainId': CHAIN_ID,
+        'data': "0x" + encode_call("castPrediction(address,uint256,uint256,uint256)",
+                                   ['address', 'uint256', 'uint256', 'uint256'],
+                                   [trader.address, 0, 100_000 * 10**18, 1]).hex(),
+    })
+
+    async def run():
+        task = asyncio.create_task(keeper_bot_async.run_ws_async(chain.ws_url))
+        try:
+            await asyncio.sleep(0.3)
+            chain.send_raw_transaction("0x" + bytes(prediction.rawTransaction).hex())
+            while "Cohort settled" not in capsys.readouterr().out:
+                assert chain.block_number() <= crossing + 4, "no settlement"
+                await asyncio.sleep(0.05)
+            await asyncio.sleep(1.5)  # The next heads must not settle again
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(run())
+
+    # Exactly one settlement, sent during the first block at or past nextSettlement
+    assert len(checked) == 1
+    block_number, state = checked[0]
+    assert block_number == crossing == state['block_number']
+    assert state['current_timestamp'] >= next_settlement > chain.block_timestamp(crossing - 1)
+    assert (state['cohort_size_1'], state['cohort_size_2']) == (1, 11)
+    settlements = [tx for tx in chain.transactions.values() if tx['sender'] == connection[2].accounts[0].address]
+    assert [tx['blockNumber'] for tx in settlements] == [crossing + 1]
+    assert chain.markets[address].next_settlement == next_settlement + 3600
@@ -0,0 +1,88 @@
+"""NonceManager recovery after failed sends"""
+
+import asyncio
+
+from nonce_manager import AsyncNonceManager, NonceManager, is_nonce_error
+
+class FakeEth:
+    """Pending transaction count of one account, counting the reads"""
+
+    def __init__(self, pending):
+        self.pending = pending
+        self.reads = 0
+
+    def get_transaction_count(self, address, block_identifier):
+        assert block_identifier == 'pending'
+        self.reads += 1
+        return self.pending
+
+class FakeWeb3:
+    def __init__(self, pending=0):
+        self.eth = FakeEth(pending)
+
+class FakeAsyncEth(FakeEth):
+    async def get_transaction_count(self, address, block_identifier):
+        await asyncio.sleep(0)
+        return FakeEth.get_transaction_count(self, address, block_identifier)
+
+def make_manager(pending=0):
+    w3 = FakeWeb3(pending)
+    return w3, NonceManager(w3, "0x" + "11" * 20)
+
+def test_allocates_locally_after_one_read():
+    w3, manager = make_manager(7)
+    assert [manager.allocate() for _ in range(3)] == [7, 8, 9]
+    assert manager.peek() == 10
+    assert w3.eth.reads == 1
+
+def test_release_of_last_nonce_reuses_it():
+    w3, manager = make_manager(3)
+    nonce = manager.allocate()
+    manager.handle_send_error(nonce, ValueError("insufficient funds for gas * price + value"))
+    assert manager.allocate() == 3
+    assert w3.eth.reads == 1
+
+def test_release_behind_a_later_nonce_resyncs():
+    w3, manager = make_manager(3)
+    first, second = manager.allocate(), manager.allocate()
+    assert (first, second) == (3, 4)
+    # 4 is already out and waits for 3 at the node, which still counts 3 as pending
+    manager.release(first)
+    assert manager.allocate() == 3
+    assert w3.eth.reads == 2
+
+def test_nonce_error_resyncs_from_node():
+    w3, manager = make_manager(5)
+    nonce = manager.allocate()
+    w3.eth.pending = 9  # Another process used the account
+    manager.handle_send_error(nonce, ValueError({'code': -32000, 'message': "nonce too low"}))
+    assert manager.allocate() == 9
+    assert w3.eth.reads == 2
+
+def test_mark_stale_after_timeout():
+    w3, manager = make_manager(0)
+    manager.allocate()
+    manager.mark_stale()
+    w3.eth.pending = 0  # The transaction was dropped, its nonce is free again
+    assert manager.allocate() == 0
+
+def test_is_nonce_error():
+    assert is_nonce_error(ValueError("Nonce too low: next nonce 5, tx nonce 4"))
+    assert is_nonce_error(ValueError({'message': "replacement transaction underpriced"}))
+    assert not is_nonce_error(ValueError("execution reverted"))
+
+def test_async_manager_recovers_like_the_sync_one():
+    w3 = FakeWeb3()
+    w3.eth = FakeAsyncEth(2)
+    manager = AsyncNonceManager(w3, "0x" + "22" * 20)
+
+    async def run():
+        nonces = await asyncio.gather(*[manager.allocate() for _ in range(4)])
+        manager.handle_send_error(nonces[-1], ValueError("intrinsic gas too low"))
+        released = await manager.allocate()
+        manager.handle_send_error(released, ValueError("already known"))
+        w3.eth.pending = 6
+        return sorted(nonces), released, await manager.allocate()
+
+    assert asyncio.run(run()) == ([2, 3, 4, 5], 5, 6)
+    assert w3.eth.reads == 2
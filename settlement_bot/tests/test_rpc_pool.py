@@ -0,0 +1,117 @@
+"""RPCPool against mock_node endpoints of different speed"""
+
+import time
+
+import pytest
+from eth_account import Account
+
+from mock_node import CHAIN_ID, MockChain, serve_http
+from rpc_pool import RPCPool
+
+servers = []
+
+def start(chain, latency=0.0, port=0):
+    server, url = serve_http(chain, port=port, latency=latency)
+    servers.append(server)
+    return server, url
+
+def stop(server):
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture(autouse=True)
+def cleanup():
+    yield
+    while servers:
+        stop(servers.pop())
+
+@pytest.fixture
+def chain():
+    return MockChain(block_time=3600)
+
+def prime(endpoint, latency):
+    """Pretend the endpoint answered MIN_SAMPLES requests in latency seconds"""
+    endpoint.latencies.extend([latency] * 5)
+
+def raw_transfer(account, nonce):
+    signed = account.sign_transaction({'to': account.address, 'value': 0, 'gas': 21_000, 'maxFeePerGas': 3 * 10**7,
+                                       'maxPriorityFeePerGas': 10**6, 'nonce': nonce, 'chainId': CHAIN_ID})
+    return "0x" + bytes(signed.rawTransaction).hex(), "0x" + bytes(signed.hash).hex()
+
+def test_read_is_hedged_after_the_p95_delay(chain):
+    arrivals = []
+    _, slow_url = start(chain, latency=0.4)
+    _, fast_url = start(chain, latency=lambda: arrivals.append(time.time()) or 0)
+    pool = RPCPool([slow_url, fast_url])
+    slow, fast = pool.endpoints
+    prime(slow, 0.1)  # Ranked first, hedged after its p95 of 100 ms
+
+    started = time.time()
+    assert int(pool.make_request('eth_blockNumber', [])['result'], 16) == chain.block_number()
+    elapsed = time.time() - started
+
+    # The fast endpoint only got the read once the delay passed, and its reply won
+    assert len(arrivals) == 1 and arrivals[0] - started >= 0.1
+    assert elapsed < 0.3
+    assert pool.hedges == 1 and fast.wins == 1 and slow.wins == 0
+    pool.close()
+
+def test_no_hedge_within_the_p95_delay(chain):
+    _, slow_url = start(chain, latency=0.2)
+    _, fast_url = start(chain)
+    pool = RPCPool([slow_url, fast_url])
+    slow, fast = pool.endpoints
+    prime(slow, 0.5)
+
+    pool.make_request('eth_blockNumber', [])
+    assert pool.hedges == 0 and slow.wins == 1 and fast.requests == 0
+    pool.close()
+
+def test_dead_endpoint_cools_down_and_comes_back(chain):
+    dead_server, dead_url = start(chain)
+    live_server, live_url = start(chain)
+    port = dead_server.server_address[1]
+    servers.remove(dead_server)
+    stop(dead_server)
+    pool = RPCPool([dead_url, live_url])
+    dead, live = pool.endpoints
+
+    # The refused connection is replaced by the next endpoint right away
+    pool.make_request('eth_blockNumber', [])
+    assert dead.failures == 1 and not dead.is_up() and live.wins == 1
+
+    # While it cools down the dead endpoint is not tried first
+    pool.make_request('eth_chainId', [])
+    assert dead.requests == 1 and live.wins == 2
+
+    # Back on the same port once the one second cooldown passed, it takes over when the other one dies
+    start(chain, port=port)
+    time.sleep(max(dead.down_until - time.time(), 0) + 0.05)
+    assert dead.is_up()
+    servers.remove(live_server)
+    stop(live_server)
+    live.http_session.close()  # The handler thread of its keep-alive connection would still answer
+
+    pool.make_request('eth_blockNumber', [])
+    assert dead.wins == 1 and dead.failures == 0 and live.failures == 1
+    pool.close()
+
+def test_transactions_reach_every_endpoint():
+    chains = [MockChain(block_time=3600) for _ in range(3)]
+    pool = RPCPool([start(chain, latency=0.05 * index)[1] for index, chain in enumerate(chains)])
+    account = Account.create()
+
+    raw, tx_hash = raw_transfer(account, 0)
+    assert pool.make_request('eth_sendRawTransaction', [raw])['result'] == tx_hash
+
+    # The batch path, e.g. the rebroadcasts of tx_journal.recover, broadcasts as well
+    raw, batch_hash = raw_transfer(account, 1)
+    assert pool.batch([("eth_sendRawTransaction", [raw]), ("eth_chainId", [])]) == [batch_hash, hex(CHAIN_ID)]
+
+    # The first reply returns, the slower endpoints still get the transactions
+    deadline = time.time() + 2
+    while time.time() < deadline and not all(batch_hash in chain.transactions for chain in chains):
+        time.sleep(0.01)
+    for chain in chains:
+        assert tx_hash in chain.transactions and batch_hash in chain.transactions
+    pool.close()
@@ -0,0 +1,64 @@
+"""settlement_replica against the literal port of the settleCohort loop"""
+
+import random
+
+import numpy as np
+import pytest
+
+from settlement_replica import select_winner_slots, select_winners, select_winners_loop, winner_mask
+
+def random_cohort(rng, size, base, spread):
+    return [max(1, base + rng.randint(-spread, spread)) for _ in range(size)]
+
+def assert_matches_loop(predictions, prices):
+    winners = select_winners(predictions, prices)
+    slots = select_winner_slots(predictions, prices)
+    for row, price in enumerate(prices):
+        expected = select_winners_loop(predictions, price)
+        assert slots[row].tolist() == expected
+        assert winners[row].tolist() == sorted(expected)
+
+@pytest.mark.parametrize("size", [1, 2, 11, 12, 22, 23, 50, 130, 300])
+@pytest.mark.parametrize("base,spread", [
+    (60_000 * 10**18, 10**20),
+    (60_000 * 10**18, 3),  # Mostly ties
+    (2**200, 10**6),  # Above 128 bits
+    (2**255, 10**30),
+])
+def test_matches_loop(size, base, spread):
+    rng = random.Random(size * 7919 + spread)
+    predictions = random_cohort(rng, size, base, spread)
+    prices = [base + rng.randint(-spread, spread) for _ in range(4)]
+    assert_matches_loop(predictions, prices)
+
+def test_all_equal_predictions():
+    # Every difference ties, the loop keeps the first trades in their slots
+    predictions = [10**22] * 40
+    assert_matches_loop(predictions, [10**22, 10**22 - 1, 10**22 + 5])
+
+def test_ties_at_the_boundary():
+    # Three equal differences compete for the last winner slot of a 23 trade cohort
+    predictions = [100 + i for i in range(20)] + [50, 150, 150]
+    assert_matches_loop(predictions, [100, 125, 150])
+
+def test_mixed_word_sizes():
+    # A price above 128 bits next to small predictions takes the exact fallback
+    predictions = [1, 2**130, 2**130 + 1, 5, 2**64, 2**64 - 1] * 4
+    assert_matches_loop(predictions, [2**130, 3, 2**64])
+
+def test_padded_cohorts():
+    rng = random.Random(8)
+    n = 200
+    sizes = np.array([rng.randint(0, n) for _ in range(30)])
+    predictions = [[10**22 + rng.randint(0, 50) for _ in range(n)] for _ in range(30)]
+    prices = [10**22 + rng.randint(0, 50) for _ in range(30)]
+    winners = select_winners(predictions, prices, sizes)
+    mask = winner_mask(predictions, prices, sizes)
+    for row in range(30):
+        expected = sorted(select_winners_loop(predictions[row][:sizes[row]], prices[row]))
+        assert [trade_id for trade_id in winners[row].tolist() if trade_id >= 0] == expected
+        assert np.nonzero(mask[row])[0].tolist() == expected
+
+def test_empty_cohort():
+    assert select_winners_loop([], 10) == []
+    assert select_winners([[0] * 5], [10], [0]).shape == (1, 0)
@@ -0,0 +1,109 @@
+"""MarketMirror against the mock node"""
+
+import pytest
+from eth_account import Account
+from web3 import Web3
+
+from mock_node import CHAIN_ID, MockChain, synthetic_market_addresses
+from multicall import encode_call
+from rpc_codec import batch_payload, batch_results
+from state_mirror import MarketMirror, settlement_reward
+
+@pytest.fixture
+def chain():
+    chain = MockChain(block_time=3600)  # Blocks only advance when a test moves the clock
+    now = chain.block_timestamp(chain.block_number())
+    chain.addresses = synthetic_market_addresses(2)
+    for address in chain.addresses:
+        chain.add_market(address, next_settlement=now - 1, cohort_size=30)
+    return chain
+
+@pytest.fixture
+def keepers():
+    return [Account.create(), Account.create()]
+
+def mirror_of(chain, keepers, db_path):
+    w3 = Web3(Web3.HTTPProvider("http://mock"))
+    w3.provider.make_request = lambda method, params: chain.handle_payload(
+        {'jsonrpc': "2.0", 'id': 1, 'method': method, 'params': params})
+    contracts = {f"Market {index}": {'address': address} for index, address in enumerate(chain.addresses)}
+    send_batch = lambda calls: batch_results(chain.handle_payload(batch_payload(calls)), len(calls))
+    return MarketMirror(w3, contracts, str(db_path), keepers=[keeper.address for keeper in keepers],
+                        send_batch=send_batch)
+
+def mirror_name(mirror, address):
+    return next(name for name, info in mirror.contracts.items() if info['address'] == address)
+
+def next_block(chain):
+    chain.start_time -= chain.block_time
+
+def send(chain, account, to, data):
+    nonce = chain.nonces.get(account.address, 0)
+    signed = account.sign_transaction({'to': to, 'data': "0x" + data.hex(), 'value': 0, 'gas': 300_000,
+                                       'maxFeePerGas': 3 * 10**7, 'maxPriorityFeePerGas': 10**6,
+                                       'nonce': nonce, 'chainId': CHAIN_ID})
+    return chain.send_raw_transaction("0x" + bytes(signed.rawTransaction).hex())
+
+def test_settlements_credit_the_settling_keeper(chain, keepers, tmp_path):
+    mirror = mirror_of(chain, keepers, tmp_path / "mirror.db")
+    mirror.sync()
+    assert mirror.keeper_rewards(keepers[0].address) == {"Market 0": 0, "Market 1": 0}
+
+    # One of our keys settles each market, a third party's settlement credits nobody of ours
+    stranger = Account.create()
+    send(chain, keepers[0], chain.addresses[0], encode_call("settleCohort()"))
+    send(chain, keepers[1], chain.addresses[1], encode_call("settleCohort()"))
+    next_block(chain)
+    mirror.sync()
+
+    assert mirror.keeper_rewards(keepers[0].address) == {"Market 0": settlement_reward(30), "Market 1": 0}
+    assert mirror.keeper_rewards(keepers[1].address) == {"Market 0": 0, "Market 1": settlement_reward(30)}
+    assert mirror.keeper_rewards(stranger.address)["Market 0"] is None
+    for address in chain.addresses:
+        assert mirror.states[mirror_name(mirror, address)]['keeper_rewards'] == {
+            keeper.address.lower(): chain.markets[address].keeper_rewards.get(keeper.address, 0)
+            for keeper in keepers}
+
+def test_claims_and_restarts_match_the_contract(chain, keepers, tmp_path, capsys):
+    mirror = mirror_of(chain, keepers, tmp_path / "mirror.db")
+    mirror.sync()
+    send(chain, keepers[0], chain.addresses[0], encode_call("settleCohort()"))
+    next_block(chain)
+    mirror.sync()
+
+    # claimKeeperReward has no event, the claimer records it once mined
+    reward = settlement_reward(30)
+    send(chain, keepers[0], chain.addresses[0],
+         encode_call("claimKeeperReward(address,uint256)", ['address', 'uint256'], [keepers[0].address, reward // 2]))
+    next_block(chain)
+    mirror.record_claim("Market 0", keepers[0].address, reward // 2)
+
+    # A restarted mirror resumes from the checkpoint and a direct read finds no drift
+    restarted = mirror_of(chain, keepers, tmp_path / "mirror.db")
+    assert restarted.keeper_rewards(keepers[0].address)["Market 0"] == reward - reward // 2
+    restarted.sync()
+    capsys.readouterr()
+    restarted.reconcile()
+    assert "drift" not in capsys.readouterr().out
+    assert restarted.keeper_rewards(keepers[0].address)["Market 0"] == reward - reward // 2
+
+def test_new_keys_and_reorgs_are_read_directly(chain, keepers, tmp_path, capsys):
+    mirror = mirror_of(chain, keepers[:1], tmp_path / "mirror.db")
+    mirror.sync()
+    send(chain, keepers[1], chain.addresses[0], encode_call("settleCohort()"))
+    next_block(chain)
+    mirror.sync()
+    mirror.db.close()
+
+    # The second key joins the signer pool after it already earned a reward
+    mirror = mirror_of(chain, keepers, tmp_path / "mirror.db")
+    mirror.sync()
+    assert mirror.keeper_rewards(keepers[1].address)["Market 0"] == settlement_reward(30)
+
+    # The checkpoint block is no longer canonical
+    for state in mirror.states.values():
+        state['block_hash'] = "0x" + "00" * 32
+    capsys.readouterr()
+    mirror.sync()
+    assert "reorged out, reading 2 markets directly" in capsys.readouterr().out
+    assert mirror.keeper_rewards(keepers[1].address)["Market 0"] == settlement_reward(30)
@@ -0,0 +1,196 @@
+"""TransactionJournal.recover against the mock node"""
+
+import json
+import sys
+
+import pytest
+from eth_account import Account
+
+from mock_node import CHAIN_ID, MockChain, synthetic_market_addresses
+from multicall import encode_call
+from rpc_codec import batch_payload, batch_results
+from tx_journal import TransactionJournal, default_journal_path, recover
+
+FEES = {'max_fee_per_gas': 3 * 10**7, 'max_priority_fee_per_gas': 10**6}
+
+@pytest.fixture
+def chain():
+    chain = MockChain(block_time=3600)  # Blocks only advance when a test moves the clock
+    chain.market = synthetic_market_addresses(1)[0]
+    return chain
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = TransactionJournal(str(tmp_path / "bot.journal.jsonl"))
+    yield journal
+    journal.close()
+
+def send_batch(chain):
+    return lambda calls: batch_results(chain.handle_payload(batch_payload(calls)), len(calls))
+
+def next_block(chain):
+    chain.start_time -= chain.block_time
+
+def sign(chain, journal, account, nonce, max_fee=FEES['max_fee_per_gas'], record=True):
+    # A zero-value transfer to the sender, it cannot revert
+    transaction = {'to': account.address, 'data': "0x", 'value': 0, 'gas': 50_000, 'maxFeePerGas': max_fee,
+                   'maxPriorityFeePerGas': 10**6, 'nonce': nonce, 'chainId': CHAIN_ID}
+    signed = account.sign_transaction(transaction)
+    raw = "0x" + bytes(signed.rawTransaction).hex()
+    if record:
+        journal.signed(signed.hash.hex(), 'claim', account.address, nonce, transaction, raw, market=chain.market)
+    return signed.hash.hex(), raw
+
+def sign_settlement(chain, journal, account, nonce, deadline):
+    transaction = {'to': chain.market, 'data': "0x" + encode_call("settleCohort()").hex(), 'value': 0,
+                   'gas': 300_000, 'maxFeePerGas': FEES['max_fee_per_gas'], 'maxPriorityFeePerGas': 10**6,
+                   'nonce': nonce, 'chainId': CHAIN_ID}
+    signed = account.sign_transaction(transaction)
+    journal.signed(signed.hash.hex(), 'settle', account.address, nonce, transaction, signed.rawTransaction,
+                   market=chain.market, deadline=deadline, cohort_size=0)
+    return signed.hash.hex()
+
+def statuses(journal):
+    """Every status a transaction went through, in journal order"""
+    history = {}
+    with open(journal.path) as f:
+        for line in f:
+            record = json.loads(line)
+            history.setdefault(record['hash'], []).append(record['status'])
+    return history
+
+def test_unsent_transaction_is_broadcast(chain, journal):
+    account = Account.create()
+    tx_hash, _ = sign(chain, journal, account, 0)  # Crashed between the journal write and the broadcast
+
+    recovered = recover(journal, send_batch(chain), 'claim', [account], FEES)
+
+    assert [entry['hash'] for entry in recovered] == [tx_hash]
+    assert recovered[0]['market'] == chain.market
+    assert tx_hash in chain.transactions
+    assert statuses(journal)[tx_hash] == ['signed', 'sent']
+
+def test_transaction_mined_while_down_is_closed(chain, journal):
+    account = Account.create()
+    tx_hash, raw = sign(chain, journal, account, 0)
+    chain.send_raw_transaction(raw)
+    journal.update(tx_hash, 'sent')
+    next_block(chain)
+
+    recovered = recover(journal, send_batch(chain), 'claim', [account], FEES)
+
+    assert [entry['hash'] for entry in recovered] == [tx_hash]
+    assert statuses(journal)[tx_hash] == ['signed', 'sent', 'mined']
+    assert journal.open_entries() == []
+    assert chain.request_counts.get('eth_sendRawTransaction', 0) == 0
+
+def test_transaction_whose_nonce_was_used_is_dropped(chain, journal):
+    account = Account.create()
+    tx_hash, _ = sign(chain, journal, account, 0)
+    _, other = sign(chain, journal, account, 0, max_fee=FEES['max_fee_per_gas'] * 2, record=False)
+    chain.send_raw_transaction(other)  # Another transaction took nonce 0
+    next_block(chain)
+
+    recovered = recover(journal, send_batch(chain), 'claim', [account], FEES)
+
+    assert recovered == []
+    assert statuses(journal)[tx_hash] == ['signed', 'dropped']
+    assert tx_hash not in chain.transactions
+
+def test_settlement_of_a_settled_market_is_cancelled(chain, journal):
+    account = Account.create()
+    deadline = chain.block_timestamp(chain.block_number())
+    chain.add_market(chain.market, next_settlement=deadline)
+    tx_hash = sign_settlement(chain, journal, account, 0, deadline)
+    chain.markets[chain.market].next_settlement = deadline + 86400  # Another keeper settled it
+
+    recovered = recover(journal, send_batch(chain), 'settle', [account], FEES)
+
+    assert [entry['kind'] for entry in recovered] == ['cancel']
+    cancel = recovered[0]['hash']
+    assert tx_hash not in chain.transactions
+    assert chain.transactions[cancel]['nonce'] == 0
+    assert chain.transactions[cancel]['to'] == bytes.fromhex(account.address[2:])
+    history = statuses(journal)
+    assert history[tx_hash] == ['signed', 'dropped']
+    assert history[cancel] == ['signed', 'sent']
+    assert journal.open_entries('settle') == []
+
+def test_settlement_of_a_due_market_is_rebroadcast(chain, journal):
+    account = Account.create()
+    deadline = chain.block_timestamp(chain.block_number())
+    chain.add_market(chain.market, next_settlement=deadline)
+    tx_hash = sign_settlement(chain, journal, account, 0, deadline)
+
+    recovered = recover(journal, send_batch(chain), 'settle', [account], FEES)
+
+    assert [entry['hash'] for entry in recovered] == [tx_hash]
+    assert tx_hash in chain.transactions
+    assert chain.markets[chain.market].next_settlement > deadline
+
+def test_settlement_of_a_settled_market_without_key_is_dropped(chain, journal):
+    account = Account.create()
+    deadline = chain.block_timestamp(chain.block_number())
+    chain.add_market(chain.market, next_settlement=deadline + 3600)
+    tx_hash = sign_settlement(chain, journal, account, 0, deadline)
+
+    assert recover(journal, send_batch(chain), 'settle', [], FEES) == []
+    assert statuses(journal)[tx_hash] == ['signed', 'dropped']
+    assert chain.request_counts.get('eth_sendRawTransaction', 0) == 0
+
+def test_underpriced_transaction_is_resigned(chain, journal):
+    account = Account.create()
+    tx_hash, _ = sign(chain, journal, account, 0, max_fee=10**7)
+
+    recovered = recover(journal, send_batch(chain), 'claim', [account], FEES)
+
+    replacement = recovered[0]['hash']
+    assert replacement != tx_hash
+    assert recovered[0]['nonce'] == 0
+    assert recovered[0]['transaction']['maxFeePerGas'] == FEES['max_fee_per_gas']
+    assert replacement in chain.transactions and tx_hash not in chain.transactions
+    history = statuses(journal)
+    assert history[tx_hash] == ['signed', 'replaced']
+    assert history[replacement] == ['signed', 'sent']
+
+def test_underpriced_transaction_without_key_is_rebroadcast(chain, journal):
+    account = Account.create()
+    tx_hash, _ = sign(chain, journal, account, 0, max_fee=10**7)
+
+    recovered = recover(journal, send_batch(chain), 'claim', [], FEES)
+
+    assert [entry['hash'] for entry in recovered] == [tx_hash]
+    assert tx_hash in chain.transactions
+
+def test_recovers_only_the_requested_kind(chain, journal):
+    account = Account.create()
+    sign(chain, journal, account, 0)
+
+    assert recover(journal, send_batch(chain), 'settle', [account], FEES) == []
+    assert chain.request_counts == {}
+    assert len(journal.open_entries('claim')) == 1
+
+def test_reopened_journal_keeps_only_open_transactions(chain, journal):
+    account = Account.create()
+    open_hash, _ = sign(chain, journal, account, 0)
+    closed_hash, _ = sign(chain, journal, account, 1)
+    journal.update(closed_hash, 'dropped')
+    journal.close()
+
+    reopened = TransactionJournal(journal.path)
+    try:
+        assert [entry['hash'] for entry in reopened.open_entries()] == [open_hash]
+        recovered = recover(reopened, send_batch(chain), 'claim', [account], FEES)
+        assert [entry['hash'] for entry in recovered] == [open_hash]
+    finally:
+        reopened.close()
+
+def test_default_path_is_outside_the_sources(monkeypatch, tmp_path):
+    monkeypatch.delenv("TX_JOURNAL")
+    monkeypatch.setattr(sys, 'argv', ["keeper_bot_iter.py"])
+    assert default_journal_path() == str(tmp_path / "state" / "keeper_bot_iter.journal.jsonl")
+    monkeypatch.delenv("STATE_DIR")
+    monkeypatch.setenv("XDG_STATE_HOME", str(tmp_path / "xdg"))
+    assert default_journal_path() == str(tmp_path / "xdg" / "topcut" / "keeper_bot_iter.journal.jsonl")
+    monkeypatch.setenv("TX_JOURNAL", "")
+    assert default_journal_path() == ""
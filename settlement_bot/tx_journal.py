@@ -0,0 +1,303 @@
+"""
+TopCut Transaction Journal
+Append-only write-ahead log of signed and sent transactions, replayed after a restart
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+from multicall import MULTICALL3_ADDRESS, decode_aggregate3, decode_uint, encode_aggregate3, encode_call
+
+try:
+    import fcntl
+except ImportError:  # Windows: no lock against a second process on the same journal
+    fcntl = None
+
+OPEN_STATUSES = ('signed', 'sent')
+RECORD_FIELDS = ('hash', 'kind', 'sender', 'nonce', 'status', 'transaction', 'raw', 'time')
+REPLACEMENT_BUMP = 1.125  # Nodes only accept a replacement at the same nonce with at least 10% higher fees
+DEFAULT_FSYNC_INTERVAL = 0.2  # Seconds between fsyncs of the journal file
+CANCEL_GAS = 21000  # Plain ETH transfer
+
+def replacement_fees(transaction, fees):
+    """maxFeePerGas / maxPriorityFeePerGas for a transaction replacing one at the same nonce
+
+    At least the current estimate and at least REPLACEMENT_BUMP times the old fees.
+    """
+    return {
+        'maxFeePerGas': max(fees['max_fee_per_gas'], int(transaction['maxFeePerGas'] * REPLACEMENT_BUMP) + 1),
+        'maxPriorityFeePerGas': max(fees['max_priority_fee_per_gas'],
+                                    int(transaction['maxPriorityFeePerGas'] * REPLACEMENT_BUMP) + 1),
+    }
+
+def cancel_transaction(sender, transaction, fees):
+    """Zero-value transfer to the sender at the nonce of a pending transaction, with replacement fees"""
+    return {
+        'to': sender,
+        'value': 0,
+        'gas': CANCEL_GAS,
+        **replacement_fees(transaction, fees),
+        'nonce': transaction['nonce'],
+        'chainId': transaction['chainId'],
+    }
+
+class TransactionJournal:
+    """Write-ahead journal of the transactions of one bot process
+
+    Every record is one JSON line. A transaction is recorded with its raw bytes before it
+    is broadcast (status 'signed'), then with every status change: 'sent', and finally
+    'mined', 'failed' (reverted), 'dropped' (rejected, or its nonce went to another
+    transaction) or 'replaced'. A record survives a crash of the process once it is
+    written; the fsync that protects it against a crash of the machine is batched to at
+    most one per fsync_interval. Opening the journal folds every transaction to its
+    latest record and rewrites the file with only the open ones.
+    """
+
+    def __init__(self, path, fsync_interval=DEFAULT_FSYNC_INTERVAL):
+        self.path = path
+        self.fsync_interval = fsync_interval
+        self.lock = threading.Lock()
+        self.entries = {}  # tx hash -> latest record of an open transaction
+        self.file = None
+        self.lock_file = None
+        self.last_fsync = 0
+        self.fsync_timer = None
+        if path:
+            self._open()
+
+    def _open(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.lock_file = open(self.path + ".lock", 'w')
+        if fcntl:
+            try:
+                fcntl.flock(self.lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                print(f"Transaction journal {self.path} is used by another process, "
+                      f"set TX_JOURNAL to a separate file. Journaling disabled")
+                self.lock_file.close()
+                self.lock_file = self.path = None
+                return
+
+        records = {}
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # Last line torn by a crash
+                    records[record['hash']] = {**records.get(record['hash'], {}), **record}
+        self.entries = {tx_hash: record for tx_hash, record in records.items()
+                        if record.get('status') in OPEN_STATUSES}
+
+        compacted = self.path + ".tmp"
+        with open(compacted, 'w') as f:
+            for record in self.entries.values():
+                f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(compacted, self.path)
+        self.file = open(self.path, 'a')
+        if self.entries:
+            print(f"Transaction journal: {len(self.entries)} open transactions in {self.path}")
+
+    def _fsync(self):
+        with self.lock:
+            self.fsync_timer = None
+            if self.file is not None:
+                os.fsync(self.file.fileno())
+                self.last_fsync = time.monotonic()
+
+    def _write(self, record):
+        if self.file is None:
+            return
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+        elapsed = time.monotonic() - self.last_fsync
+        if elapsed >= self.fsync_interval:
+            os.fsync(self.file.fileno())
+            self.last_fsync = time.monotonic()
+        elif self.fsync_timer is None:
+            self.fsync_timer = threading.Timer(self.fsync_interval - elapsed, self._fsync)
+            self.fsync_timer.daemon = True
+            self.fsync_timer.start()
+
+    def signed(self, tx_hash, kind, sender, nonce, transaction, raw, **details):
+        """Record a transaction before it is broadcast
+
+        transaction is the unsigned dict, kept so a restart can re-sign it with new fees;
+        details (market, deadline, cohort_size, ...) are what the bot needs to track it again.
+        """
+        record = {'hash': tx_hash, 'kind': kind, 'sender': sender, 'nonce': nonce, 'status': 'signed',
+                  'transaction': transaction, 'raw': raw if isinstance(raw, str) else "0x" + bytes(raw).hex(),
+                  'time': time.time(), **details}
+        with self.lock:
+            self.entries[tx_hash] = record
+            self._write(record)
+
+    def update(self, tx_hash, status, **details):
+        """Record a status change, transactions that are no longer open are forgotten"""
+        record = {'hash': tx_hash, 'status': status, 'time': time.time(), **details}
+        with self.lock:
+            if tx_hash not in self.entries:
+                return
+            if status in OPEN_STATUSES:
+                self.entries[tx_hash].update(record)
+            else:
+                del self.entries[tx_hash]
+            self._write(record)
+
+    def resolve(self, tx_hash, receipt):
+        """Record the receipt of a tracked transaction, a timeout leaves it open"""
+        if receipt is not None:
+            self.update(tx_hash, 'mined' if receipt.status == 1 else 'failed', block=receipt.blockNumber)
+
+    def entry(self, tx_hash):
+        """Latest record of an open transaction, None if it is unknown or closed"""
+        with self.lock:
+            entry = self.entries.get(tx_hash)
+            return dict(entry) if entry else None
+
+    def open_entries(self, kind=None):
+        """Open transactions, optionally of one kind, in nonce order per sender"""
+        with self.lock:
+            entries = [dict(entry) for entry in self.entries.values() if kind is None or entry['kind'] == kind]
+        return sorted(entries, key=lambda entry: (entry['sender'], entry['nonce']))
+
+    def close(self):
+        with self.lock:
+            if self.fsync_timer is not None:
+                self.fsync_timer.cancel()
+            if self.file is not None:
+                self.file.flush()
+                os.fsync(self.file.fileno())
+                self.file.close()
+                self.file = None
+            if self.lock_file is not None:
+                self.lock_file.close()
+                self.lock_file = None
+
+def recover(journal, send_batch, kind, accounts=(), fees=None):
+    """Bring the open transactions of one kind back under tracking after a restart
+
+    One JSON-RPC batch reads the receipt of every open transaction, the mined nonce of
+    every sender and, in one aggregate3 eth_call, nextSettlement of the markets of journaled
+    settlements. A transaction whose nonce went to another one is marked dropped. So is a
+    settlement whose market moved past its deadline, another keeper settled that cohort:
+    rebroadcast it would only revert, so a zero-value transfer to the sender takes its nonce
+    instead. The rest is rebroadcast in a second batch, re-signed at the same nonce with
+    fees bumped to the current estimate (fees) where its fee cap fell behind and the
+    sender's key is in accounts. Returns the entries to track again under their current
+    hash, including those cancels as entries of kind 'cancel'.
+    """
+    entries = journal.open_entries(kind)
+    if not entries:
+        return []
+    senders = sorted({entry['sender'] for entry in entries})
+    markets = sorted({entry['market'] for entry in entries if entry.get('deadline') is not None})
+    calls = ([("eth_getTransactionReceipt", [entry['hash']]) for entry in entries]
+             + [("eth_getTransactionCount", [sender, 'latest']) for sender in senders])
+    if markets:
+        data = encode_aggregate3([(market, encode_call("nextSettlement()")) for market in markets])
+        calls.append(("eth_call", [{'to': MULTICALL3_ADDRESS, 'data': "0x" + data.hex()}, 'latest']))
+    results = send_batch(calls)
+    for result in results[len(entries):]:
+        if isinstance(result, Exception):
+            raise result
+    mined_nonces = {sender: int(result, 16)
+                    for sender, result in zip(senders, results[len(entries):len(entries) + len(senders)])}
+    next_settlements = {}
+    if markets:
+        next_settlements = {market: decode_uint(success, return_data) for market, (success, return_data)
+                            in zip(markets, decode_aggregate3(bytes.fromhex(results[-1][2:])))}
+    signers = {account.address: account for account in accounts}
+
+    recovered, broadcasts = [], []
+    for entry, receipt in zip(entries, results):
+        if receipt is not None and not isinstance(receipt, Exception):
+            # Mined while the bot was down; closed here, the caller's tracker still gets the receipt
+            journal.update(entry['hash'], 'mined' if int(receipt['status'], 16) == 1 else 'failed',
+                           block=int(receipt['blockNumber'], 16))
+            recovered.append(entry)
+            continue
+        if entry['nonce'] < mined_nonces[entry['sender']]:
+            print(f"Journal: {entry['kind']} {entry['hash']} (nonce {entry['nonce']}) was replaced, dropping it")
+            journal.update(entry['hash'], 'dropped')
+            continue
+
+        transaction = entry['transaction']
+        account = signers.get(entry['sender'])
+        if entry.get('deadline') is not None and (next_settlements.get(entry['market']) or 0) > entry['deadline']:
+            print(f"Journal: market {entry['market']} was settled by another keeper, dropping {entry['kind']} "
+                  f"{entry['hash']} (nonce {entry['nonce']})")
+            if account is None:
+                journal.update(entry['hash'], 'dropped')
+                continue
+            cancel = cancel_transaction(entry['sender'], transaction, fees or {'max_fee_per_gas': 0,
+                                                                               'max_priority_fee_per_gas': 0})
+            signed = account.sign_transaction(cancel)
+            cancel_entry = {'hash': signed.hash.hex(), 'kind': 'cancel', 'sender': entry['sender'],
+                            'nonce': entry['nonce'], 'transaction': cancel,
+                            'raw': "0x" + bytes(signed.rawTransaction).hex(), 'market': entry['market'],
+                            'replaces': entry['hash']}
+            journal.signed(cancel_entry['hash'], 'cancel', entry['sender'], entry['nonce'], cancel,
+                           cancel_entry['raw'], market=entry['market'], replaces=entry['hash'])
+            journal.update(entry['hash'], 'dropped', replaced_by=cancel_entry['hash'])
+            broadcasts.append(cancel_entry)
+            continue
+        if fees and account and transaction.get('maxFeePerGas', 0) < fees['max_fee_per_gas']:
+            transaction = {**transaction, **replacement_fees(transaction, fees)}
+            signed = account.sign_transaction(transaction)
+            replacement = {**entry, 'hash': signed.hash.hex(), 'transaction': transaction,
+                           'raw': "0x" + bytes(signed.rawTransaction).hex()}
+            journal.update(entry['hash'], 'replaced', replaced_by=replacement['hash'])
+            journal.signed(replacement['hash'], entry['kind'], entry['sender'], entry['nonce'], transaction,
+                           replacement['raw'], **{key: value for key, value in entry.items() if key not in RECORD_FIELDS})
+            print(f"Journal: re-signed {entry['kind']} nonce {entry['nonce']} with max fee "
+                  f"{transaction['maxFeePerGas'] / 1e9:.3f} gwei: {replacement['hash']}")
+            entry = replacement
+        broadcasts.append(entry)
+
+    if broadcasts:
+        results = send_batch([("eth_sendRawTransaction", [entry['raw']]) for entry in broadcasts])
+        for entry, result in zip(broadcasts, results):
+            # 'already known': the node still has it, which is just as good
+            if isinstance(result, Exception) and "already known" not in str(result).lower():
+                print(f"Journal: rebroadcast of {entry['hash']} failed: {result}")
+                if "nonce too low" in str(result).lower():
+                    journal.update(entry['hash'], 'dropped')
+                    continue
+            else:
+                journal.update(entry['hash'], 'sent')
+            recovered.append(entry)
+    print(f"Journal: recovered {len(recovered)} open {kind} transactions")
+    return recovered
+
+_journal = None
+_journal_lock = threading.Lock()
+
+def state_dir():
+    """STATE_DIR, or topcut under $XDG_STATE_HOME (~/.local/state): runtime state outside the source tree"""
+    if os.getenv("STATE_DIR"):
+        return os.path.expanduser(os.getenv("STATE_DIR"))
+    return os.path.join(
+        os.getenv("XDG_STATE_HOME") or os.path.join(os.path.expanduser("~"), ".local", "state"), "topcut")
+
+def default_journal_path():
+    """TX_JOURNAL, or <script name>.journal.jsonl in state_dir(); an empty TX_JOURNAL disables it"""
+    if "TX_JOURNAL" in os.environ:
+        return os.environ["TX_JOURNAL"]
+    script = os.path.splitext(os.path.basename(sys.argv[0] or "bot"))[0] or "bot"
+    return os.path.join(state_dir(), f"{script}.journal.jsonl")
+
+def get_journal():
+    """Process-wide transaction journal, shared by settlements and claims"""
+    global _journal
+    with _journal_lock:
+        if _journal is None:
+            fsync_interval = float(os.getenv("TX_JOURNAL_FSYNC_INTERVAL", str(DEFAULT_FSYNC_INTERVAL)))
+            _journal = TransactionJournal(default_journal_path() or None, fsync_interval)
+        return _journal
@@ -0,0 +1,85 @@
+"""
+TopCut WebSocket Transport
+One eth_subscribe connection for newHeads and market logs, pushed into the keeper's state
+"""
+
+import asyncio
+import itertools
+import json
+import websockets
+
+from events import MARKET_EVENT_TOPICS, decode_market_log
+
+class WsMarketFeed:
+    """Streams new block headers and CohortSettled / PredictionPosted logs of the markets"""
+
+    def __init__(self, ws_url, addresses, on_head, on_event, on_connect=None, reconnect_delay=5):
+        self.ws_url = ws_url
+        self.addresses = list(addresses)
+        self.on_head = on_head  # on_head(block_number, timestamp)
+        self.on_event = on_event  # on_event(decoded event dict), see events.decode_market_log
+        self.on_connect = on_connect  # awaited after subscribing, e.g. to re-seed state
+        self.reconnect_delay = reconnect_delay
+        self.request_ids = itertools.count(1)
+        self.subscriptions = {}  # subscription id -> 'newHeads' | 'logs'
+
+    async def _subscribe(self, ws, kind, *params):
+        request_id = next(self.request_ids)
+        await ws.send(json.dumps({
+            'jsonrpc': "2.0",
+            'id': request_id,
+            'method': "eth_subscribe",
+            'params': [kind, *params],
+        }))
+        # Notifications for earlier subscriptions may arrive before our response
+        while True:
+            message = json.loads(await ws.recv())
+            if message.get('id') == request_id:
+                if 'error' in message:
+                    raise ConnectionError(f"eth_subscribe {kind} failed: {message['error']}")
+                self.subscriptions[message['result']] = kind
+                return message['result']
+            self._dispatch(message)
+
+    def _dispatch(self, message):
+        if message.get('method') != "eth_subscription":
+            return
+        params = message['params']
+        kind = self.subscriptions.get(params['subscription'])
+        result = params['result']
+        if kind == 'newHeads':
+            self.on_head(int(result['number'], 16), int(result['timestamp'], 16))
+        elif kind == 'logs':
+            event = decode_market_log(result)
+            if event:
+                self.on_event(event)
+
+    async def run_connection(self):
+        """Subscribe and process notifications until the connection drops"""
+        async with websockets.connect(self.ws_url, max_size=None) as ws:
+            self.subscriptions = {}
+            await self._subscribe(ws, 'newHeads')
+            await self._subscribe(ws, 'logs', {
+                'address': self.addresses,
+                'topics': [MARKET_EVENT_TOPICS],
+            })
+            print(f"Subscribed to newHeads and logs of {len(self.addresses)} markets")
+
+            if self.on_connect:
+                await self.on_connect()
+
+            async for raw_message in ws:
+                self._dispatch(json.loads(raw_message))
+
+    async def run(self):
+        """Keep the subscriptions alive, reconnecting after connection errors"""
+        while True:
+            try:
+                await self.run_connection()
+                print("WebSocket connection closed, reconnecting...")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"WebSocket error: {e}")
+            print(f"Reconnecting in {self.reconnect_delay} seconds...")
+            await asyncio.sleep(self.reconnect_delay)